@@ -0,0 +1,32 @@
+"""add indexed student_id_suffix to student
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('student', sa.Column(
+        'student_id_suffix', sa.String(length=4), nullable=True))
+    op.execute(
+        "UPDATE student SET student_id_suffix = SUBSTR(student_id, -4)")
+    op.create_index(op.f('ix_student_student_id_suffix'), 'student',
+                    ['student_id_suffix'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_student_student_id_suffix'), table_name='student')
+    op.drop_column('student', 'student_id_suffix')
@@ -0,0 +1,30 @@
+"""add version and updated_at to pi_message for conditional requests
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pi_message', sa.Column(
+        'updated_at', sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")))
+    op.add_column('pi_message', sa.Column(
+        'version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('pi_message', 'version')
+    op.drop_column('pi_message', 'updated_at')
@@ -0,0 +1,30 @@
+"""add recipient to outbox to batch sms per faculty
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox', sa.Column(
+        'recipient', sa.String(length=255), nullable=True))
+    op.create_index('ix_outbox_channel_recipient_status', 'outbox',
+                    ['channel', 'recipient', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_channel_recipient_status', table_name='outbox')
+    op.drop_column('outbox', 'recipient')
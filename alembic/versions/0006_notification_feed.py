@@ -0,0 +1,41 @@
+"""store notification created_at as a datetime and index the feed by user
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # created_at was written as e.g. "October 18, 2026"
+    op.add_column('notification', sa.Column(
+        'created_on', sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")))
+    op.execute("UPDATE notification SET created_on = STR_TO_DATE(created_at, '%M %d, %Y') "
+               "WHERE STR_TO_DATE(created_at, '%M %d, %Y') IS NOT NULL")
+    op.drop_column('notification', 'created_at')
+    op.alter_column('notification', 'created_on', new_column_name='created_at',
+                    existing_type=sa.DateTime(), existing_nullable=False,
+                    existing_server_default=sa.text("CURRENT_TIMESTAMP"))
+    op.create_index('ix_notification_user_id_id', 'notification', ['user_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notification_user_id_id', table_name='notification')
+    op.add_column('notification', sa.Column(
+        'created_on', sa.String(length=255), nullable=True))
+    op.execute("UPDATE notification SET created_on = DATE_FORMAT(created_at, '%M %d, %Y')")
+    op.drop_column('notification', 'created_at')
+    op.alter_column('notification', 'created_on', new_column_name='created_at',
+                    existing_type=sa.String(length=255), existing_nullable=True)
@@ -0,0 +1,69 @@
+"""store appointment and availability dates and times as typed columns
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# dates were sent as YYYY-MM-DD, times as HH:MM and the timestamps were
+# written as e.g. "October 18, 2026"
+TO_DATE = "STR_TO_DATE({column}, '%Y-%m-%d')"
+TO_TIME = "CAST({column} AS TIME)"
+TO_DATETIME = "COALESCE(STR_TO_DATE({column}, '%M %d, %Y'), CURRENT_TIMESTAMP)"
+
+FROM_DATE = "DATE_FORMAT({column}, '%Y-%m-%d')"
+FROM_TIME = "TIME_FORMAT({column}, '%H:%i')"
+FROM_DATETIME = "DATE_FORMAT({column}, '%M %d, %Y')"
+
+
+def _convert(table: str, column: str, type_, expression: str, nullable: bool) -> None:
+    """Replace a column by one of another type, converting the rows with `expression`"""
+    converted = f"{column}_converted"
+    op.add_column(table, sa.Column(converted, type_, nullable=True))
+    op.execute(f"UPDATE {table} SET {converted} = "
+               + expression.format(column=f"`{column}`"))
+    op.drop_column(table, column)
+    op.alter_column(table, converted, new_column_name=column,
+                    existing_type=type_, nullable=nullable)
+
+
+def upgrade() -> None:
+    _convert('appointment', 'date', sa.Date(), TO_DATE, False)
+    _convert('appointment', 'start_time', sa.Time(), TO_TIME, False)
+    _convert('appointment', 'end_time', sa.Time(), TO_TIME, False)
+    _convert('appointment', 'created_at', sa.DateTime(), TO_DATETIME, False)
+    _convert('appointment', 'updated_at', sa.DateTime(), TO_DATETIME, False)
+    _convert('available', 'start_time', sa.Time(), TO_TIME, False)
+    _convert('available', 'end_time', sa.Time(), TO_TIME, False)
+    _convert('available', 'created_at', sa.DateTime(), TO_DATETIME, False)
+
+    op.create_index('ix_appointment_faculty_id_date_start_time', 'appointment',
+                    ['faculty_id', 'date', 'start_time'])
+    op.create_index('ix_appointment_student_id_date', 'appointment',
+                    ['student_id', 'date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_appointment_student_id_date', table_name='appointment')
+    op.drop_index('ix_appointment_faculty_id_date_start_time', table_name='appointment')
+
+    _convert('available', 'created_at', sa.String(length=50), FROM_DATETIME, True)
+    _convert('available', 'end_time', sa.String(length=15), FROM_TIME, False)
+    _convert('available', 'start_time', sa.String(length=15), FROM_TIME, False)
+    _convert('appointment', 'updated_at', sa.String(length=50), FROM_DATETIME, True)
+    _convert('appointment', 'created_at', sa.String(length=50), FROM_DATETIME, True)
+    _convert('appointment', 'end_time', sa.String(length=15), FROM_TIME, False)
+    _convert('appointment', 'start_time', sa.String(length=15), FROM_TIME, False)
+    _convert('appointment', 'date', sa.String(length=50), FROM_DATE, False)
@@ -0,0 +1,27 @@
+"""index the listing of availabilities by faculty and by day
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_available_user_id_id', 'available', ['user_id', 'id'])
+    op.create_index('ix_available_day_id', 'available', ['day', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_available_day_id', table_name='available')
+    op.drop_index('ix_available_user_id_id', table_name='available')
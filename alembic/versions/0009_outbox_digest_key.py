@@ -0,0 +1,29 @@
+"""remember which sms digest an outbox message was merged into
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox', sa.Column(
+        'digest_key', sa.String(length=64), nullable=True))
+    op.create_index('ix_outbox_digest_key', 'outbox', ['digest_key'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_digest_key', table_name='outbox')
+    op.drop_column('outbox', 'digest_key')
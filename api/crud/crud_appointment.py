@@ -1,38 +1,84 @@
 from ..schemas import available_schema
 from .. import models
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
 from fastapi import HTTPException
 from typing import Optional
+from datetime import date, time
+from ..utils.pagination import keyset_after
+
+# statuses of appointments that no longer hold their time slot
+CANCELLED_STATUSES = ("cancelled", "canceled")
+
+# columns a listing of appointments can be sorted by, the last one unique
+APPOINTMENT_SORTS = {
+    "id": [models.Appointment.id],
+    "date": [models.Appointment.date, models.Appointment.start_time, models.Appointment.id],
+}
 
 
 class CrudAppointment:
     """Appointment crud operations"""
 
-    def appointment_create(db: Session, appointment: available_schema.CreateAppointment) -> models.Appointment:
-        """Create a new appointment
+    @staticmethod
+    async def check_time_slot(db: AsyncSession, faculty_id: str, day: date, start_time: time,
+                              end_time: time, appointment_id: Optional[int] = None) -> None:
+        """Make sure a faculty can be booked from start_time to end_time on a day
+
+        Locks the faculty row until the transaction ends, so concurrent
+        bookings of the same faculty are checked one after the other. Call it
+        before adding anything else to the transaction. The availability and
+        overlap reads are locking reads too: under REPEATABLE READ a plain
+        read sees the snapshot of the transaction's first read, which can
+        miss a booking committed while waiting for the faculty lock.
 
         Args:
             db (Session): Database session
-            appointment (faculty_schema.AppointmentCreate): Appointment details
+            faculty_id (str): Faculty id
+            day (date): Date of the appointment
+            start_time (time): Start of the appointment
+            end_time (time): End of the appointment
+            appointment_id (int): Appointment being moved, ignored in the check
 
-        return: user_schema.AppointmentResponse: Appointment details"""
+        Raises:
+            HTTPException: 400 if the times are reversed, 409 if the slot is
+                outside the faculty's availability or overlaps an appointment"""
 
-        try:
-            new_appointment = models.Appointment(**appointment.model_dump())
-            db.add(new_appointment)
-            db.commit()
-            db.refresh(new_appointment)
-            return new_appointment
-
-        except Exception as e:
+        if end_time <= start_time:
             raise HTTPException(
-                status_code=400,
-                detail=f"An error occurred while attempting to create appointment {
-                    e}"
-            )
+                status_code=400, detail="end_time must be after start_time")
+
+        await db.execute(select(models.User.id).where(
+            models.User.user_id == faculty_id).with_for_update())
+
+        # faculty without any availability can be booked at any time
+        windows = (await db.execute(select(
+            models.Available.day, models.Available.start_time, models.Available.end_time
+        ).where(models.Available.user_id == faculty_id).with_for_update())).all()
+        weekday = day.strftime("%A").lower()
+        if windows and not any(window.day.lower() == weekday
+                               and window.start_time <= start_time
+                               and window.end_time >= end_time
+                               for window in windows):
+            raise HTTPException(
+                status_code=409, detail="The faculty is not available at this time")
+
+        # a seek on (faculty_id, date, start_time)
+        query = select(models.Appointment.id).where(
+            models.Appointment.faculty_id == faculty_id,
+            models.Appointment.date == day,
+            models.Appointment.start_time < end_time,
+            models.Appointment.end_time > start_time,
+            models.Appointment.satus.notin_(CANCELLED_STATUSES))
+        if appointment_id is not None:
+            query = query.where(models.Appointment.id != appointment_id)
+
+        if await db.scalar(query.limit(1).with_for_update()) is not None:
+            raise HTTPException(
+                status_code=409, detail="The faculty already has an appointment at this time")
 
     @staticmethod
-    def appointment_create(db: Session, appointment: available_schema.CreateAppointment) -> models.Appointment:
+    async def appointment_create(db: AsyncSession, appointment: available_schema.CreateAppointment) -> models.Appointment:
         """Create a new appointment
 
         Args:
@@ -44,8 +90,8 @@ class CrudAppointment:
         try:
             new_appointment = models.Appointment(**appointment.model_dump())
             db.add(new_appointment)
-            db.commit()
-            db.refresh(new_appointment)
+            await db.commit()
+            await db.refresh(new_appointment)
             return new_appointment
 
         except Exception as e:
@@ -56,7 +102,7 @@ class CrudAppointment:
             )
 
     @staticmethod
-    def get_appointment_by_id(db: Session, appointment_id: int) -> Optional[models.Appointment]:
+    async def get_appointment_by_id(db: AsyncSession, appointment_id: int) -> Optional[models.Appointment]:
         """Get a appointment by id
 
         Args:
@@ -66,65 +112,84 @@ class CrudAppointment:
         Returns:
             Appointment: Appointment details"""
 
-        existing_appointment = db.query(models.Appointment).filter(
-            models.Appointment.id == appointment_id).first()
+        existing_appointment = await db.scalar(select(models.Appointment).where(
+            models.Appointment.id == appointment_id))
 
         return existing_appointment
 
     @staticmethod
-    def get_appointments_by_user(db: Session, faculty_id: Optional[str], student_id: Optional[str]) -> Optional[models.Appointment]:
-        """Get a appointment by faculty hootloot id
+    async def get_appointments(db: AsyncSession, limit: Optional[int] = None,
+                               after: Optional[list] = None, sort: str = "id",
+                               faculty_id: Optional[str] = None,
+                               student_id: Optional[str] = None,
+                               status: Optional[str] = None,
+                               start_date: Optional[date] = None,
+                               end_date: Optional[date] = None) -> list[models.Appointment]:
+        """Get a page of the appointments
 
         Args:
-
             db (Session): Database session
-            faculty_id Optional[str]: Faculty id
-            student_id Optional[str]: Student id
+            limit (int): Maximum number of appointments, None for all
+            after (list): Sort values of the last appointment of the previous page
+            sort (str): "id" (creation order) or "date" (date, start_time, id)
+            faculty_id (str): Only the appointments of this faculty
+            student_id (str): Only the appointments of this student
+            status (str): Only the appointments with this status
+            start_date (date): Only the appointments on or after this day
+            end_date (date): Only the appointments on or before this day
 
         Returns:
-
-            Appointment: Appointment details"""
-
-        if faculty_id:
-            existing_appointment = db.query(models.Appointment).filter(
-                models.Appointment.faculty_id == faculty_id).all()
-        else:
-            existing_appointment = db.query(models.Appointment).filter(
-                models.Appointment.student_id == student_id).all()
-
-        return existing_appointment
+            List[Appointment]: List of appointments"""
+
+        columns = APPOINTMENT_SORTS[sort]
+        query = select(models.Appointment)
+        if faculty_id is not None:
+            query = query.where(models.Appointment.faculty_id == faculty_id)
+        if student_id is not None:
+            query = query.where(models.Appointment.student_id == student_id)
+        if status is not None:
+            query = query.where(models.Appointment.satus == status)
+        if start_date is not None:
+            query = query.where(models.Appointment.date >= start_date)
+        if end_date is not None:
+            query = query.where(models.Appointment.date <= end_date)
+        if after is not None:
+            query = query.where(keyset_after(columns, after))
+        # with a faculty or student filter the date order is read off the
+        # (faculty_id, date, start_time) or (student_id, date) index
+        query = query.order_by(*columns)
+        if limit is not None:
+            query = query.limit(limit)
+
+        return (await db.scalars(query)).all()
 
     @staticmethod
-    def get_appointments(db: Session) -> list[models.Appointment]:
-        """Get all appointments
+    async def get_appointments_by_user(db: AsyncSession, user_id: str,
+                                       role: Optional[str] = None) -> list[models.Appointment]:
+        """Get all appointments of a user, in one query
 
         Args:
             db (Session): Database session
-
-        Returns:
-            List[Appointment]: List of all appointments"""
-
-        return db.query(models.Appointment).all()
-
-    @staticmethod
-    def get_appointments_by_user(db: Session, user_id: int) -> list[models.Appointment]:
-        """Get all appointments by user
-
-        Args:
-            db (Session): Database session
-            user_id (int): User id
+            user_id (str): User id (hootloot id)
+            role (str): "faculty" or "student", None for either
 
         Returns:
             List[Appointment]: List of all appointments by user (faculty or student)"""
 
-        faculty_app = db.query(models.Appointment).filter(
-            models.Appointment.faculty_id == user_id).all()
-        if faculty_app:
-            return faculty_app
-        return db.query(models.Appointment).filter(models.Appointment.student_id == user_id).all()
+        # each side is a range of the (faculty_id, ...) or (student_id, ...)
+        # index, MySQL merges the two for the OR
+        conditions = {
+            "faculty": models.Appointment.faculty_id == user_id,
+            "student": models.Appointment.student_id == user_id,
+        }
+        condition = conditions[role] if role else or_(*conditions.values())
+
+        return (await db.scalars(select(models.Appointment).where(condition).order_by(
+            models.Appointment.date, models.Appointment.start_time,
+            models.Appointment.id))).all()
 
     @staticmethod
-    def update_appointment(db: Session, appointment_id: int, appointment_update: available_schema.AppointmentUpdate) -> models.Appointment:
+    async def update_appointment(db: AsyncSession, appointment_id: int, appointment_update: available_schema.AppointmentUpdate) -> models.Appointment:
         """Update an appointment by ID
 
         Args:
@@ -134,19 +199,19 @@ class CrudAppointment:
         Returns:
 
             schemas.Appointment: Updated appointment details"""
-        appointment = db.query(models.Appointment).filter(
-            models.Appointment.id == appointment_id).first()
+        appointment = await db.scalar(select(models.Appointment).where(
+            models.Appointment.id == appointment_id))
         if not appointment:
             raise HTTPException(
                 status_code=404, detail="Appointment not found")
-        for key, value in appointment_update.model_dump().items():
+        for key, value in appointment_update.model_dump(exclude_none=True).items():
             setattr(appointment, key, value)
-        db.commit()
-        db.refresh(appointment)
+        await db.commit()
+        await db.refresh(appointment)
         return appointment
 
     @staticmethod
-    def delete_appointment(db: Session, appointment_id: int) -> bool:
+    async def delete_appointment(db: AsyncSession, appointment_id: int) -> bool:
         """Delete an appointment by ID
 
         Args:
@@ -155,16 +220,16 @@ class CrudAppointment:
         Returns:
 
             bool: True if appointment was deleted, False otherwise"""
-        appointment = db.query(models.Appointment).filter(
-            models.Appointment.id == appointment_id).first()
+        appointment = await db.scalar(select(models.Appointment).where(
+            models.Appointment.id == appointment_id))
         if not appointment:
             return False
-        db.delete(appointment)
-        db.commit()
+        await db.delete(appointment)
+        await db.commit()
         return True
 
     @staticmethod
-    def student_checkin(id: int, db: Session):
+    async def student_checkin(id: int, db: AsyncSession):
         """Get  appointment by ID
 
         Args: 
@@ -174,7 +239,7 @@ class CrudAppointment:
         Returns:
             None if appointment not found, Appointment details otherwise"""
 
-        appointments = db.query(models.Appointment).filter(
-            models.Appointment.id == id).first()
+        appointments = await db.scalar(select(models.Appointment).where(
+            models.Appointment.id == id))
 
         return None if not appointments else appointments
@@ -1,6 +1,7 @@
 from ..schemas import available_schema
 from .. import models
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from fastapi import HTTPException
 from typing import Optional
 
@@ -8,7 +9,7 @@ from typing import Optional
 class AvailableCrud:
     """Available crud operations"""
     @staticmethod
-    def create_availability(db: Session, available: available_schema.CreateAvailability) -> models.Available:
+    async def create_availability(db: AsyncSession, available: available_schema.CreateAvailability) -> models.Available:
         """Create a new available
 
         Args:
@@ -20,8 +21,8 @@ class AvailableCrud:
         try:
             new_available = models.Available(**available.model_dump())
             db.add(new_available)
-            db.commit()
-            db.refresh(new_available)
+            await db.commit()
+            await db.refresh(new_available)
             return new_available
 
         except Exception as e:
@@ -32,7 +33,7 @@ class AvailableCrud:
             )
 
     @staticmethod
-    def get_availability_by_id(db: Session, available_id: int) -> Optional[models.Available]:
+    async def get_availability_by_id(db: AsyncSession, available_id: int) -> Optional[models.Available]:
         """Get a available by id
 
         Args:
@@ -42,25 +43,44 @@ class AvailableCrud:
         Returns:
             Available: Available details"""
 
-        existing_available = db.query(models.Available).filter(
-            models.Available.id == available_id).first()
+        existing_available = await db.scalar(select(models.Available).where(
+            models.Available.id == available_id))
 
         return existing_available
 
     @staticmethod
-    def get_availabilities(db: Session) -> list[models.Available]:
-        """Get all availables
+    async def get_availabilities(db: AsyncSession, limit: Optional[int] = None,
+                                 after: Optional[int] = None,
+                                 faculty_id: Optional[str] = None,
+                                 day: Optional[str] = None) -> list[models.Available]:
+        """Get a page of the availables, in id order
 
         Args:
             db (Session): Database session
+            limit (int): Maximum number of availables, None for all
+            after (int): Only availables with a greater id (cursor of the page)
+            faculty_id (str): Only the availables of this faculty
+            day (str): Only the availables on this day of the week (e.g. Monday)
 
         Returns:
-            List[Available]: List of all availables"""
-
-        return db.query(models.Available).all()
+            List[Available]: List of availables"""
+
+        query = select(models.Available)
+        if faculty_id is not None:
+            query = query.where(models.Available.user_id == faculty_id)
+        if day is not None:
+            # the column compares case-insensitively, so the index serves it
+            query = query.where(models.Available.day == day)
+        if after is not None:
+            query = query.where(models.Available.id > after)
+        query = query.order_by(models.Available.id)
+        if limit is not None:
+            query = query.limit(limit)
+
+        return (await db.scalars(query)).all()
 
     @staticmethod
-    def get_availability_by_user(db: Session, faculty_id: str) -> Optional[models.Available]:
+    async def get_availability_by_user(db: AsyncSession, faculty_id: str) -> Optional[models.Available]:
         """Get all availables by faculty id
 
         Args:
@@ -71,10 +91,11 @@ class AvailableCrud:
 
             List[Available]: List of all availables"""
 
-        return db.query(models.Available).filter(models.Available.user_id == faculty_id).all()
+        return (await db.scalars(select(models.Available).where(
+            models.Available.user_id == faculty_id))).all()
 
     @staticmethod
-    def delete_availability(db: Session, available_id: Optional[str] = None) -> bool:
+    async def delete_availability(db: AsyncSession, available_id: Optional[str] = None) -> bool:
         """Delete a available
 
         Args:
@@ -87,18 +108,18 @@ class AvailableCrud:
         if not available_id:
             return False
 
-        existing_available = db.query(models.Available).filter(
-            models.Available.id == available_id).first()
+        existing_available = await db.scalar(select(models.Available).where(
+            models.Available.id == available_id))
 
         if existing_available:
-            db.delete(existing_available)
-            db.commit()
+            await db.delete(existing_available)
+            await db.commit()
             return True
 
         return False
 
     @staticmethod
-    def update_availability(db: Session, available_id: str,
+    async def update_availability(db: AsyncSession, available_id: str,
                             available: available_schema.AvailableUpdate) -> Optional[models.Available]:
         """Update an availability
 
@@ -110,16 +131,16 @@ class AvailableCrud:
         Returns:
             Available: Updated availability details or raises HTTPException if not found
         """
-        existing_available = db.query(models.Available).filter(
-            models.Available.id == available_id).first()
+        existing_available = await db.scalar(select(models.Available).where(
+            models.Available.id == available_id))
 
         if existing_available:
             # Update fields based on available model
             for key, value in available.model_dump().items():
                 setattr(existing_available, key, value)
 
-            db.commit()
-            db.refresh(existing_available)
+            await db.commit()
+            await db.refresh(existing_available)
             return existing_available
 
         raise HTTPException(status_code=404, detail="Availability not found")
@@ -3,14 +3,16 @@
 
 from ..schemas import notification_schema
 from .. import models
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from datetime import datetime
 
 
 class NotificationCrud:
     """Update the the message to be displayed on the pi"""
 
     @staticmethod
-    def create_notification(db: Session, user_id: str, notification: notification_schema.NotificationSchema):
+    async def create_notification(db: AsyncSession, user_id: str, notification: notification_schema.NotificationSchema):
         """Update a user's details
 
         Args:
@@ -19,26 +21,27 @@ class NotificationCrud:
             user (faculty_schema.UserUpdate): User details
 
         Returns:
-            bool: True if user was updated, False otherwise"""
+            bool: True if the notification was created, False otherwise
+            Notification: The created notification, or the error message"""
 
-        existing_user = db.query(models.User).filter(
-            models.User.user_id == user_id).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.user_id == user_id))
         if not existing_user:
             return False, "User not found"
 
         try:
             new_notification = models.Notification(**notification.model_dump())
             db.add(new_notification)
-            db.commit()
-            db.refresh(new_notification)
-            return True, "Notification created"
+            await db.commit()
+            await db.refresh(new_notification)
+            return True, new_notification
         except Exception as e:
             print(e)
             return False, e
 
     @staticmethod
-    def get_notifications(db: Session):
-        """Get all notifications for a user
+    async def get_notifications(db: AsyncSession):
+        """Get all notifications
 
         Args:
             db (Session): Database session
@@ -46,32 +49,60 @@ class NotificationCrud:
         Returns:
             list: List of notifications
         """
-        notifications = db.query(models.Notification).filter(
-            models.Notification).all()
+        notifications = (await db.scalars(select(models.Notification).order_by(
+            models.Notification.id))).all()
 
         return notifications
 
     @staticmethod
-    def get_notification_by_user(db: Session, user_id: str):
-        """Get all notifications for a user
+    async def get_notification_by_user(db: AsyncSession, user_id: str, limit: int = None,
+                                       before: int = None, after: int = None,
+                                       event_type: str = None, since: datetime = None,
+                                       until: datetime = None):
+        """Get a page of the notifications of a user, newest first
 
         Args:
             db (Session): Database session
             user_id (str): User id
-            notification_id (int): Notification id
+            limit (int): Maximum number of notifications, None for all
+            before (int): Only notifications with a smaller id (cursor of the page)
+            after (int): Only notifications with a greater id, oldest first
+                (replay of the ones a websocket missed)
+            event_type (str): Only notifications of this event type
+            since (datetime): Only notifications created at or after this time
+            until (datetime): Only notifications created before this time
 
         Returns:
-            Notification: Notification object
+            list: List of notifications
         """
 
-        notifications = db.query(models.Notification).filter(
-            models.Notification.user_id == user_id
-        ).all()
+        query = select(models.Notification).where(
+            models.Notification.user_id == user_id)
+        if before is not None:
+            query = query.where(models.Notification.id < before)
+        if after is not None:
+            query = query.where(models.Notification.id > after)
+        if event_type is not None:
+            query = query.where(models.Notification.event_type == event_type)
+        if since is not None:
+            query = query.where(models.Notification.created_at >= since)
+        if until is not None:
+            query = query.where(models.Notification.created_at < until)
+        # served by the (user_id, id) index in either direction, without
+        # sorting the user's history
+        if after is not None:
+            query = query.order_by(models.Notification.id)
+        else:
+            query = query.order_by(models.Notification.id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+
+        notifications = (await db.scalars(query)).all()
 
         return notifications
 
     @staticmethod
-    def delete_notification_by_id(db: Session, notification_id: int):
+    async def delete_notification_by_id(db: AsyncSession, notification_id: int):
         """Delete a notification by id
 
         Args:
@@ -83,37 +114,69 @@ class NotificationCrud:
             bool: True if notification was deleted, False otherwise
         """
 
-        notification = db.query(models.Notification).filter(
-            models.Notification.id == notification_id
-        ).first()
+        notification = await db.scalar(select(models.Notification).where(
+            models.Notification.id == notification_id))
 
         if notification:
-            db.delete(notification)
-            db.commit()
+            await db.delete(notification)
+            await db.commit()
             return True, "Notification deleted"
 
         return False, "Notification not found"
 
     @staticmethod
-    def delete_notification_by_user(db: Session, user_id: str):
-        """Delete all notifications for a user
+    async def delete_notification_by_user(db: AsyncSession, user_id: str,
+                                          older_than: datetime = None,
+                                          event_type: str = None):
+        """Delete the notifications of a user in one statement
 
         Args:
             db (Session): Database session
             user_id (str): User id
+            older_than (datetime): Only notifications created before this time
+            event_type (str): Only notifications of this event type
 
         Returns:
-            bool: True if notification was deleted, False otherwise
+            bool: True if notifications were deleted, False otherwise
         """
 
-        notifications = db.query(models.Notification).filter(
-            models.Notification.user_id == user_id
-        ).all()
+        query = delete(models.Notification).where(
+            models.Notification.user_id == user_id)
+        if older_than is not None:
+            query = query.where(models.Notification.created_at < older_than)
+        if event_type is not None:
+            query = query.where(models.Notification.event_type == event_type)
+
+        result = await db.execute(query)
+        await db.commit()
 
-        if notifications:
-            for notification in notifications:
-                db.delete(notification)
-            db.commit()
-            return True, "Notifications deleted"
+        if result.rowcount:
+            return True, f"{result.rowcount} notifications deleted"
 
         return False, "Notifications not found"
+
+    @staticmethod
+    async def prune_notifications(db: AsyncSession, older_than: datetime, chunk_size: int):
+        """Delete up to `chunk_size` of the oldest notifications created before a time
+
+        Args:
+            db (Session): Database session
+            older_than (datetime): Notifications created before this time are deleted
+            chunk_size (int): Maximum number of notifications deleted
+
+        Returns:
+            int: Number of notifications deleted
+        """
+
+        # ids grow with created_at, so the old rows are found at the start of
+        # the primary key without scanning the whole table
+        ids = (await db.scalars(select(models.Notification.id).where(
+            models.Notification.created_at < older_than).order_by(
+            models.Notification.id).limit(chunk_size))).all()
+        if not ids:
+            return 0
+
+        await db.execute(delete(models.Notification).where(
+            models.Notification.id.in_(ids)))
+        await db.commit()
+        return len(ids)
@@ -3,7 +3,11 @@
 
 from ..schemas import pi_message_schema
 from .. import models
-from sqlalchemy.orm import Session
+from ..utils.pi_message_versions import pi_message_versions
+from ..utils.pi_message_stream import pi_message_hub
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
 
 
 # start of user (faculty) crud operations
@@ -11,7 +15,7 @@ class PiMessage:
     """Update the the message to be displayed on the pi"""
 
     @staticmethod
-    def update_message(db: Session, user_id: str, message: pi_message_schema.PiMessage):
+    async def update_message(db: AsyncSession, user_id: str, message: pi_message_schema.PiMessage):
         """Update a user's details
 
         Args:
@@ -22,30 +26,34 @@ class PiMessage:
         Returns:
             bool: True if user was updated, False otherwise"""
 
-        existing_user = db.query(models.User).filter(
-            models.User.user_id == user_id).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.user_id == user_id))
 
         if not existing_user:
             return False
 
-        pi_message = db.query(models.PiMessage).filter(
-            models.PiMessage.user_id == user_id).first()
+        pi_message = await db.scalar(select(models.PiMessage).where(
+            models.PiMessage.user_id == user_id))
 
         if pi_message:
             pi_message.update_message(**message.model_dump())
-            db.commit()
+            await db.commit()
+            pi_message_versions.update(pi_message)
+            await pi_message_hub.publish_message(pi_message)
             return True
 
         elif not pi_message:
             new_pi_message = models.PiMessage(**message.model_dump())
             db.add(new_pi_message)
-            db.commit()
+            await db.commit()
+            pi_message_versions.update(new_pi_message)
+            await pi_message_hub.publish_message(new_pi_message)
             return True
 
         return False
 
     @staticmethod
-    def delete_message(db: Session, user_id: str):
+    async def delete_message(db: AsyncSession, user_id: str):
         """Delete a user's message
 
         Args:
@@ -55,18 +63,20 @@ class PiMessage:
         Returns:
             bool: True if user was deleted, False otherwise"""
 
-        pi_message = db.query(models.PiMessage).filter(
-            models.PiMessage.user_id == user_id).first()
+        pi_message = await db.scalar(select(models.PiMessage).where(
+            models.PiMessage.user_id == user_id))
 
         if pi_message:
-            db.delete(pi_message)
-            db.commit()
+            await db.delete(pi_message)
+            await db.commit()
+            pi_message_versions.remove(user_id)
+            await pi_message_hub.publish_delete(user_id)
             return True
 
         return False
 
     @staticmethod
-    def get_message(db: Session, user_id: str):
+    async def get_message(db: AsyncSession, user_id: str):
         """Get a user's message
 
         Args:
@@ -76,16 +86,20 @@ class PiMessage:
         Returns:
             models.PiMessage: User's message"""
 
-        return db.query(models.PiMessage).filter(models.PiMessage.user_id == user_id).first()
+        return await db.scalar(select(models.PiMessage).where(
+            models.PiMessage.user_id == user_id))
 
     @staticmethod
-    def get_all_messages(db: Session):
-        """Get all messages
+    async def get_all_messages(db: AsyncSession):
+        """Get all messages with the faculty who posted them, in a single query
 
         Args:
             db (Session): Database session
 
         Returns:
-            List[models.PiMessage]: List of all messages"""
+            List[models.PiMessage]: List of all messages, faculty loaded"""
 
-        return db.query(models.PiMessage).all()
+        return (await db.scalars(
+            select(models.PiMessage)
+            .join(models.PiMessage.faculty)
+            .options(contains_eager(models.PiMessage.faculty)))).all()
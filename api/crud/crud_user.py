@@ -1,18 +1,22 @@
 # This file contains user's crud operations for the api
 
 from ..schemas import user_schema
+from ..utils.password_utils import password_hasher
 from .. import models
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, or_
 from fastapi import HTTPException
 from typing import Optional
 
 
+CSV_IMPORT_CHUNK_SIZE = 1000
+
+
 # start of user (faculty) crud operations
 class UserCrud:
     """User crud operations"""
     @staticmethod
-    def create_user(db: Session, user: user_schema.UserCreate):
+    async def create_user(db: AsyncSession, user: user_schema.UserCreate):
         """Create a new user
 
         Args:
@@ -22,14 +26,14 @@ class UserCrud:
         return: user_schema.UserResponse: User details"""
 
         try:
-            existing_user = db.query(models.User).filter(
-                models.User.email == user.email).first()
+            existing_user = await db.scalar(select(models.User).where(
+                models.User.email == user.email))
 
             new_user = models.User(**user.model_dump())
-            new_user.hash_password(user.password)
+            new_user.password = await password_hasher.hash(user.password)
             db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
+            await db.commit()
+            await db.refresh(new_user)
 
         except Exception as e:
             if existing_user:
@@ -45,7 +49,7 @@ class UserCrud:
         return new_user
 
     @staticmethod
-    def get_user_by_phone_number(db: Session, phone_number: str):
+    async def get_user_by_phone_number(db: AsyncSession, phone_number: str):
         """Get a user by phone number
 
         Args:
@@ -55,14 +59,14 @@ class UserCrud:
         Returns:
             User: User details"""
 
-        existing_user = db.query(models.User).filter(
-            models.User.phone_number == phone_number).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.phone_number == phone_number))
         if existing_user:
             return existing_user
         return None
 
     @staticmethod
-    def get_user_by_email(db: Session, email: str):
+    async def get_user_by_email(db: AsyncSession, email: str):
         """Get a user by email
 
         Args:
@@ -72,14 +76,14 @@ class UserCrud:
         Returns:
             User: User details"""
 
-        existing_user = db.query(models.User).filter(
-            models.User.email == email).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.email == email))
         if existing_user:
             return existing_user
         return None
 
     @staticmethod
-    def get_users(db: Session):
+    async def get_users(db: AsyncSession):
         """Get all users
 
         Args:
@@ -88,10 +92,10 @@ class UserCrud:
         Returns:
             List[User]: List of all users"""
 
-        return db.query(models.User).all()
+        return (await db.scalars(select(models.User))).all()
 
     @staticmethod
-    def get_user_by_id(db: Session, user_id: str):
+    async def get_user_by_id(db: AsyncSession, user_id: str):
         """Get a user by id (user_id) the hootloop id
 
         Args:
@@ -102,13 +106,13 @@ class UserCrud:
             User: User details
         """
 
-        existing_user = db.query(models.User).filter(
-            models.User.user_id == user_id).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.user_id == user_id))
 
         return existing_user
 
     @staticmethod
-    def delete_user(db: Session, user_id: Optional[str] = None, email: Optional[str] = None):
+    async def delete_user(db: AsyncSession, user_id: Optional[str] = None, email: Optional[str] = None):
         """Delete a user
 
         Args:
@@ -122,22 +126,22 @@ class UserCrud:
             return False
 
         if user_id:
-            existing_user = db.query(models.User).filter(
-                models.User.user_id == user_id).first()
+            existing_user = await db.scalar(select(models.User).where(
+                models.User.user_id == user_id))
         else:
-            existing_user = db.query(models.User).filter(
-                models.User.email == email).first()
+            existing_user = await db.scalar(select(models.User).where(
+                models.User.email == email))
 
         if existing_user:
-            db.delete(existing_user)
-            db.commit()
+            await db.delete(existing_user)
+            await db.commit()
             return True
 
         return False
 
     # start of student crud operations
     @staticmethod
-    def get_student_by_id(db: Session, student_id: str):
+    async def get_student_by_id(db: AsyncSession, student_id: str):
         """Get a user by last 4 digits of  their id (HootLoot ID) or full ID
 
         Args:
@@ -149,19 +153,34 @@ class UserCrud:
             Object: User details
         """
 
-        if len(student_id) == 4:
-            # Query to check if the last 4 digits match the given ID
-            existing_user = db.query(models.Student).filter(
-                models.Student.student_id.like(f"%{student_id}")
-            ).first()
+        if len(student_id) == models.STUDENT_ID_SUFFIX_LENGTH:
+            # Indexed lookup on the last 4 digits of the ID
+            existing_user = await db.scalar(select(models.Student).where(
+                models.Student.student_id_suffix == student_id))
         else:
-            existing_user = db.query(models.Student).filter(
-                models.Student.student_id == student_id).first()
+            existing_user = await db.scalar(select(models.Student).where(
+                models.Student.student_id == student_id))
 
         return existing_user
 
     @staticmethod
-    def get_students(db: Session):
+    async def get_students_by_suffix(db: AsyncSession, suffix: str):
+        """Get every student whose id (HootLoot ID) ends with the given digits
+
+        Args:
+
+            suffix (str): Last 4 digits of the student ID
+
+        Returns:
+
+            List[Student]: All matching students, more than one if the suffix is ambiguous
+        """
+
+        return (await db.scalars(select(models.Student).where(
+            models.Student.student_id_suffix == suffix))).all()
+
+    @staticmethod
+    async def get_students(db: AsyncSession):
         """Get all students
 
         Args:
@@ -170,10 +189,10 @@ class UserCrud:
         Returns:
             List[Student]: List of all students"""
 
-        return db.query(models.Student).all()
+        return (await db.scalars(select(models.Student))).all()
 
     @staticmethod
-    def get_student_by_email(db: Session, email: str):
+    async def get_student_by_email(db: AsyncSession, email: str):
         """Get a student by email
 
         Args:
@@ -183,13 +202,13 @@ class UserCrud:
         Returns:
             Student: Student details"""
 
-        existing_student = db.query(models.Student).filter(
-            models.Student.email == email).first()
+        existing_student = await db.scalar(select(models.Student).where(
+            models.Student.email == email))
 
         return existing_student
 
     @staticmethod
-    def create_student(db: Session, student: user_schema.StudentCreate):
+    async def create_student(db: AsyncSession, student: user_schema.StudentCreate):
         """Create a new student
 
         Args:
@@ -198,11 +217,11 @@ class UserCrud:
 
         return: user_schema.StudentResponse: Student details"""
 
-        existing_student = db.query(models.Student).filter(
-            models.Student.email == student.email).first()
+        existing_student = await db.scalar(select(models.Student).where(
+            models.Student.email == student.email))
 
-        existing_student_id = db.query(models.Student).filter(
-            models.Student.student_id == student.student_id).first()
+        existing_student_id = await db.scalar(select(models.Student).where(
+            models.Student.student_id == student.student_id))
 
         if existing_student:
             raise HTTPException(
@@ -218,8 +237,8 @@ class UserCrud:
         try:
             new_student = models.Student(**student.model_dump())
             db.add(new_student)
-            db.commit()
-            db.refresh(new_student)
+            await db.commit()
+            await db.refresh(new_student)
 
         except Exception as e:
             raise HTTPException(
@@ -231,46 +250,90 @@ class UserCrud:
         return new_student
 
     @staticmethod
-    def add_student_csv(db: Session, students: list[user_schema.StudentCreate]):
+    async def add_student_csv(db: AsyncSession, students: list[user_schema.StudentImport],
+                              chunk_size: int = CSV_IMPORT_CHUNK_SIZE) -> dict:
         """Add students from a csv file
 
+        Students are handled in chunks, each chunk costs one query to find
+        the emails and ids already registered, one multi-row insert and one commit.
+
         Args:
             db (Session): Database session
-            students (List[faculty_schema.StudentCreate]): List of student details
+            students (List[user_schema.StudentImport]): List of student details
+            chunk_size (int): Number of students inserted per transaction
 
         Returns:
-            List[Student]: List of all students added"""
-
-        new_students = []
-
-        for student in students:
-            existing_student = db.query(models.Student).filter(
-                models.Student.email == student.email).first()
-
-            existing_student_id = db.query(models.Student).filter(
-                models.Student.student_id == student.student_id).first()
-
-            if existing_student or existing_student_id:
+            dict: {"added" : int, "skipped" : int}"""
+
+        added = skipped = 0
+
+        for start in range(0, len(students), chunk_size):
+            chunk = students[start:start + chunk_size]
+            emails = {student.email for student in chunk}
+            student_ids = {student.student_id for student in chunk}
+
+            existing = (await db.execute(
+                select(models.Student.email, models.Student.student_id).where(
+                    or_(models.Student.email.in_(emails),
+                        models.Student.student_id.in_(student_ids))))).all()
+            seen_emails = {email for email, _ in existing}
+            seen_ids = {student_id for _, student_id in existing}
+
+            new_students = []
+            for student in chunk:
+                # already registered or repeated in the file
+                if student.email in seen_emails or student.student_id in seen_ids:
+                    skipped += 1
+                    continue
+                seen_emails.add(student.email)
+                seen_ids.add(student.student_id)
+                new_students.append({
+                    **student.model_dump(),
+                    "student_id_suffix": student.student_id[-models.STUDENT_ID_SUFFIX_LENGTH:],
+                })
+
+            if not new_students:
                 continue
 
             try:
-                new_student = models.Student(**student.model_dump())
-                db.add(new_student)
-                db.commit()
-                db.refresh(new_student)
-                new_students.append(new_student)
+                # rows registered concurrently since the lookup are ignored
+                result = await db.execute(
+                    insert(models.Student.__table__)
+                    .prefix_with("IGNORE", dialect="mysql")
+                    .prefix_with("OR IGNORE", dialect="sqlite"),
+                    new_students)
+                await db.commit()
 
             except Exception as e:
+                await db.rollback()
                 raise HTTPException(
                     status_code=400,
                     detail=f"An error occurred while attempting to signup student {
                         e}"
                 )
 
-        return new_students
+            inserted = result.rowcount if result.rowcount >= 0 else len(
+                new_students)
+            added += inserted
+            skipped += len(new_students) - inserted
+
+        return {"added": added, "skipped": skipped}
+
+    @staticmethod
+    async def get_import_job(db: AsyncSession, job_id: str):
+        """Get a student import job by id
+
+        Args:
+            db (Session): Database session
+            job_id (str): Import job id
+
+        Returns:
+            ImportJob: Import job progress"""
+
+        return await db.get(models.ImportJob, job_id)
 
     @ staticmethod
-    def delete_student(db: Session, student_id: Optional[str] = None, email: Optional[str] = None):
+    async def delete_student(db: AsyncSession, student_id: Optional[str] = None, email: Optional[str] = None):
         """Delete a student
 
         Args:
@@ -284,21 +347,21 @@ class UserCrud:
             return False
 
         if student_id:
-            existing_student = db.query(models.Student).filter(
-                models.Student.student_id == student_id).first()
+            existing_student = await db.scalar(select(models.Student).where(
+                models.Student.student_id == student_id))
         else:
-            existing_student = db.query(models.Student).filter(
-                models.Student.email == email).first()
+            existing_student = await db.scalar(select(models.Student).where(
+                models.Student.email == email))
 
         if existing_student:
-            db.delete(existing_student)
-            db.commit()
+            await db.delete(existing_student)
+            await db.commit()
             return True
 
         return False
 
     @ staticmethod
-    def reset_password(db: Session, email: str, new_password: str):
+    async def reset_password(db: AsyncSession, email: str, new_password: str):
         """Reset a user's password
 
         Args:
@@ -309,18 +372,18 @@ class UserCrud:
         Returns:
             bool: True if password was reset, False otherwise"""
 
-        existing_user = db.query(models.User).filter(
-            models.User.email == email).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.email == email))
 
         if existing_user:
-            existing_user.hash_password(new_password)
-            db.commit()
+            existing_user.password = await password_hasher.hash(new_password)
+            await db.commit()
             return True
 
         return False
 
     @staticmethod
-    def update_user(db: Session, user_id: str, user: user_schema.UserUpdate):
+    async def update_user(db: AsyncSession, user_id: str, user: user_schema.UserUpdate):
         """Update a user's details
 
         Args:
@@ -331,12 +394,16 @@ class UserCrud:
         Returns:
             bool: True if user was updated, False otherwise"""
 
-        existing_user = db.query(models.User).filter(
-            models.User.user_id == user_id).first()
+        existing_user = await db.scalar(select(models.User).where(
+            models.User.user_id == user_id))
 
         if existing_user:
-            existing_user.update_user(**user.model_dump())
-            db.commit()
+            user_data = user.model_dump()
+            password = user_data.pop("password", None)
+            existing_user.update_user(**user_data)
+            if password:
+                existing_user.password = await password_hasher.hash(password)
+            await db.commit()
             return True
 
         return False
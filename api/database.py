@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from dotenv import load_dotenv
 import os
@@ -10,21 +11,34 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 DB_PORT = os.getenv("DB_PORT")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
 
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{
     DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{
+    DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Synchronous engine, used for schema creation and migrations
 engine = create_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Asynchronous engine, used by the request handlers
+async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                   pool_size=DB_POOL_SIZE,
+                                   max_overflow=DB_MAX_OVERFLOW,
+                                   pool_pre_ping=True,
+                                   pool_recycle=3600)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+
 # Create the base class for the models
 Base = declarative_base()
 
 
-def get_db():
-    """Provides a database session."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Provides an async database session."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,14 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from . import models, database
 from .routers import (user_routes, available_routes,
                       appointment_routes, app_token, pi_message_routes,
-                      notifications_routes, ws_routes)
-from .utils import validate_api_key
+                      notifications_routes, ws_routes, metrics_routes)
+from .utils import (validate_api_key, import_jobs, pi_message_stream, broker,
+                    sms_utils, mail_utils, outbox, notification_retention)
 from fastapi import Depends
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop the background workers"""
+    await broker.broker.start()
+    await import_jobs.import_job_queue.start()
+    await sms_utils.sms_notifier.start()
+    await mail_utils.mail_service.start()
+    await outbox.outbox_dispatcher.start()
+    await notification_retention.notification_retention.start()
+    yield
+    await notification_retention.notification_retention.stop()
+    pi_message_stream.pi_message_hub.close()
+    await outbox.outbox_dispatcher.stop()
+    await mail_utils.mail_service.stop()
+    await sms_utils.sms_notifier.stop()
+    await import_jobs.import_job_queue.stop()
+    await broker.broker.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -18,6 +39,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods (GET, POST, etc.).
     allow_headers=["*"],  # Allows all headers.
+    # lets the dashboard read the cursor of paginated lists
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -35,3 +58,5 @@ app.include_router(pi_message_routes.router, prefix="/api/v1",
                    dependencies=[Depends(validate_api_key.validate_api_key)])
 app.include_router(notifications_routes.router, prefix="/api/v1",
                    dependencies=[Depends(validate_api_key.validate_api_key)])
+app.include_router(metrics_routes.router, prefix="/api/v1",
+                   dependencies=[Depends(validate_api_key.validate_api_key)])
@@ -1,15 +1,19 @@
 import bcrypt
 import os
+import uuid
 from dotenv import load_dotenv
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import (Column, Integer, String, ForeignKey, Date, DateTime, Time,
+                        Text, Index)
+from sqlalchemy.orm import relationship, validates
 from api.database import Base
 from datetime import datetime
-from passlib.context import CryptContext
+from api.utils.password_utils import pwd_context
 
 
 load_dotenv()
 
+STUDENT_ID_SUFFIX_LENGTH = 4
+
 
 class User(Base):
     """User model
@@ -17,6 +21,9 @@ class User(Base):
     Methods:
         hash_password: Hashes the user's password
         check_password: Verifies the user's password
+
+    Request handlers should use utils.password_utils.password_hasher instead,
+    which runs bcrypt off the event loop.
     """
     __tablename__ = "faculty"
 
@@ -30,7 +37,7 @@ class User(Base):
     created_at = Column(
         String(255), default=lambda: datetime.now().strftime("%B %d, %Y"))
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
 
     def hash_password(self, password: str) -> None:
         self.password = self.pwd_context.hash(password)
@@ -54,7 +61,8 @@ class User(Base):
 class PiMessage(Base):
     """PiMessage model
 
-    user_id as foreign key in the available model"""
+    user_id as foreign key in the available model,
+    version is bumped on every update and used as the message ETag"""
 
     __tablename__ = "pi_message"
 
@@ -66,6 +74,12 @@ class PiMessage(Base):
     message = Column(String(255), nullable=False)
     created_at = Column(
         String(255), default=lambda: datetime.now().strftime("%B %d, %Y"))
+    updated_at = Column(DateTime, nullable=False,
+                        default=datetime.now, onupdate=datetime.now)
+    version = Column(Integer, nullable=False, default=1)
+    faculty = relationship("User", lazy="raise")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def update_message(self, **kwargs):
         for key, value in kwargs.items():
@@ -85,8 +99,12 @@ class Notification(Base):
         'faculty.user_id', ondelete='CASCADE', name='fk_user_notification'))
     event_type = Column(String(255), nullable=False)
     message = Column(String(255), nullable=False)
-    created_at = Column(
-        String(255), default=lambda: datetime.now().strftime("%B %d, %Y"))
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    # a user's feed is read in id order, from a cursor
+    __table_args__ = (
+        Index("ix_notification_user_id_id", "user_id", "id"),
+    )
 
     def update_notification(self, **kwargs):
         for key, value in kwargs.items():
@@ -105,6 +123,8 @@ class Student(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     student_id = Column(String(255), nullable=False, unique=True)
+    # last digits of student_id, indexed for the kiosk sign-in
+    student_id_suffix = Column(String(STUDENT_ID_SUFFIX_LENGTH), index=True)
     first_name = Column(String(255), nullable=False)
     last_name = Column(String(255), nullable=False)
     email = Column(String(255), index=True, nullable=False, unique=True)
@@ -112,6 +132,11 @@ class Student(Base):
     created_at = Column(
         String(255), default=lambda: datetime.now().strftime("%B %d, %Y"))
 
+    @validates("student_id")
+    def _set_student_id_suffix(self, key, student_id):
+        self.student_id_suffix = student_id[-STUDENT_ID_SUFFIX_LENGTH:]
+        return student_id
+
 
 class Persmission(Base):
     """Permission model"""
@@ -144,7 +169,7 @@ class Admin(Base):
     created_at = Column(
         String(255), default=lambda: datetime.now().strftime("%B %d, %Y"))
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
 
     def _hash_password(self, password: str) -> None:
         self.password = self.pwd_context.hash(password)
@@ -201,15 +226,22 @@ class Available(Base):
     __tablename__ = "available"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    day = Column(String(15), nullable=False)
-    start_time = Column(String(15), nullable=False)
-    end_time = Column(String(15), nullable=False)
+    # MySQL's default collation ignores case, SQLite needs NOCASE for the same
+    day = Column(String(15).with_variant(String(15, collation="NOCASE"), "sqlite"),
+                 nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
     user_id = Column((String(255)), ForeignKey(
         'faculty.user_id', ondelete='CASCADE', name='user_available'), nullable=False)
-    created_at = Column(
-        String(50), default=lambda: datetime.now().strftime("%B %d, %Y"))
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
     faculty = relationship("User", back_populates="availabilities")
 
+    __table_args__ = (
+        # the listing filtered by faculty or by day, paged by id
+        Index("ix_available_user_id_id", "user_id", "id"),
+        Index("ix_available_day_id", "day", "id"),
+    )
+
 
 class Appointment(Base):
     """Appointment model"""
@@ -217,19 +249,25 @@ class Appointment(Base):
     __tablename__ = "appointment"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(String(50), nullable=False)
-    start_time = Column(String(15), nullable=False)
-    end_time = Column(String(15), nullable=False)
+    date = Column(Date, nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
     satus = Column(String(50), nullable=False, default="pending")
     reason = Column(String(255), nullable=False)
     student_id = Column(String(255), ForeignKey(
         'student.student_id', ondelete='CASCADE', name='student_appointment'), nullable=False)
     faculty_id = Column(String(255), ForeignKey(
         'faculty.user_id', ondelete='CASCADE', name='faculty_appointment'), nullable=False)
-    updated_at = Column(
-        String(50), default=lambda: datetime.now().strftime("%B %d, %Y"))
-    created_at = Column(
-        String(50), default=lambda: datetime.now().strftime("%B %d, %Y"))
+    updated_at = Column(DateTime, nullable=False,
+                        default=datetime.now, onupdate=datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    # a faculty's day and a student's appointments are read as index ranges
+    __table_args__ = (
+        Index("ix_appointment_faculty_id_date_start_time",
+              "faculty_id", "date", "start_time"),
+        Index("ix_appointment_student_id_date", "student_id", "date"),
+    )
 
 
 class Secret(Base):
@@ -237,3 +275,54 @@ class Secret(Base):
 
     key_id = Column(String(250), primary_key=True)
     api_secret_key = Column(String(1000), nullable=False)
+
+
+class ImportJob(Base):
+    """Import job model
+
+    progress of a student roster (CSV) import running in the background"""
+
+    __tablename__ = "import_job"
+
+    id = Column(String(36), primary_key=True,
+                default=lambda: str(uuid.uuid4()))
+    status = Column(String(20), nullable=False, default="queued")
+    filename = Column(String(255), nullable=False)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_added = Column(Integer, nullable=False, default=0)
+    rows_skipped = Column(Integer, nullable=False, default=0)
+    rows_invalid = Column(Integer, nullable=False, default=0)
+    error = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False,
+                        default=datetime.now, onupdate=datetime.now)
+
+
+class OutboxMessage(Base):
+    """Outbox model
+
+    side effect (websocket, sms or email) of a change, written in the same
+    transaction as the change and delivered by the outbox dispatcher"""
+
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String(64), nullable=False, unique=True)
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(255), nullable=True)
+    # idempotency key of the first message of the sms digest this one was
+    # merged into, the digest is retried with the same messages
+    digest_key = Column(String(64), nullable=True)
+    payload = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_outbox_channel_recipient_status", "channel", "recipient", "status"),
+        Index("ix_outbox_digest_key", "digest_key"),
+    )
@@ -2,9 +2,10 @@ import os
 from .. import database
 from ..crud import crud_user
 from ..utils import jwt_utils
+from ..utils.password_utils import password_hasher
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -15,12 +16,12 @@ user_crud = crud_user.UserCrud()
 router = APIRouter()
 
 
-def authenticate_user(db, username: str, password: str):
-    user = user_crud.get_user_by_email(
+async def authenticate_user(db, username: str, password: str):
+    user = await user_crud.get_user_by_email(
         db, email=username)
     if not user:
         return False
-    if not user.check_password(password):
+    if not await password_hasher.verify(password, user.password):
         return False
     return user
 
@@ -28,9 +29,9 @@ def authenticate_user(db, username: str, password: str):
 @router.post("/token")
 async def create_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=400,
@@ -1,18 +1,22 @@
 
 
-import logging
 from .. import database
 from ..crud import crud_appointment, crud_user
 from ..schemas import available_schema as schemas
 from ..schemas import response_schema
-from ..utils import jwt_utils, sms_utils
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from ..utils import jwt_utils, outbox, pagination
+from typing import List, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from ..routers.ws_routes import create_notification_route as ws_create_notification
 from ..schemas.notification_schema import NotificationSchema
-from datetime import datetime
+from datetime import datetime, date, time
+
+# how the values of an appointment cursor are read back, per sort
+APPOINTMENT_CURSOR_PARSERS = {
+    "id": (int,),
+    "date": (date.fromisoformat, time.fromisoformat, int),
+}
 
 router = APIRouter()
 
@@ -22,7 +26,7 @@ user_crud = crud_user.UserCrud()
 
 
 @router.post("/appointment/create/", response_model=response_schema.CreateAppointmentResponse)
-async def create_appointment(appointment: schemas.CreateAppointment, db: Session = Depends(database.get_db),
+async def create_appointment(appointment: schemas.CreateAppointment, db: AsyncSession = Depends(database.get_db),
                              token: str = Depends(jwt_utils.oauth2_scheme)) -> response_schema.CreateAppointmentResponse:
     """Create a new appointment
 
@@ -34,19 +38,23 @@ async def create_appointment(appointment: schemas.CreateAppointment, db: Session
 
     Returns:
 
-       response_schema.CreateAppointmentResponse: appointment details"""
+       response_schema.CreateAppointmentResponse: appointment details
+
+    Raises 409 if the faculty is not available or already booked at that time"""
 
     jwt_utils.verify_token(token)
 
-    created_appt = appointment_crud.appointment_create(db, appointment)
     user_id = appointment.faculty_id
 
-    formated_date = datetime.strptime(
-        appointment.date, "%Y-%m-%d").strftime("%B %d, %Y")
+    # locks the faculty until the appointment is committed
+    await appointment_crud.check_time_slot(
+        db, user_id, appointment.date, appointment.start_time, appointment.end_time)
+
+    formated_date = appointment.date.strftime("%B %d, %Y")
 
     msg_notification = f"New appointment scheduled from"
-    msg_notification += f" {appointment.start_time}"
-    msg_notification += f" to {appointment.end_time}"
+    msg_notification += f" {appointment.start_time:%H:%M}"
+    msg_notification += f" to {appointment.end_time:%H:%M}"
     msg_notification += f" on {formated_date}"
 
     notification_data = NotificationSchema(
@@ -55,35 +63,55 @@ async def create_appointment(appointment: schemas.CreateAppointment, db: Session
         message=msg_notification
     )
 
-    try:
-        await ws_create_notification(user_id, notification_data, db)
-    except Exception as e:
-        logging.error("Error sending notification", e)
-    try:
-        await sms_utils.send_sms(message=msg_notification)
-    except Exception as e:
-        logging.error("Error sending sms", e)
+    # committed together with the appointment, delivered by the outbox
+    await outbox.stage_notification(db, notification_data)
+    created_appt = await appointment_crud.appointment_create(db, appointment)
+    outbox.outbox_dispatcher.wake()
 
     return created_appt
 
 
 @router.get("/appointments/", response_model=List[response_schema.CreateAppointmentResponse])
-def get_appointments(db: Session = Depends(database.get_db),
-                     token: str = Depends(jwt_utils.oauth2_scheme)) -> List[response_schema.CreateAppointmentResponse]:
-    """Get all availabilities
+async def get_appointments(response: Response,
+                           limit: int = Query(pagination.PAGE_SIZE, ge=1, le=pagination.PAGE_MAX),
+                           after: Optional[str] = None,
+                           sort: Literal["id", "date"] = "id",
+                           faculty_id: Optional[str] = None,
+                           student_id: Optional[str] = None,
+                           status: Optional[str] = None,
+                           start_date: Optional[date] = None,
+                           end_date: Optional[date] = None,
+                           db: AsyncSession = Depends(database.get_db),
+                           token: str = Depends(jwt_utils.oauth2_scheme)) -> List[response_schema.CreateAppointmentResponse]:
+    """Get a page of the appointments
 
     Args:
 
-        None
+        limit (int): Maximum number of appointments (default 50, at most 200)
+        after (str): Cursor, the X-Next-Cursor header of the previous page
+        sort (str): "id" (creation order) or "date" (date and start time)
+        faculty_id (str): Only the appointments of this faculty
+        student_id (str): Only the appointments of this student
+        status (str): Only the appointments with this status
+        start_date (date): Only the appointments on or after this day (YYYY-MM-DD)
+        end_date (date): Only the appointments on or before this day (YYYY-MM-DD)
 
     Returns:
 
-        List[Available]: List of all availabilities"""
+        List[Appointment]: List of appointments, the X-Next-Cursor header is
+        set when there are more"""
 
     jwt_utils.verify_token(token)
 
+    after_values = (pagination.decode_cursor(after, *APPOINTMENT_CURSOR_PARSERS[sort])
+                    if after else None)
+    columns = crud_appointment.APPOINTMENT_SORTS[sort]
+
     try:
-        return appointment_crud.get_appointments(db)
+        # one extra row tells whether there is a next page
+        appointments = await appointment_crud.get_appointments(
+            db, limit=limit + 1, after=after_values, sort=sort, faculty_id=faculty_id,
+            student_id=student_id, status=status, start_date=start_date, end_date=end_date)
 
     except Exception as e:
 
@@ -93,18 +121,23 @@ def get_appointments(db: Session = Depends(database.get_db),
                 e}"
         )
 
+    return pagination.paginate(appointments, limit, response, lambda appointment: (
+        pagination.encode_cursor(*(getattr(appointment, column.key) for column in columns))))
+
 
 @router.get("/appointments/get-by-user/{user_id}",
             response_model=List[response_schema.CreateAppointmentResponse])
-def get_appointments_by_user(user_id: str, db: Session = Depends(database.get_db),
-                             token: str = Depends(jwt_utils.oauth2_scheme)
-                             ) -> List[response_schema.CreateAppointmentResponse]:
+async def get_appointments_by_user(user_id: str,
+                                   role: Optional[Literal["faculty", "student"]] = None,
+                                   db: AsyncSession = Depends(database.get_db),
+                                   token: str = Depends(jwt_utils.oauth2_scheme)
+                                   ) -> List[response_schema.CreateAppointmentResponse]:
     """Get all appointments by user
 
     Args:
 
-        faculty_id Optional[str]: User ID, the hootloot ID
-        student_id Optional[str]: User ID, the hootloot ID  
+        user_id (str): User ID, the hootloot ID
+        role Optional[str]: "faculty" or "student", the appointments of either role if not given
 
     Returns:
 
@@ -113,7 +146,7 @@ def get_appointments_by_user(user_id: str, db: Session = Depends(database.get_db
     jwt_utils.verify_token(token)
 
     try:
-        return appointment_crud.get_appointments_by_user(db, user_id)
+        return await appointment_crud.get_appointments_by_user(db, user_id, role)
 
     except Exception as e:
         raise HTTPException(
@@ -125,8 +158,8 @@ def get_appointments_by_user(user_id: str, db: Session = Depends(database.get_db
 
 @router.get("/appointment/get-by-id/{appointment_id}",
             response_model=response_schema.GetAppointmentByIdResponse)
-def get_appointment_by_id(appointment_id: int, db: Session = Depends(database.get_db),
-                          token: str = Depends(jwt_utils.oauth2_scheme)) -> response_schema.GetAppointmentByIdResponse:
+async def get_appointment_by_id(appointment_id: int, db: AsyncSession = Depends(database.get_db),
+                                token: str = Depends(jwt_utils.oauth2_scheme)) -> response_schema.GetAppointmentByIdResponse:
     """Get appointment by ID
 
     Args:
@@ -139,7 +172,7 @@ def get_appointment_by_id(appointment_id: int, db: Session = Depends(database.ge
 
     jwt_utils.verify_token(token)
 
-    appointment = appointment_crud.get_appointment_by_id(db, appointment_id)
+    appointment = await appointment_crud.get_appointment_by_id(db, appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Availability not found")
     return appointment
@@ -149,7 +182,7 @@ def get_appointment_by_id(appointment_id: int, db: Session = Depends(database.ge
             response_model=response_schema.GetAppointmentByIdResponse)
 async def update_appointment(appointment_id: int,
                              appointment_update: schemas.AppointmentUpdate,
-                             db: Session = Depends(database.get_db),
+                             db: AsyncSession = Depends(database.get_db),
                              token: str = Depends(jwt_utils.oauth2_scheme)) -> response_schema.GetAppointmentByIdResponse:
     """Update an appointment by ID
 
@@ -160,42 +193,54 @@ async def update_appointment(appointment_id: int,
 
     Returns:
 
-        schemas.GetAppointmentByIdResponse: Updated appointment details"""
+        schemas.GetAppointmentByIdResponse: Updated appointment details
+
+    Raises 409 if the faculty is not available or already booked at the new time"""
 
     jwt_utils.verify_token(token)
 
-    update_appt = appointment_crud.update_appointment(
-        db, appointment_id, appointment_update)
+    appointment = await appointment_crud.get_appointment_by_id(db, appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
 
-    user_id = appointment_update.faculty_id
+    # fields left out of the update keep their value
+    changes = appointment_update.model_dump(exclude_none=True)
+    faculty_id = changes.get("faculty_id", appointment.faculty_id)
+    day = changes.get("date", appointment.date)
+    start_time = changes.get("start_time", appointment.start_time)
+    end_time = changes.get("end_time", appointment.end_time)
 
-    formated_date = datetime.strptime(
-        appointment_update.date, "%Y-%m-%d").strftime("%B %d, %Y")
+    # a reason change or a cancelled appointment is not checked again, the
+    # faculty may have changed their availability since the booking
+    moved = (faculty_id, day, start_time, end_time) != (
+        appointment.faculty_id, appointment.date, appointment.start_time, appointment.end_time)
+    if moved and appointment.satus not in crud_appointment.CANCELLED_STATUSES:
+        await appointment_crud.check_time_slot(
+            db, faculty_id, day, start_time, end_time, appointment_id=appointment_id)
+
+    formated_date = day.strftime("%B %d, %Y")
 
     msg_notification = f"Appt updated, New appt from"
-    msg_notification += f" {appointment_update.start_time}"
-    msg_notification += f" to {appointment_update.end_time}"
+    msg_notification += f" {start_time:%H:%M}"
+    msg_notification += f" to {end_time:%H:%M}"
     msg_notification += f" on {formated_date}"
 
     notification_data = NotificationSchema(
-        user_id=appointment_update.faculty_id,
+        user_id=faculty_id,
         event_type="appointment_updated",
         message=msg_notification
     )
-    try:
-        await ws_create_notification(user_id, notification_data, db)
-    except Exception as e:
-        print("Error sending notification", e)
-    try:
-        await sms_utils.send_sms(message=msg_notification)
-    except Exception as e:
-        logging.error("Error sending sms", e)
+
+    await outbox.stage_notification(db, notification_data)
+    update_appt = await appointment_crud.update_appointment(
+        db, appointment_id, appointment_update)
+    outbox.outbox_dispatcher.wake()
 
     return update_appt
 
 
 @router.delete("/appointment/delete/{appointment_id}", response_model=Optional[bool])
-async def delete_update_appointment(appointment_id: int, db: Session = Depends(database.get_db),
+async def delete_update_appointment(appointment_id: int, db: AsyncSession = Depends(database.get_db),
                                     token: str = Depends(jwt_utils.oauth2_scheme)) -> bool:
     """Delete an appointment by ID
 
@@ -209,19 +254,16 @@ async def delete_update_appointment(appointment_id: int, db: Session = Depends(d
 
     jwt_utils.verify_token(token)
 
-    appointment_delete = appointment_crud.get_appointment_by_id(
+    appointment_delete = await appointment_crud.get_appointment_by_id(
         db, appointment_id)
 
     if not appointment_delete:
         raise HTTPException(
             status_code=404, detail="Appointment not found or already canceled")
 
-    deleted = appointment_crud.delete_appointment(db, appointment_id)
+    formated_date = appointment_delete.date.strftime("%B %d, %Y")
 
-    formated_date = datetime.strptime(
-        appointment_delete.date, "%Y-%m-%d").strftime("%B %d, %Y")
-
-    msg_notification = f"Your {appointment_delete.start_time}"
+    msg_notification = f"Your {appointment_delete.start_time:%H:%M}"
     msg_notification += f" appointment"
     msg_notification += f" on {formated_date}"
     msg_notification += f" has been canceled"
@@ -232,24 +274,19 @@ async def delete_update_appointment(appointment_id: int, db: Session = Depends(d
         message=msg_notification
     )
 
+    await outbox.stage_notification(db, notification_data)
+    deleted = await appointment_crud.delete_appointment(db, appointment_id)
+
     if not deleted:
         raise HTTPException(
             status_code=404, detail="Appointment not found or already deleted")
-    try:
-        await ws_create_notification(appointment_delete.faculty_id,
-                                     notification_data, db)
-    except Exception as e:
-        logging.error("Error sending notification", e)
-    try:
-        await sms_utils.send_sms(message=msg_notification)
-    except Exception as e:
-        logging.error("Error sending sms", e)
+    outbox.outbox_dispatcher.wake()
 
     return deleted
 
 
 @router.post("/student/checkin/{id}", response_model=response_schema.CheckinResponse)
-async def student_checkin(id: int, db: Session = Depends(database.get_db),
+async def student_checkin(id: int, db: AsyncSession = Depends(database.get_db),
                           token: str = Depends(jwt_utils.oauth2_scheme)):
     """ Student checkin
 
@@ -264,7 +301,7 @@ async def student_checkin(id: int, db: Session = Depends(database.get_db),
     """
     jwt_utils.verify_token(token)
 
-    appointment = appointment_crud.get_appointment_by_id(
+    appointment = await appointment_crud.get_appointment_by_id(
         db, id)
 
     if not appointment:
@@ -272,8 +309,8 @@ async def student_checkin(id: int, db: Session = Depends(database.get_db),
             status_code=400,
             detail="No appointments found"
         )
-    student = user_crud.get_student_by_id(db, appointment.student_id)
-    msg_notification = f"Your {appointment.start_time} appointment"
+    student = await user_crud.get_student_by_id(db, appointment.student_id)
+    msg_notification = f"Your {appointment.start_time:%H:%M} appointment"
     msg_notification += f" with {student.first_name} {student.last_name}"
     msg_notification += f"  has arrived and checked in"
 
@@ -283,15 +320,9 @@ async def student_checkin(id: int, db: Session = Depends(database.get_db),
         message=msg_notification
     )
 
-    try:
-        await ws_create_notification(user_id=appointment.faculty_id,
-                                     notification_data=notification_data, db=db)
-    except Exception as e:
-        logging.error("Error sending notification", e)
-    try:
-        await sms_utils.send_sms(message=msg_notification)
-    except Exception as e:
-        logging.error("Error sending sms", e)
+    await outbox.stage_notification(db, notification_data)
+    await db.commit()
+    outbox.outbox_dispatcher.wake()
 
     today = datetime.now().date().strftime("%B %d, %Y")
 
@@ -4,10 +4,12 @@ from .. import database
 from ..crud import crud_available
 from ..schemas import available_schema as schemas
 from ..schemas import response_schema
-from ..utils import jwt_utils
+from ..utils import jwt_utils, pagination
+from ..utils.free_slots import free_slot_cache
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -15,6 +17,9 @@ load_dotenv()
 EXPRIRES_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
 
 
+# longest range of days the free slots are computed for at once
+FREE_SLOTS_MAX_DAYS = 62
+
 router = APIRouter()
 
 
@@ -22,9 +27,9 @@ available = crud_available.AvailableCrud()
 
 
 @router.post("/availability/create/", response_model=schemas.Available)
-def create_availability(availability: schemas.CreateAvailability,
-                        db: Session = Depends(database.get_db),
-                        token: str = Depends(jwt_utils.oauth2_scheme)) -> schemas.Available:
+async def create_availability(availability: schemas.CreateAvailability,
+                              db: AsyncSession = Depends(database.get_db),
+                              token: str = Depends(jwt_utils.oauth2_scheme)) -> schemas.Available:
     """Add a new availability: Enter day and time available
 
     Args:
@@ -37,14 +42,14 @@ def create_availability(availability: schemas.CreateAvailability,
 
     jwt_utils.verify_token(token)
 
-    return available.create_availability(db, availability)
+    return await available.create_availability(db, availability)
 
 # Get availability by ID
 
 
 @router.get("/availability/get-by-id/{available_id}", response_model=response_schema.AvailableResponse)
-def get_availability_by_id(available_id: int, db: Session = Depends(database.get_db),
-                           token: str = Depends(jwt_utils.oauth2_scheme)) -> schemas.Available:
+async def get_availability_by_id(available_id: int, db: AsyncSession = Depends(database.get_db),
+                                 token: str = Depends(jwt_utils.oauth2_scheme)) -> schemas.Available:
     """Get availability by ID
 
     Args:
@@ -57,7 +62,7 @@ def get_availability_by_id(available_id: int, db: Session = Depends(database.get
 
     jwt_utils.verify_token(token)
 
-    availability = available.get_availability_by_id(db, available_id)
+    availability = await available.get_availability_by_id(db, available_id)
     if not availability:
         raise HTTPException(status_code=404, detail="Availability not found")
     return response_schema.AvailableResponse(
@@ -70,8 +75,8 @@ def get_availability_by_id(available_id: int, db: Session = Depends(database.get
 
 
 @router.get("/availability/get-by-user/{faculty_id}", response_model=List[response_schema.AvailableResponse])
-def get_availability_by_user(faculty_id: str, db: Session = Depends(database.get_db),
-                             token: str = Depends(jwt_utils.oauth2_scheme)):
+async def get_availability_by_user(faculty_id: str, db: AsyncSession = Depends(database.get_db),
+                                   token: str = Depends(jwt_utils.oauth2_scheme)):
     """Get availability by user
 
     Args:
@@ -85,7 +90,7 @@ def get_availability_by_user(faculty_id: str, db: Session = Depends(database.get
     jwt_utils.verify_token(token)
     results = []
 
-    avail = available.get_availability_by_user(db, faculty_id)
+    avail = await available.get_availability_by_user(db, faculty_id)
 
     if not avail:
         raise HTTPException(status_code=404, detail="Availability not found")
@@ -100,29 +105,93 @@ def get_availability_by_user(faculty_id: str, db: Session = Depends(database.get
     return results
 
 
+@router.get("/availability/free-slots/{faculty_id}", response_model=List[response_schema.FreeSlotResponse])
+async def get_free_slots(faculty_id: str, start_date: date, end_date: Optional[date] = None,
+                         slot_minutes: int = Query(30, ge=5, le=480),
+                         db: AsyncSession = Depends(database.get_db),
+                         token: str = Depends(jwt_utils.oauth2_scheme)):
+    """Get the slots a faculty can still be booked for
+
+    Args:
+
+        faculty_id (str): Faculty ID
+        start_date (date): First day (YYYY-MM-DD)
+        end_date (date): Last day (YYYY-MM-DD), start_date if not given
+        slot_minutes (int): Length of a slot in minutes (default 30)
+
+    Returns:
+
+        List[response_schema.FreeSlotResponse]: Free slots in order, the ones
+        already started are left out"""
+
+    jwt_utils.verify_token(token)
+
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= FREE_SLOTS_MAX_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {FREE_SLOTS_MAX_DAYS} days at once")
+
+    slots = await free_slot_cache.get(db, faculty_id, start_date, end_date,
+                                      timedelta(minutes=slot_minutes))
+    now = datetime.now()
+    return [response_schema.FreeSlotResponse(
+        date=start.date().isoformat(),
+        start_time=start.strftime("%H:%M"),
+        end_time=end.strftime("%H:%M")
+    ) for start, end in slots if start >= now]
+
+
 # Get all availabilities
 
 
 @router.get("/availabilities/", response_model=List[response_schema.AvailableResponse])
-def get_all_availabilities(db: Session = Depends(database.get_db),
-                           token: str = Depends(jwt_utils.oauth2_scheme)) -> List[schemas.Available]:
-    """Get all availabilities
+async def get_all_availabilities(response: Response,
+                                 limit: int = Query(pagination.PAGE_SIZE, ge=1,
+                                                    le=pagination.PAGE_MAX),
+                                 after: Optional[int] = Query(None, ge=0),
+                                 faculty_id: Optional[str] = None,
+                                 day: Optional[str] = None,
+                                 db: AsyncSession = Depends(database.get_db),
+                                 token: str = Depends(jwt_utils.oauth2_scheme)) -> List[schemas.Available]:
+    """Get a page of the availabilities
+
+    Args:
+
+        limit (int): Maximum number of availabilities (default 50, at most 200)
+        after (int): Cursor, the X-Next-Cursor header of the previous page
+        faculty_id (str): Only the availabilities of this faculty
+        day (str): Only the availabilities on this day of the week (e.g. Monday)
 
     Returns: 
 
-        List[schemas.Available]: List of all availabilities"""
+        List[schemas.Available]: List of availabilities, the X-Next-Cursor
+        header is set when there are more"""
 
     jwt_utils.verify_token(token)
 
-    return available.get_availabilities(db)
+    # one extra row tells whether there is a next page
+    avail = await available.get_availabilities(
+        db, limit=limit + 1, after=after, faculty_id=faculty_id, day=day)
+    avail = pagination.paginate(avail, limit, response, lambda a: str(a.id))
+
+    return [response_schema.AvailableResponse(
+        id=a.id,
+        faculty_id=a.user_id,
+        day=a.day,
+        start_time=a.start_time,
+        end_time=a.end_time
+    ) for a in avail]
 
 # Update availability by ID
 
 
 @router.put("/availability/update/{available_id}", response_model=schemas.Available)
-def update_availability(available_id: int, availability_update: schemas.AvailableUpdate,
-                        db: Session = Depends(database.get_db),
-                        token: str = Depends(jwt_utils.oauth2_scheme)) -> schemas.Available:
+async def update_availability(available_id: int, availability_update: schemas.AvailableUpdate,
+                              db: AsyncSession = Depends(database.get_db),
+                              token: str = Depends(jwt_utils.oauth2_scheme)) -> schemas.Available:
     """Update an availability by ID
 
     Args:
@@ -136,12 +205,12 @@ def update_availability(available_id: int, availability_update: schemas.Availabl
 
     jwt_utils.verify_token(token)
 
-    return available.update_availability(db, available_id, availability_update)
+    return await available.update_availability(db, available_id, availability_update)
 
 
 @router.delete("/availability/delete/{available_id}", response_model=Optional[bool])
-def delete_availability(available_id: int, db: Session = Depends(database.get_db),
-                        token: str = Depends(jwt_utils.oauth2_scheme)) -> bool:
+async def delete_availability(available_id: int, db: AsyncSession = Depends(database.get_db),
+                              token: str = Depends(jwt_utils.oauth2_scheme)) -> bool:
     """Delete an availability by ID
 
     Args:
@@ -154,7 +223,7 @@ def delete_availability(available_id: int, db: Session = Depends(database.get_db
 
     jwt_utils.verify_token(token)
 
-    deleted = available.delete_availability(db, available_id)
+    deleted = await available.delete_availability(db, available_id)
     if not deleted:
         raise HTTPException(
             status_code=404, detail="Availability not found or already deleted")
@@ -0,0 +1,36 @@
+from ..utils.password_utils import password_hasher
+from ..utils.pi_message_stream import pi_message_hub
+from ..utils.sms_utils import sms_notifier
+from ..utils.mail_utils import mail_service
+from ..utils.outbox import outbox_dispatcher
+from ..utils.notification_retention import notification_retention
+from ..utils.web_socket import connection_registry
+from ..utils.free_slots import free_slot_cache
+from fastapi import APIRouter
+
+
+router = APIRouter()
+
+
+@router.get("/metrics/", response_model=dict)
+async def get_metrics():
+    """Runtime metrics of the worker handling the request
+
+    Returns:
+
+        dict: {"password_hasher" : dict, "pi_message_streams" : dict,
+               "sms" : dict, "mail" : dict, "outbox" : dict,
+               "notification_retention" : dict, "websockets" : dict,
+               "free_slots" : dict}
+    """
+
+    return {
+        "password_hasher": password_hasher.metrics(),
+        "pi_message_streams": pi_message_hub.metrics(),
+        "sms": sms_notifier.metrics(),
+        "mail": mail_service.metrics(),
+        "outbox": outbox_dispatcher.metrics(),
+        "notification_retention": notification_retention.metrics(),
+        "websockets": connection_registry.metrics(),
+        "free_slots": free_slot_cache.metrics(),
+    }
@@ -2,10 +2,11 @@
 from api.crud import crud_notification
 from .. import database
 from ..schemas import response_schema, notification_schema
-from api.utils import jwt_utils
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from api.utils import jwt_utils, pagination
+from typing import List, Optional
+from datetime import date, datetime, time, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter()
@@ -16,7 +17,7 @@ notify = crud_notification.NotificationCrud()
 @router.post("/new/notification/{hootloot_id}", response_model=response_schema.NotificationResponse)
 async def update_user(hootloot_id: str,
                       notification: notification_schema.NotificationSchema,
-                      db: Session = Depends(database.get_db),
+                      db: AsyncSession = Depends(database.get_db),
                       token: str = Depends(jwt_utils.oauth2_scheme)):
     """ show notification to faculty dashboard
     Args:
@@ -42,7 +43,7 @@ async def update_user(hootloot_id: str,
             detail="hootloot_id must be  digits only 0-9"
         )
 
-    is_created, msg = notify.create_notification(
+    is_created, msg = await notify.create_notification(
         db, user_id=notification.user_id, notification=notification)
 
     if not is_created:
@@ -54,6 +55,7 @@ async def update_user(hootloot_id: str,
     try:
         if is_created:
             return response_schema.NotificationResponse(
+                id=msg.id,
                 user_id=notification.user_id,
                 event_type=notification.event_type,
                 message=notification.message
@@ -72,17 +74,30 @@ async def update_user(hootloot_id: str,
 
 
 @router.get("/notifications_by_user/{hootloot_id}", response_model=List[response_schema.NotificationResponse])
-async def get_notification_by_user(hootloot_id: str, db: Session = Depends(database.get_db),
+async def get_notification_by_user(hootloot_id: str, response: Response,
+                                   limit: int = Query(pagination.PAGE_SIZE, ge=1,
+                                                      le=pagination.PAGE_MAX),
+                                   before: Optional[int] = Query(None, ge=1),
+                                   event_type: Optional[str] = None,
+                                   since: Optional[date] = None,
+                                   until: Optional[date] = None,
+                                   db: AsyncSession = Depends(database.get_db),
                                    token: str = Depends(jwt_utils.oauth2_scheme)):
-    """Get all notifications for a user
+    """Get a page of the notifications of a user, newest first
 
     Args:
 
         hootloot_id (str): User id
+        limit (int): Maximum number of notifications (default 50, at most 200)
+        before (int): Cursor, the X-Next-Cursor header of the previous page
+        event_type (str): Only notifications of this event type
+        since (date): Only notifications created on or after this day (YYYY-MM-DD)
+        until (date): Only notifications created on or before this day (YYYY-MM-DD)
 
     Returns:
 
-        list: List of notifications
+        list: List of notifications, the X-Next-Cursor header is set when
+        there are more
     """
     jwt_utils.verify_token(token)
 
@@ -94,13 +109,24 @@ async def get_notification_by_user(hootloot_id: str, db: Session = Depends(datab
             detail="hootloot_id must be  digits only 0-9"
         )
 
-    notifications = notify.get_notification_by_user(db, user_id=hootloot_id)
+    if since and until and since > until:
+        raise HTTPException(
+            status_code=400,
+            detail="since must not be after until"
+        )
+
+    # one extra row tells whether there is a next page
+    notifications = await notify.get_notification_by_user(
+        db, user_id=hootloot_id, limit=limit + 1, before=before, event_type=event_type,
+        since=datetime.combine(since, time.min) if since else None,
+        until=datetime.combine(until + timedelta(days=1), time.min) if until else None)
 
-    return notifications
+    return pagination.paginate(notifications, limit, response,
+                               lambda notification: str(notification.id))
 
 
 @router.delete("/delete/notification/{notification_id}", response_model=dict)
-async def delete_notification_by_id(notification_id: int, db: Session = Depends(database.get_db),
+async def delete_notification_by_id(notification_id: int, db: AsyncSession = Depends(database.get_db),
                                     token: str = Depends(jwt_utils.oauth2_scheme)):
     """Delete a notification by id
 
@@ -122,7 +148,7 @@ async def delete_notification_by_id(notification_id: int, db: Session = Depends(
             detail="notification_id must be  digits only 0-9"
         )
 
-    is_deleted, msg = notify.delete_notification_by_id(
+    is_deleted, msg = await notify.delete_notification_by_id(
         db, notification_id=notification_id)
 
     if not is_deleted:
@@ -136,13 +162,18 @@ async def delete_notification_by_id(notification_id: int, db: Session = Depends(
 
 
 @router.delete("/delete/notifications/{hootloot_id}", response_model=dict)
-async def delete_notification_by_user(hootloot_id: str, db: Session = Depends(database.get_db),
+async def delete_notification_by_user(hootloot_id: str,
+                                      older_than_days: Optional[int] = Query(None, ge=0),
+                                      event_type: Optional[str] = None,
+                                      db: AsyncSession = Depends(database.get_db),
                                       token: str = Depends(jwt_utils.oauth2_scheme)):
-    """Delete all notifications for a user
+    """Delete the notifications of a user
 
     Args:
 
         hootloot_id (str): User id
+        older_than_days (int): Only notifications older than this many days
+        event_type (str): Only notifications of this event type
 
     Returns:
 
@@ -158,8 +189,10 @@ async def delete_notification_by_user(hootloot_id: str, db: Session = Depends(da
             detail="hootloot_id must be  digits only 0-9"
         )
 
-    is_deleted, msg = notify.delete_notification_by_user(
-        db, user_id=hootloot_id)
+    older_than = (datetime.now() - timedelta(days=older_than_days)
+                  if older_than_days is not None else None)
+    is_deleted, msg = await notify.delete_notification_by_user(
+        db, user_id=hootloot_id, older_than=older_than, event_type=event_type)
 
     if not is_deleted:
         raise HTTPException(
@@ -1,14 +1,16 @@
 import os
 import logging
-import pandas as pd
 from api.crud import crud_user, crud_pi_message
 from .. import database
 from ..schemas import response_schema, user_schema, pi_message_schema
 from api.utils import jwt_utils
+from api.utils.pi_message_versions import pi_message_versions, etag_matches
+from api.utils.pi_message_stream import pi_message_hub
 from api.utils.mail_utils import EmailVerification
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from dotenv import load_dotenv
 
@@ -25,10 +27,21 @@ user_crud = crud_user.UserCrud()
 pi_msg = crud_pi_message.PiMessage()
 
 
+def conditional_response(validators: tuple[str, str], if_none_match: Optional[str],
+                         response: Response) -> Optional[Response]:
+    """Set the ETag and Last-Modified headers, return a 304 if the client copy is current"""
+    etag, last_modified = validators
+    headers = {"ETag": etag, "Last-Modified": last_modified}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 @router.put("/pi-message/update/{hootloot_id}", response_model=response_schema.PiMessageResponse)
 async def update_message(hootloot_id: str,
                          message_update: pi_message_schema.PiMessage,
-                         db: Session = Depends(database.get_db)):
+                         db: AsyncSession = Depends(database.get_db)):
     """Update the message to be displayed on the pi
 
     Args:
@@ -62,7 +75,7 @@ async def update_message(hootloot_id: str,
         )
 
     try:
-        is_updated = pi_msg.update_message(
+        is_updated = await pi_msg.update_message(
             db, user_id=hootloot_id, message=message_update)
         if is_updated:
 
@@ -87,8 +100,8 @@ async def update_message(hootloot_id: str,
 
 
 @router.delete("/pi-message/delete/{hootloot_id}", response_model=response_schema.PiMessageResponse)
-def delete_message(hootloot_id: str,
-                   db: Session = Depends(database.get_db)):
+async def delete_message(hootloot_id: str,
+                         db: AsyncSession = Depends(database.get_db)):
     """Delete the message to be displayed on the pi
 
     Args:
@@ -105,7 +118,7 @@ def delete_message(hootloot_id: str,
         )
 
     try:
-        is_deleted = pi_msg.delete_message(db, user_id=hootloot_id)
+        is_deleted = await pi_msg.delete_message(db, user_id=hootloot_id)
         if is_deleted:
             return response_schema.PiMessageResponse(
                 user_id=hootloot_id,
@@ -128,13 +141,18 @@ def delete_message(hootloot_id: str,
 
 
 @router.get("/pi-message/get/{hootloot_id}", response_model=response_schema.PiMessageResponse)
-def get_message(hootloot_id: str,
-                db: Session = Depends(database.get_db)):
+async def get_message(hootloot_id: str,
+                      response: Response,
+                      if_none_match: Optional[str] = Header(None),
+                      db: AsyncSession = Depends(database.get_db)):
     """Get the message to be displayed on the pi
 
+    Returns 304 when If-None-Match carries the current ETag of the message
+
     Args:
 
         hootloot_id (str): User id, this the id of the faculty
+        if_none_match (str): ETag of the copy held by the display
     """
 
     try:
@@ -145,8 +163,14 @@ def get_message(hootloot_id: str,
             detail="hootloot_id must be an gigit only 0-9"
         )
 
+    validators = await pi_message_versions.get(db, hootloot_id)
+    if validators:
+        not_modified = conditional_response(validators, if_none_match, response)
+        if not_modified:
+            return not_modified
+
     try:
-        message = pi_msg.get_message(db, user_id=hootloot_id)
+        message = await pi_msg.get_message(db, user_id=hootloot_id)
         if message:
             return response_schema.PiMessageResponse(
                 user_id=hootloot_id,
@@ -169,23 +193,32 @@ def get_message(hootloot_id: str,
 
 
 @router.get("/pi-message/get-all", response_model=List[response_schema.PiMessageResponseWithUserInfo])
-def get_all_messages(db: Session = Depends(database.get_db)):
+async def get_all_messages(response: Response,
+                           if_none_match: Optional[str] = Header(None),
+                           db: AsyncSession = Depends(database.get_db)):
     """Get all messages to be displayed on the pi
 
+    Returns 304 when If-None-Match carries the current ETag of the listing
+
     Args:
 
-        None
+        if_none_match (str): ETag of the copy held by the display
     """
     messag_results = []
 
+    validators = await pi_message_versions.get_all(db)
+    if validators:
+        not_modified = conditional_response(validators, if_none_match, response)
+        if not_modified:
+            return not_modified
+
     try:
-        messages = pi_msg.get_all_messages(db)
+        messages = await pi_msg.get_all_messages(db)
         if messages:
             for message in messages:
-                user = user_crud.get_user_by_id(db, user_id=message.user_id)
                 messag_results.append(response_schema.PiMessageResponseWithUserInfo(
-                    first_name=user.first_name,
-                    last_name=user.last_name,
+                    first_name=message.faculty.first_name,
+                    last_name=message.faculty.last_name,
                     user_id=message.user_id,
                     message=message.message,
                     duration=message.duration,
@@ -204,3 +237,49 @@ def get_all_messages(db: Session = Depends(database.get_db)):
             status_code=400,
             detail="An error occurred while attempting to get users"
         )
+
+
+def event_stream_response(user_id: Optional[str], last_event_id: Optional[str]) -> StreamingResponse:
+    """Open a server-sent event stream of pi message changes"""
+    return StreamingResponse(
+        pi_message_hub.stream(user_id=user_id, last_event_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/pi-message/stream")
+async def stream_all_messages(last_event_id: Optional[str] = Header(None)):
+    """Stream the changes of every faculty's pi message as server-sent events
+
+    Events are `update` (the new message) and `delete`, a `reset` event means
+    the changes since Last-Event-ID are no longer available and the display
+    should fetch /pi-message/get-all again.
+
+    Args:
+
+        last_event_id (str): Id of the last event received, sent by EventSource on reconnect
+    """
+    return event_stream_response(None, last_event_id)
+
+
+@router.get("/pi-message/stream/{hootloot_id}")
+async def stream_message(hootloot_id: str,
+                         last_event_id: Optional[str] = Header(None)):
+    """Stream the changes of a faculty's pi message as server-sent events
+
+    Args:
+
+        hootloot_id (str): User id, this the id of the faculty
+        last_event_id (str): Id of the last event received, sent by EventSource on reconnect
+    """
+
+    try:
+        int(hootloot_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="hootloot_id must be an gigit only 0-9"
+        )
+
+    return event_stream_response(hootloot_id, last_event_id)
@@ -1,13 +1,13 @@
 import os
 import logging
-import pandas as pd
 from api.crud import crud_user
-from .. import database
+from .. import database, models
 from ..schemas import response_schema, user_schema
-from api.utils import jwt_utils
+from api.utils import jwt_utils, import_jobs
 from api.utils.mail_utils import EmailVerification
+from api.utils.password_utils import password_hasher
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from dotenv import load_dotenv
@@ -25,9 +25,11 @@ user_crud = crud_user.UserCrud()
 
 
 @router.post("/verify-email/", response_model=dict)
-def send_email_verification(email: user_schema.EmailVerification) -> dict:
+async def send_email_verification(email: user_schema.EmailVerification) -> dict:
     """Verify email address using verification code (sent to the user) 6 characters long
 
+    The email is queued and sent in the background, the code is returned right away
+
     Args:
 
         Email (str): email address
@@ -78,7 +80,7 @@ def verify_email_code(verify: user_schema.EmailVerificationCode):
 
 
 @router.post("/signup/", response_model=response_schema.UserResponse)
-async def create_user(user: user_schema.UserCreate, db: Session = Depends(database.get_db)):
+async def create_user(user: user_schema.UserCreate, db: AsyncSession = Depends(database.get_db)):
     """Create a new user
 
     args:
@@ -111,7 +113,7 @@ async def create_user(user: user_schema.UserCreate, db: Session = Depends(databa
             detail="Invalid southern email address"
         )
 
-    new_user = user_crud.create_user(db=db, user=user)
+    new_user = await user_crud.create_user(db=db, user=user)
 
     return response_schema.UserResponse(
         id=new_user.id,
@@ -127,7 +129,7 @@ async def create_user(user: user_schema.UserCreate, db: Session = Depends(databa
 @router.post("/signin/", response_model=response_schema.SigninResponse)
 async def login_user(
     login_request: user_schema.LoginRequest,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
     """Login a user by email and password
 
@@ -135,7 +137,7 @@ async def login_user(
     ----------
         login_request : user_schema.LoginRequest
             User login detail
-        db : Session
+        db : AsyncSession
             Database session
 
     Raises
@@ -157,7 +159,7 @@ async def login_user(
             detail="Invalid southern email address"
         )
 
-    user = user_crud.get_user_by_email(db, email=login_request.email)
+    user = await user_crud.get_user_by_email(db, email=login_request.email)
 
     if not user:
         raise HTTPException(
@@ -165,7 +167,7 @@ async def login_user(
             detail="User not found"
         )
 
-    if not user.check_password(login_request.password):
+    if not await password_hasher.verify(login_request.password, user.password):
         raise HTTPException(
             status_code=400,
             detail="Invalid email or password"
@@ -185,7 +187,7 @@ async def login_user(
 @router.post("/signup-student/", response_model=response_schema.CreateStudentResponse)
 async def create_student_user(
     student: user_schema.StudentCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     token: str = Depends(jwt_utils.oauth2_scheme),
 ):
     """Create a new student user
@@ -214,7 +216,7 @@ async def create_student_user(
             detail="Invalid southern email address"
         )
 
-    student = user_crud.create_student(db=db, student=student)
+    student = await user_crud.create_student(db=db, student=student)
 
     return response_schema.CreateStudentResponse(
         id=student.id,
@@ -226,10 +228,10 @@ async def create_student_user(
     )
 
 
-@router.post("/students/upload")
+@router.post("/students/upload", response_model=response_schema.ImportJobResponse)
 async def upload_students_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     token: str = Depends(jwt_utils.oauth2_scheme),
 ):
     """Upload a CSV file containing student details
@@ -237,6 +239,8 @@ async def upload_students_csv(
         Must contain the following columns in the CSV file:
             Email, ID, Pref. First, Last Name
 
+        The import runs in the background, poll /students/upload/{job_id} for its progress
+
     Args:
 
         file : UploadFile
@@ -250,7 +254,7 @@ async def upload_students_csv(
 
     returns:
 
-        dict: {"status" : str, "added_students" : added_students }"""
+        response_schema.ImportJobResponse: the queued import job"""
 
     jwt_utils.verify_token(token)
 
@@ -259,42 +263,53 @@ async def upload_students_csv(
             status_code=400, detail="Invalid file type. Please upload a CSV file.")
 
     try:
-        df = pd.read_csv(file.file)
+        job = await import_jobs.import_job_queue.submit(db, file)
+    except Exception as e:
+        logging.error(e)
+        raise HTTPException(
+            status_code=400, detail=f"Error processing the file: {e}")
 
-        # Map CSV headers to match DB fields
-        df = df.rename(columns={
-            'Email': 'email',
-            'ID': 'student_id',
-            'Pref. First': 'first_name',
-            'Last Name': 'last_name',
-        })
-        df['phone_number'] = '0000000000'
-        df['student_id'] = df['student_id'].astype(str)
+    return response_schema.ImportJobResponse.model_validate(job)
 
-        # Filter out unnecessary columns
-        required_columns = ['email', 'student_id',
-                            'first_name', 'last_name', 'phone_number']
-        df = df[required_columns]
 
-        # Convert the DataFrame to a list of dictionaries for validation
-        students_data = df.to_dict(orient="records")
+@router.get("/students/upload/{job_id}", response_model=response_schema.ImportJobResponse)
+async def get_upload_status(
+    job_id: str,
+    db: AsyncSession = Depends(database.get_db),
+    token: str = Depends(jwt_utils.oauth2_scheme),
+):
+    """Get the progress of a student CSV import
 
-        # Validate and create student objects
-        students = [user_schema.StudentCreate(
-            **student) for student in students_data]
-        added_students = user_crud.add_student_csv(db=db, students=students)
+    Args:
 
-        return {"status": "success", "added_students": added_students}
+        job_id : str
+            Job id returned by /students/upload
 
-    except Exception as e:
+    raises:
+
+            HTTPException
+                code : 404
+                Import job not found
+
+    returns:
+
+        response_schema.ImportJobResponse: status, rows processed, skipped, invalid and the error if it failed"""
+
+    jwt_utils.verify_token(token)
+
+    job = await user_crud.get_import_job(db, job_id)
+
+    if not job:
         raise HTTPException(
-            status_code=400, detail=f"Error processing the file: {e}")
+            status_code=404, detail="Import job not found")
+
+    return response_schema.ImportJobResponse.model_validate(job)
 
 
 @router.delete("/delete/student/{student_id}", response_model=dict)
 async def delete_student_by_id(
     student_id: str,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     token: str = Depends(jwt_utils.oauth2_scheme),
 ):
     """Delete student by id or email
@@ -315,7 +330,7 @@ async def delete_student_by_id(
 
     jwt_utils.verify_token(token)
 
-    if user_crud.delete_student(db, student_id=student_id):
+    if await user_crud.delete_student(db, student_id=student_id):
         return {"detail": f"User {student_id} deleted successfully"}
 
     return {"detail": f"User {student_id} not found or already deleted"}
@@ -324,7 +339,7 @@ async def delete_student_by_id(
 @router.post("/kiosk-signin/", response_model=response_schema.KioskSigninResponse)
 async def kiosk_login(
     login_request: user_schema.KioskLoginRequest,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
     """Login a user via kiosk (using last 4 digits of ID or full barcode)
     args:
@@ -337,13 +352,27 @@ async def kiosk_login(
                 code : 400
                 No User exists with the provided ID
 
+            HTTPException
+                code : 409
+                More than one student matches the last 4 digits
+
 
     Returns:
 
         user_schema.TokenResponse
     """
 
-    user = user_crud.get_student_by_id(db, login_request.user_id)
+    if len(login_request.user_id) == models.STUDENT_ID_SUFFIX_LENGTH:
+        students = await user_crud.get_students_by_suffix(
+            db, login_request.user_id)
+        if len(students) > 1:
+            raise HTTPException(
+                status_code=409,
+                detail="More than one student matches the provided ID, please use the full ID"
+            )
+        user = students[0] if students else None
+    else:
+        user = await user_crud.get_student_by_id(db, login_request.user_id)
 
     if not user:
         raise HTTPException(
@@ -368,7 +397,7 @@ async def kiosk_login(
 
 @router.get("/users/", response_model=List[response_schema.UserResponse])
 async def get_users(token: str = Depends(jwt_utils.oauth2_scheme),
-                    db: Session = Depends(database.get_db)):
+                    db: AsyncSession = Depends(database.get_db)):
     """Retrieve all users.
 
     Raises
@@ -385,7 +414,7 @@ async def get_users(token: str = Depends(jwt_utils.oauth2_scheme),
     jwt_utils.verify_token(token)
 
     try:
-        users = user_crud.get_users(db)
+        users = await user_crud.get_users(db)
         return users
     except Exception as e:
         logging.error(e)
@@ -396,7 +425,7 @@ async def get_users(token: str = Depends(jwt_utils.oauth2_scheme),
 
 
 @router.get("/user/email/{email}", response_model=response_schema.UserResponse)
-async def get_user_by_email(email: str, db: Session = Depends(database.get_db)):
+async def get_user_by_email(email: str, db: AsyncSession = Depends(database.get_db)):
     """Retrieve a user by email.
 
     Attributes
@@ -418,7 +447,7 @@ async def get_user_by_email(email: str, db: Session = Depends(database.get_db)):
         user_schema.UserResponse
             User detail"""
 
-    user = user_crud.get_user_by_email(db, email)
+    user = await user_crud.get_user_by_email(db, email)
 
     if not user:
         raise HTTPException(
@@ -436,7 +465,7 @@ async def get_user_by_email(email: str, db: Session = Depends(database.get_db)):
 
 
 @router.get("/user/id/{user_id}", response_model=response_schema.UserResponse)
-def get_user_by_id(user_id: str, db: Session = Depends(database.get_db), token: str = Depends(jwt_utils.oauth2_scheme)):
+async def get_user_by_id(user_id: str, db: AsyncSession = Depends(database.get_db), token: str = Depends(jwt_utils.oauth2_scheme)):
     """Retrieve a user by id.
 
     Attributes
@@ -457,12 +486,12 @@ def get_user_by_id(user_id: str, db: Session = Depends(database.get_db), token:
             User detail"""
 
     jwt_utils.verify_token(token)
-    user = user_crud.get_user_by_id(db, user_id)
+    user = await user_crud.get_user_by_id(db, user_id)
     return user
 
 
 @router.get("/students/", response_model=List[response_schema.Get_StudentResponse])
-async def get_students(db: Session = Depends(database.get_db),
+async def get_students(db: AsyncSession = Depends(database.get_db),
                        token: str = Depends(jwt_utils.oauth2_scheme)):
     """Get all students
 
@@ -473,7 +502,7 @@ async def get_students(db: Session = Depends(database.get_db),
     """
     jwt_utils.verify_token(token)
 
-    student = user_crud.get_students(db)
+    student = await user_crud.get_students(db)
     if not student:
         raise HTTPException(
             status_code=404,
@@ -483,7 +512,7 @@ async def get_students(db: Session = Depends(database.get_db),
 
 
 @router.put("/reset-password/", response_model=dict)
-def reset_password(data: user_schema.ResetPassword, db:  Session = Depends(database.get_db)):
+async def reset_password(data: user_schema.ResetPassword, db: AsyncSession = Depends(database.get_db)):
     """Reset user password
 
     Args:
@@ -507,7 +536,7 @@ def reset_password(data: user_schema.ResetPassword, db:  Session = Depends(datab
             status_code=400,
             detail="Password cannot be empty"
         )
-    res = user_crud.reset_password(db, email, password)
+    res = await user_crud.reset_password(db, email, password)
     return {
         "detail": res
     }
@@ -516,7 +545,7 @@ def reset_password(data: user_schema.ResetPassword, db:  Session = Depends(datab
 @router.put("/user/update/{hootloot_id}", response_model=response_schema.UserUpdateResponse)
 async def update_user(hootloot_id: str,
                       user_update: user_schema.UserUpdate,
-                      db: Session = Depends(database.get_db),
+                      db: AsyncSession = Depends(database.get_db),
                       token: str = Depends(jwt_utils.oauth2_scheme)):
     """Update a user by  id
 
@@ -542,7 +571,7 @@ async def update_user(hootloot_id: str,
 
     try:
 
-        is_updated = user_crud.update_user(
+        is_updated = await user_crud.update_user(
             db, user_id=hootloot_id, user=user_update)
 
         if is_updated:
@@ -569,7 +598,7 @@ async def update_user(hootloot_id: str,
 
 
 @ router.delete("/user/delete/{email_or_id}", response_model=dict)
-async def delete_by_email_or_id(email_or_id: str, db: Session = Depends(database.get_db),
+async def delete_by_email_or_id(email_or_id: str, db: AsyncSession = Depends(database.get_db),
                                 token: str = Depends(jwt_utils.oauth2_scheme)):
     """Delete a user by id or by email
 
@@ -594,9 +623,9 @@ async def delete_by_email_or_id(email_or_id: str, db: Session = Depends(database
     jwt_utils.verify_token(token)
 
     try:
-        if user_crud.delete_user(db, email=email_or_id):
+        if await user_crud.delete_user(db, email=email_or_id):
             return {"detail": "User deleted successfully"}
-        elif user_crud.delete_user(db, user_id=email_or_id):
+        elif await user_crud.delete_user(db, user_id=email_or_id):
             return {"detail": "User deleted successfully"}
         else:
             raise HTTPException(
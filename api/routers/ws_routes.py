@@ -1,5 +1,6 @@
+from typing import Optional
 from fastapi import APIRouter, WebSocket, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..utils.web_socket import handle_create_notification, handle_websocket_connection
 from ..database import get_db
 from ..schemas.notification_schema import NotificationSchema
@@ -9,7 +10,7 @@ router = APIRouter()
 
 @router.post("/ws_create_notifications/{user_id}")
 async def create_notification_route(user_id: str, notification_data: NotificationSchema,
-                                    db: Session = Depends(get_db)):
+                                    db: AsyncSession = Depends(get_db)):
     """HTTP route to create a notification.
 
     Args: 
@@ -25,6 +26,14 @@ async def create_notification_route(user_id: str, notification_data: Notificatio
 
 
 @router.websocket("/ws/notifications/{user_id}")
-async def notifications_websocket_route(websocket: WebSocket, user_id: str):
-    """WebSocket endpoint for real-time notifications."""
-    await handle_websocket_connection(websocket, user_id)
+async def notifications_websocket_route(websocket: WebSocket, user_id: str,
+                                        last_id: Optional[int] = None):
+    """WebSocket endpoint for real-time notifications.
+
+    Args:
+
+        user_id (str): User id
+        last_id (int): Id of the last notification received, the missed ones
+            are sent first when reconnecting, or {"type": "reset"} when too
+            many were missed and the feed should be reloaded"""
+    await handle_websocket_connection(websocket, user_id, last_id)
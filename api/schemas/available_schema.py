@@ -1,7 +1,7 @@
-from datetime import datetime, date, time
+import datetime as dt
 from typing import Optional
-from pydantic import Field, BaseModel, constr
-from .common_field_model import CommonField
+from pydantic import Field, BaseModel, constr, field_serializer
+from .common_field_model import CommonField, format_api_value
 
 # Schema for creating a availability (faculty)
 
@@ -12,13 +12,11 @@ class AvailableBase(BaseModel):
     day: str = Field(...,
                      description="The day that the user is available (e.g. Monday)")
 
-    start_time: str = Field(...,
-                            pattern=r'^\d{2}:\d{2}$',
-                            description="The start time for user's availability (e.g. 08:00)")
+    start_time: dt.time = Field(...,
+                                description="The start time for user's availability (e.g. 08:00)")
 
-    end_time: str = Field(...,
-                          pattern=r'^\d{2}:\d{2}$',
-                          description="The end time for user's availability (e.g. 17:00)")
+    end_time: dt.time = Field(...,
+                              description="The end time for user's availability (e.g. 17:00)")
 
     user_id: str = Field(...,
                          description="The id (HootLoot) of the faculty", unique=True)
@@ -29,7 +27,10 @@ class CreateAvailability(AvailableBase):
 
 
 class Available(CommonField, AvailableBase):
-    pass
+
+    @field_serializer('start_time', 'end_time')
+    def format_times(self, value: dt.time) -> str:
+        return format_api_value(value)
 
 
 class AvailableUpdate(BaseModel):
@@ -38,9 +39,9 @@ class AvailableUpdate(BaseModel):
     day: Optional[str] = Field(
         None, description="The day that the user is available"
     )
-    start_time: Optional[str] = Field(
+    start_time: Optional[dt.time] = Field(
         None, description="The start time for user's availability")
-    end_time: Optional[str] = Field(
+    end_time: Optional[dt.time] = Field(
         None, description="The end time for user's availability")
     faculty_id: Optional[str] = Field(
         None, description="The id (HootLoot) of the faculty")
@@ -56,13 +57,11 @@ class AvailableUpdate(BaseModel):
 class AppointmentBase(BaseModel):
     """Request model for creating an appointment"""
 
-    start_time: str = Field(...,
-                            pattern=r'^\d{2}:\d{2}$',
-                            description="The start time for the appointment (e.g. 08:00)")
+    start_time: dt.time = Field(...,
+                                description="The start time for the appointment (e.g. 08:00)")
 
-    end_time: str = Field(...,
-                          pattern=r'^\d{2}:\d{2}$',
-                          description="The end time for the appointment (e.g. 17:00)")
+    end_time: dt.time = Field(...,
+                              description="The end time for the appointment (e.g. 17:00)")
 
     student_id: str = Field(...,
                             description="The id (HootLoot) of the student")
@@ -72,9 +71,8 @@ class AppointmentBase(BaseModel):
 
     reason: str = Field(..., description="The reason for the appointment")
 
-    date: str = Field(...,
-                      pattern=r'^\d{4}-\d{2}-\d{2}$',
-                      description="The date of the appointment")
+    date: dt.date = Field(...,
+                          description="The date of the appointment (e.g. 2024-09-30)")
 
     class Config:
         """Configurations for the schema"""
@@ -86,21 +84,24 @@ class CreateAppointment(AppointmentBase):
 
 
 class Appointment(CommonField, AppointmentBase):
-    pass
+
+    @field_serializer('start_time', 'end_time')
+    def format_times(self, value: dt.time) -> str:
+        return format_api_value(value)
 
 
 class AppointmentUpdate(BaseModel):
     """Request model for updating an appointment"""
 
-    start_time: Optional[str] = Field(
+    start_time: Optional[dt.time] = Field(
         None, description="The start time for the appointment")
-    end_time: Optional[str] = Field(
+    end_time: Optional[dt.time] = Field(
         None, description="The end time for the appointment")
     student_id: Optional[str] = Field(
         None, description="The id (HootLoot) of the student")
     faculty_id: Optional[str] = Field(
         None, description="The id (HootLoot) of the faculty")
-    date: Optional[str] = Field(
+    date: Optional[dt.date] = Field(
         None, description="The date of the appointment")
     reason: Optional[str] = Field(
         None, description="The reason for the appointment")
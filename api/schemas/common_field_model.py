@@ -1,6 +1,19 @@
-from datetime import datetime
+from datetime import datetime, date, time
 from typing import ClassVar
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+def format_api_value(value):
+    """Format a stored date, time or timestamp as the api has always returned it
+
+    dates as 2024-09-30, times as 08:00 and timestamps as September 30, 2024"""
+    if isinstance(value, datetime):
+        return value.strftime("%B %d, %Y")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    return value
 
 
 class CommonField(BaseModel):
@@ -10,6 +23,10 @@ class CommonField(BaseModel):
     created_at: str = Field(...,
                             description="The date and time the record was created")
 
+    @field_validator('created_at', mode='before')
+    def format_created_at(cls, value):
+        return format_api_value(value)
+
     class Config:
         """Configurations for the schema"""
         from_attributes = True
@@ -1,6 +1,7 @@
 from datetime import datetime
-from pydantic import EmailStr, BaseModel, field_validator
+from pydantic import EmailStr, BaseModel, Field, field_validator
 from typing import Optional
+from .common_field_model import format_api_value
 
 
 class CreateStudentResponse(BaseModel):
@@ -95,12 +96,18 @@ class AvailableResponse(BaseModel):
     start_time: str
     end_time: str
 
-    @field_validator('start_time', 'end_time')
+    @field_validator('start_time', 'end_time', mode='before')
     def strip_seconds(cls, value):
         # Convert time from "HH:MM:SS" to "HH:MM"
         if isinstance(value, str) and len(value.split(':')) == 3:
             return value[:-3]
-        return value
+        return format_api_value(value)
+
+
+class FreeSlotResponse(BaseModel):
+    date: str
+    start_time: str
+    end_time: str
 
 
 class CreateAppointmentResponse(BaseModel):
@@ -113,6 +120,10 @@ class CreateAppointmentResponse(BaseModel):
     reason: str
     created_at: str
 
+    @field_validator('date', 'start_time', 'end_time', 'created_at', mode='before')
+    def format_dates(cls, value):
+        return format_api_value(value)
+
     class Config:
         from_attributes = True
         json_encoders = {
@@ -130,6 +141,10 @@ class GetAppointmentByIdResponse(BaseModel):
     reason: str
     created_at: str
 
+    @field_validator('date', 'start_time', 'end_time', 'created_at', mode='before')
+    def format_dates(cls, value):
+        return format_api_value(value)
+
     class Config:
         from_attributes = True
         json_encoders = {
@@ -161,6 +176,21 @@ class PiMessageResponseWithUserInfo(BaseModel):
     message: str
 
 
+class ImportJobResponse(BaseModel):
+    """Response model for a student CSV import job"""
+    job_id: str = Field(validation_alias="id")
+    status: str
+    filename: str
+    rows_processed: int
+    rows_added: int
+    rows_skipped: int
+    rows_invalid: int
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
 class NotificationResponse(BaseModel):
     id: int
     user_id: str
@@ -178,6 +208,10 @@ class CheckinResponse(BaseModel):
     end_time: str
     reason: str
 
+    @field_validator('start_time', 'end_time', mode='before')
+    def format_dates(cls, value):
+        return format_api_value(value)
+
     class Config:
         from_attributes = True
         json_encoders = {
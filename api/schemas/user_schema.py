@@ -99,6 +99,15 @@ class StudentCreate(StudentBase):
     pass
 
 
+class StudentImport(StudentBase):
+    """Request model for a student imported from a roster (CSV)
+
+    rosters do not carry phone numbers, so it is optional"""
+
+    phone_number: Optional[str] = Field(None, description="Phone number must be unique",
+                                        min_length=10)
+
+
 class Student(CommonField, StudentBase):
     pass
 
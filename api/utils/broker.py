@@ -0,0 +1,158 @@
+import os
+import json
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Awaitable, Callable
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# memory:// keeps messages in the process, redis://host:port/db fans them
+# out to every worker subscribed to the same redis server
+BROKER_URL = os.getenv("BROKER_URL", "memory://")
+
+NOTIFICATIONS_CHANNEL = "notifications"
+PI_MESSAGES_CHANNEL = "pi_messages"
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Broker(ABC):
+    """Publish/subscribe between the workers serving the api
+
+    Every worker registers handlers for the channels it delivers locally
+    (e.g. to its own websockets), a message published by any worker reaches
+    the handlers of all of them. Payloads must be json serializable.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """Register a coroutine called with the payload of every message on `channel`"""
+        self._handlers[channel].append(handler)
+
+    async def _dispatch(self, channel: str, payload: dict) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                await handler(payload)
+            except Exception:
+                logging.exception(f"Broker handler for {channel} failed")
+
+    @abstractmethod
+    async def publish(self, channel: str, payload: dict) -> bool:
+        """Publish a message to every worker
+
+        Args:
+            channel (str): Channel name
+            payload (dict): Message payload
+
+        Returns:
+            bool: False if the broker could not be reached"""
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Start receiving messages"""
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Stop receiving messages"""
+
+
+class InProcessBroker(Broker):
+    """Deliver messages to the handlers of this process only (single worker)"""
+
+    async def publish(self, channel: str, payload: dict) -> bool:
+        await self._dispatch(channel, json.loads(json.dumps(payload)))
+        return True
+
+    async def start(self) -> None:
+        pass  # messages are dispatched as they are published
+
+    async def stop(self) -> None:
+        pass
+
+
+class RedisBroker(Broker):
+    """Fan messages out to every worker through redis pub/sub
+
+    Requires the optional `redis` package. Any server speaking the redis
+    pub/sub protocol works, `client` may be given to use another client.
+    """
+
+    def __init__(self, url: str = BROKER_URL, client=None, reconnect_delay: float = 1.0):
+        super().__init__()
+        if client is None:
+            try:
+                import redis.asyncio
+            except ImportError:
+                raise RuntimeError(
+                    "BROKER_URL is a redis url but the redis package is not installed, "
+                    "run `pip install redis`")
+            client = redis.asyncio.from_url(url)
+        self._client = client
+        self.reconnect_delay = reconnect_delay
+        self._task: asyncio.Task = None
+
+    async def publish(self, channel: str, payload: dict) -> bool:
+        # the change that triggered the message is already committed, so a
+        # broker outage is reported rather than failing the request, the
+        # outbox retries on False
+        try:
+            await self._client.publish(channel, json.dumps(payload))
+            return True
+        except Exception:
+            logging.exception(f"Could not publish to {channel}")
+            return False
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self) -> None:
+        """Receive messages, resubscribing after a lost connection"""
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(*self._handlers)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    await self._dispatch(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Broker connection lost, resubscribing")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.aclose()
+
+
+def create_broker(url: str = BROKER_URL) -> Broker:
+    """Create the broker configured by BROKER_URL
+
+    Args:
+        url (str): memory:// or redis://...
+
+    Returns:
+        Broker: In-process or redis broker"""
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    if url.startswith("memory://"):
+        return InProcessBroker()
+    raise ValueError(f"Unsupported BROKER_URL: {url}")
+
+
+broker = create_broker()
@@ -0,0 +1,147 @@
+import csv
+import io
+import re
+import codecs
+from typing import AsyncIterator
+from fastapi import UploadFile
+from pydantic import BaseModel, ValidationError
+
+
+CSV_READ_CHUNK_SIZE = 64 * 1024
+_CSV_SPECIAL_CHARS = re.compile(r'[",\n]')
+
+
+class _RecordSplitter:
+    """Cut decoded CSV text into complete records as it arrives
+
+    A newline inside a quoted field does not end a record. The quote state
+    is carried across chunks and only a quote at the start of a field
+    opens one, like `csv.reader` does, so a stray quote inside an unquoted
+    field (`O"Brien`) does not hold back the rest of the file. Each
+    character is scanned once."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.scanned = 0
+        self.in_quotes = False
+        self.field_start = 0
+        self.closed_at = -2
+
+    def feed(self, text: str) -> str:
+        """Add text and return the records it completes
+
+        Args:
+            text (str): Next piece of decoded CSV text
+
+        Returns:
+            str: Complete records, possibly empty"""
+
+        self.buffer += text
+        record_end = 0
+
+        for match in _CSV_SPECIAL_CHARS.finditer(self.buffer, self.scanned):
+            position, char = match.start(), match.group()
+            if self.in_quotes:
+                if char == '"':
+                    self.in_quotes = False
+                    self.closed_at = position
+            elif char == '"':
+                # An opening quote, or the second half of an escaped "" pair.
+                if position == self.field_start or position == self.closed_at + 1:
+                    self.in_quotes = True
+            else:
+                self.field_start = position + 1
+                if char == "\n":
+                    record_end = position + 1
+
+        self.scanned = len(self.buffer)
+        records, self.buffer = self.buffer[:record_end], self.buffer[record_end:]
+        self.scanned -= record_end
+        self.field_start -= record_end
+        self.closed_at -= record_end
+        return records
+
+    def flush(self) -> str:
+        """Return whatever text is left once the input has ended"""
+
+        records, self.buffer = self.buffer, ""
+        self.scanned = self.field_start = 0
+        return records
+
+
+async def iter_csv_rows(file: UploadFile,
+                        chunk_size: int = CSV_READ_CHUNK_SIZE) -> AsyncIterator[dict]:
+    """Yield the rows of an uploaded CSV file as dicts keyed by the header
+
+    The file is read `chunk_size` bytes at a time, so memory use does not
+    depend on the size of the upload.
+
+    Args:
+        file (UploadFile): Uploaded CSV file (utf-8, optional BOM)
+        chunk_size (int): Bytes read per chunk
+
+    Yields:
+        dict: {header : value} for each row"""
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    splitter = _RecordSplitter()
+    header = None
+
+    while True:
+        chunk = await file.read(chunk_size)
+        records = splitter.feed(decoder.decode(chunk, final=not chunk))
+        if not chunk:
+            records += splitter.flush()
+
+        for row in csv.reader(io.StringIO(records)):
+            if not row:
+                continue
+            if header is None:
+                header = [column.strip() for column in row]
+                continue
+            yield {column: row[index] if index < len(row) else ""
+                   for index, column in enumerate(header)}
+
+        if not chunk:
+            return
+
+
+async def iter_validated_batches(file: UploadFile, schema: type[BaseModel], columns: dict,
+                                 batch_size: int) -> AsyncIterator[tuple[list, int]]:
+    """Validate the rows of an uploaded CSV file and yield them in batches
+
+    Args:
+        file (UploadFile): Uploaded CSV file
+        schema (BaseModel): Schema each row is validated against
+        columns (dict): {CSV header : schema field}, other columns are ignored
+        batch_size (int): Number of valid rows per batch
+
+    Raises:
+        ValueError: A column is missing from the CSV header
+
+    Yields:
+        tuple: (list of schema objects, number of invalid rows since the last batch)"""
+
+    batch = []
+    invalid = 0
+    checked_header = False
+
+    async for row in iter_csv_rows(file):
+        if not checked_header:
+            missing = [column for column in columns if column not in row]
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(missing)}")
+            checked_header = True
+
+        try:
+            batch.append(schema(**{field: (row.get(column) or "").strip()
+                                   for column, field in columns.items()}))
+        except ValidationError:
+            invalid += 1
+
+        if len(batch) >= batch_size:
+            yield batch, invalid
+            batch, invalid = [], 0
+
+    if batch or invalid:
+        yield batch, invalid
@@ -0,0 +1,217 @@
+import os
+import time as clock
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..crud.crud_appointment import CANCELLED_STATUSES
+
+
+load_dotenv()
+
+# bounds how long another worker serves slots of a changed calendar
+FREE_SLOTS_CACHE_TTL_SECONDS = int(os.getenv("FREE_SLOTS_CACHE_TTL_SECONDS", "60"))
+# calendars cached per faculty, one per range and slot length asked for
+FREE_SLOTS_CACHE_PER_FACULTY = 32
+
+Interval = tuple[datetime, datetime]
+
+
+def _merge(intervals: list[Interval]) -> list[Interval]:
+    """Sort intervals and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(windows: list[Interval], busy: list[Interval],
+               slot: timedelta) -> list[Interval]:
+    """Cut the time of `windows` not covered by `busy` into slots
+
+    Both lists are merged and swept once in start order, a slot starts at
+    the beginning of each free gap and the gap's remainder shorter than
+    `slot` is left out.
+
+    Args:
+        windows (list): (start, end) intervals the faculty is available
+        busy (list): (start, end) intervals already booked
+        slot (timedelta): Length of a slot
+
+    Returns:
+        list: (start, end) of every bookable slot, in order"""
+
+    busy = _merge(busy)
+    slots = []
+    index = 0
+    for window_start, window_end in _merge(windows):
+        cursor = window_start
+        # skip the bookings that end before this window
+        while index < len(busy) and busy[index][1] <= cursor:
+            index += 1
+        position = index
+        while cursor < window_end:
+            if position < len(busy) and busy[position][0] < window_end:
+                gap_end = min(busy[position][0], window_end)
+            else:
+                gap_end = window_end
+            while cursor + slot <= gap_end:
+                slots.append((cursor, cursor + slot))
+                cursor += slot
+            if gap_end == window_end:
+                break
+            cursor = max(cursor, busy[position][1])
+            position += 1
+    return slots
+
+
+class FreeSlotCache:
+    """Free slots of the faculty calendars, kept until the calendar changes
+
+    Entries are grouped by faculty user_id and dropped once a change of
+    Available or Appointment is committed, the ttl bounds how long other
+    workers keep a stale entry. Slots computed while the faculty's calendar
+    was invalidated are returned but not kept. Bookings are checked again
+    when they are made, a stale slot is refused then.
+    """
+
+    def __init__(self, ttl: int = FREE_SLOTS_CACHE_TTL_SECONDS,
+                 per_faculty: int = FREE_SLOTS_CACHE_PER_FACULTY):
+        self.ttl = ttl
+        self.per_faculty = per_faculty
+        self._entries: dict[str, dict[tuple, tuple[float, list[Interval]]]] = {}
+        # bumped by every invalidation, of everyone and per faculty
+        self._generation = 0
+        self._faculty_generations: dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+
+    async def get(self, db: AsyncSession, faculty_id: str, first_day: date,
+                  last_day: date, slot: timedelta) -> list[Interval]:
+        """Free slots of a faculty between two days (included)
+
+        Args:
+            db (AsyncSession): Database session used on a cache miss
+            faculty_id (str): Faculty id
+            first_day (date): First day of the range
+            last_day (date): Last day of the range
+            slot (timedelta): Length of a slot
+
+        Returns:
+            list: (start, end) datetimes of the free slots, in order"""
+
+        key = (first_day, last_day, slot)
+        entry = self._entries.get(faculty_id, {}).get(key)
+        if entry and clock.monotonic() - entry[0] < self.ttl:
+            self._hits += 1
+            return entry[1]
+
+        self._misses += 1
+        generation = self._generation_of(faculty_id)
+        slots = await self._compute(db, faculty_id, first_day, last_day, slot)
+        if generation != self._generation_of(faculty_id):
+            return slots  # the calendar changed while it was read
+        entries = self._entries.setdefault(faculty_id, {})
+        if len(entries) >= self.per_faculty:
+            entries.pop(next(iter(entries)))
+        entries[key] = (clock.monotonic(), slots)
+        return slots
+
+    def _generation_of(self, faculty_id: str) -> tuple[int, int]:
+        return self._generation, self._faculty_generations.get(faculty_id, 0)
+
+    @staticmethod
+    async def _compute(db: AsyncSession, faculty_id: str, first_day: date,
+                       last_day: date, slot: timedelta) -> list[Interval]:
+        available = (await db.execute(select(
+            models.Available.day, models.Available.start_time, models.Available.end_time
+        ).where(models.Available.user_id == faculty_id))).all()
+        # a range of the (faculty_id, date, start_time) index
+        appointments = (await db.execute(select(
+            models.Appointment.date, models.Appointment.start_time, models.Appointment.end_time
+        ).where(models.Appointment.faculty_id == faculty_id,
+                models.Appointment.date >= first_day,
+                models.Appointment.date <= last_day,
+                models.Appointment.satus.notin_(CANCELLED_STATUSES)))).all()
+
+        weekdays: dict[str, list[tuple[time, time]]] = {}
+        for row in available:
+            weekdays.setdefault(row.day.lower(), []).append((row.start_time, row.end_time))
+
+        windows = []
+        day = first_day
+        while day <= last_day:
+            for start, end in weekdays.get(day.strftime("%A").lower(), ()):
+                windows.append((datetime.combine(day, start), datetime.combine(day, end)))
+            day += timedelta(days=1)
+        busy = [(datetime.combine(row.date, row.start_time),
+                 datetime.combine(row.date, row.end_time)) for row in appointments]
+        return free_slots(windows, busy, slot)
+
+    def invalidate(self, faculty_id: Optional[str] = None) -> None:
+        """Drop the slots of a faculty, or of everyone"""
+        if faculty_id is None:
+            self._generation += 1
+            self._faculty_generations.clear()
+            self._entries.clear()
+        else:
+            self._faculty_generations[faculty_id] = (
+                self._faculty_generations.get(faculty_id, 0) + 1)
+            self._entries.pop(faculty_id, None)
+
+    def metrics(self) -> dict:
+        """Cached calendars and hit counters"""
+        return {
+            "faculty": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+free_slot_cache = FreeSlotCache()
+
+
+_CHANGED_FACULTY = "free_slot_cache.changed_faculty"
+
+
+def _record_faculty(target, attribute: str) -> None:
+    """Remember the faculty of a row, and its previous faculty, until the commit"""
+    session = object_session(target)
+    changed = session.info.setdefault(_CHANGED_FACULTY, set())
+    changed.add(getattr(target, attribute))
+    changed.update(inspect(target).attrs[attribute].history.deleted)
+
+
+@event.listens_for(models.Available, "after_insert")
+@event.listens_for(models.Available, "after_update")
+@event.listens_for(models.Available, "after_delete")
+def _record_availability(mapper, connection, target):
+    _record_faculty(target, "user_id")
+
+
+@event.listens_for(models.Appointment, "after_insert")
+@event.listens_for(models.Appointment, "after_update")
+@event.listens_for(models.Appointment, "after_delete")
+def _record_appointment(mapper, connection, target):
+    _record_faculty(target, "faculty_id")
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_faculty(session):
+    """Drop the calendars changed by the transaction once it is committed
+
+    Dropping them at flush would let a concurrent request compute the slots
+    from the rows before the commit and keep them for the whole ttl."""
+    for faculty_id in session.info.pop(_CHANGED_FACULTY, ()):
+        free_slot_cache.invalidate(faculty_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_faculty(session):
+    session.info.pop(_CHANGED_FACULTY, None)
@@ -0,0 +1,173 @@
+import os
+import asyncio
+import logging
+import shutil
+import tempfile
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_, and_
+from starlette.concurrency import run_in_threadpool
+from .. import database, models
+from ..crud import crud_user
+from ..schemas import user_schema
+from . import csv_utils
+
+
+load_dotenv()
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", os.path.join(
+    tempfile.gettempdir(), "reconnect-imports"))
+# a running job whose progress was not updated this long is taken over
+IMPORT_JOB_LEASE_SECONDS = int(os.getenv("IMPORT_JOB_LEASE_SECONDS", "300"))
+
+# Map CSV headers of the roster to the student fields
+STUDENT_CSV_COLUMNS = {
+    'Email': 'email',
+    'ID': 'student_id',
+    'Pref. First': 'first_name',
+    'Last Name': 'last_name',
+}
+
+user_crud = crud_user.UserCrud()
+
+
+class ImportJobQueue:
+    """Run student roster imports on a pool of background workers
+
+    The upload is spooled to IMPORT_SPOOL_DIR and an ImportJob row tracks
+    its progress. A worker claims a job with a conditional update, so with
+    several processes each job runs once. Every committed batch refreshes
+    `updated_at`, a running job left alone for `lease` seconds (its process
+    died) is taken over on start, as long as its spooled file still exists.
+    """
+
+    def __init__(self, workers: int = IMPORT_WORKERS, spool_dir: str = IMPORT_SPOOL_DIR,
+                 lease: int = IMPORT_JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.spool_dir = spool_dir
+        self.lease = lease
+        self._queue: asyncio.Queue = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.csv")
+
+    def _claimable(self):
+        """Jobs waiting for a worker, or whose worker stopped updating them"""
+        expired = datetime.now() - timedelta(seconds=self.lease)
+        return or_(models.ImportJob.status == "queued",
+                   and_(models.ImportJob.status == "running",
+                        models.ImportJob.updated_at < expired))
+
+    async def start(self) -> None:
+        """Start the workers and resume the jobs left over by a restart"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker())
+                       for _ in range(self.workers)]
+
+        async with database.AsyncSessionLocal() as db:
+            job_ids = (await db.scalars(select(models.ImportJob.id).where(
+                self._claimable()))).all()
+            for job_id in job_ids:
+                if os.path.exists(self._spool_path(job_id)):
+                    # claimed by whichever worker gets to it first
+                    self._queue.put_nowait(job_id)
+                else:
+                    await db.execute(update(models.ImportJob).where(
+                        models.ImportJob.id == job_id, self._claimable()).values(
+                        status="failed",
+                        error="The uploaded file was lost during a restart"))
+            await db.commit()
+
+    async def stop(self) -> None:
+        """Cancel the workers, their jobs are queued again for the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, db, file: UploadFile) -> models.ImportJob:
+        """Spool an uploaded roster to disk and queue its import
+
+        Args:
+            db (AsyncSession): Database session
+            file (UploadFile): Uploaded CSV file
+
+        Returns:
+            models.ImportJob: The queued job"""
+
+        job = models.ImportJob(filename=file.filename)
+        db.add(job)
+        await db.flush()
+
+        def spool():
+            with open(self._spool_path(job.id), "wb") as spooled:
+                shutil.copyfileobj(file.file, spooled)
+
+        await run_in_threadpool(spool)
+        await db.commit()
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logging.exception(f"Import job {job_id} failed")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        """Import a spooled roster, recording progress after every batch"""
+        path = self._spool_path(job_id)
+
+        async with database.AsyncSessionLocal() as db:
+            claimed = await db.execute(update(models.ImportJob).where(
+                models.ImportJob.id == job_id, self._claimable()).values(
+                status="running", rows_processed=0, rows_added=0,
+                rows_skipped=0, rows_invalid=0, updated_at=datetime.now()))
+            await db.commit()
+            if claimed.rowcount != 1:
+                return  # unknown, finished, or running in another worker
+            job = await db.get(models.ImportJob, job_id)
+
+            try:
+                with open(path, "rb") as spooled:
+                    upload = UploadFile(file=spooled, filename=job.filename)
+                    async for students, invalid in csv_utils.iter_validated_batches(
+                            upload, user_schema.StudentImport, STUDENT_CSV_COLUMNS,
+                            batch_size=crud_user.CSV_IMPORT_CHUNK_SIZE):
+                        result = await user_crud.add_student_csv(db=db, students=students)
+                        job.rows_added += result["added"]
+                        job.rows_skipped += result["skipped"]
+                        job.rows_invalid += invalid
+                        job.rows_processed += len(students) + invalid
+                        await db.commit()
+
+                job.status = "completed"
+
+            except asyncio.CancelledError:
+                # hand the job back, so the next start does not wait for the lease
+                await db.rollback()
+                await db.execute(update(models.ImportJob).where(
+                    models.ImportJob.id == job_id).values(status="queued"))
+                await db.commit()
+                raise
+
+            except Exception as e:
+                await db.rollback()
+                job.status = "failed"
+                job.error = str(e)[:1000]
+
+            await db.commit()
+
+        if os.path.exists(path):
+            os.remove(path)
+
+
+import_job_queue = ImportJobQueue()
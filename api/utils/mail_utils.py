@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 import random
 import string
@@ -14,22 +15,64 @@ logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "3"))
 
-class EmailVerification:
-    """Handle sending and verification of email codes."""
+# the server refused the message itself, retrying would fail the same way.
+# Checked before OSError, which every SMTPException derives from
+PERMANENT_SMTP_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                         smtplib.SMTPDataError)
 
-    def __init__(self):
+
+class MailService:
+    """Send emails from background workers over persistent SMTP connections
+
+    `send` only queues the message. Each of the `pool_size` workers keeps
+    one authenticated connection open and reuses it for every message, a
+    connection that fails is dropped and opened again on the next attempt.
+    smtplib is blocking, so connecting and sending run in a thread.
+
+    `smtp_factory(host, port, timeout)` creates the connections, tests
+    replace it with a local stand-in.
+    """
+
+    def __init__(self, smtp_factory=smtplib.SMTP, pool_size: int = SMTP_POOL_SIZE,
+                 queue_size: int = MAIL_QUEUE_SIZE, timeout: float = SMTP_TIMEOUT_SECONDS,
+                 max_attempts: int = MAIL_MAX_ATTEMPTS, backoff: float = 0.5):
+        self.smtp_factory = smtp_factory
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
         self.SMTP_SERVER = os.getenv("SMTP_SERVER")
         self.SMTP_PORT = os.getenv("SMTP_PORT")
         self.SENDER_EMAIL = os.getenv("SENDER_EMAIL")
         self.SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+        self._queue: asyncio.Queue = None
+        self._tasks: list[asyncio.Task] = []
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._connects = 0
 
-    def _generate_verification_code(self, length=6) -> str:
-        """Generate a random verification code of specified length."""
-        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+    async def start(self) -> None:
+        """Start the workers, connections are opened on first use"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker())
+                       for _ in range(self.pool_size)]
 
-    def _send_email(self, email: str, subject: str, message: str) -> bool:
-        """Send an email message.
+    async def stop(self) -> None:
+        """Stop the workers and close their connections, queued emails are lost"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def send(self, email: str, subject: str, message: str) -> bool:
+        """Queue an html email
 
         Args:
             email (str): Email address to send the message
@@ -37,30 +80,159 @@ class EmailVerification:
             message (str): Email message
 
         Returns:
-            bool: Email sent status
-        """
-        # Create email message
+            bool: True if the email was queued"""
+
+        if self._queue is None:
+            logging.warning("Mail service is not started, email not sent")
+            return False
+
+        try:
+            self._queue.put_nowait((email, self._build(email, subject, message), None))
+            return True
+        except asyncio.QueueFull:
+            self._dropped += 1
+            logging.warning("Mail queue is full, email dropped")
+            return False
+
+    async def deliver(self, email: str, subject: str, message: str) -> bool:
+        """Send an html email through the pool and wait for the outcome
+
+        Args:
+            email (str): Email address to send the message
+            subject (str): Email subject
+            message (str): Email message
+
+        Returns:
+            bool: True if the email was sent"""
+
+        if self._queue is None:
+            return False
+        sent = asyncio.get_running_loop().create_future()
+        await self._queue.put((email, self._build(email, subject, message), sent))
+        return await sent
+
+    def _build(self, email: str, subject: str, message: str) -> str:
         msg = MIMEMultipart()
         msg['From'] = self.SENDER_EMAIL
         msg['To'] = email
         msg['Subject'] = subject
         msg.attach(MIMEText(message, 'html'))
+        return msg.as_string()
+
+    async def join(self) -> None:
+        """Wait until every queued email was handled"""
+        await self._queue.join()
 
+    def _connect(self):
+        """Open an authenticated SMTP connection"""
+        server = self.smtp_factory(self.SMTP_SERVER, self.SMTP_PORT,
+                                   timeout=self.timeout)
         try:
-            # Connect to the SMTP server
-            with smtplib.SMTP(self.SMTP_SERVER, self.SMTP_PORT) as server:
-                server.starttls()  # Use TLS for security
-                server.login(self.SENDER_EMAIL, self.SENDER_PASSWORD)
-                server.sendmail(self.SENDER_EMAIL, email,
-                                msg.as_string())
-
-            print("Email sent successfully.")
-            logging.info(f"Email sent to {email}")
-            return True
+            server.starttls()  # Use TLS for security
+            server.login(self.SENDER_EMAIL, self.SENDER_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        self._connects += 1
+        return server
 
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            return False
+    @staticmethod
+    def _close(server) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    async def _worker(self) -> None:
+        server = None
+        try:
+            while True:
+                email, content, sent = await self._queue.get()
+                ok = False
+                try:
+                    for attempt in range(self.max_attempts):
+                        if attempt:
+                            await asyncio.sleep(
+                                random.uniform(0, min(self.backoff * 2 ** attempt, 30)))
+                        try:
+                            if server is None:
+                                server = await asyncio.to_thread(self._connect)
+                            await asyncio.to_thread(
+                                server.sendmail, self.SENDER_EMAIL, email, content)
+                            self._sent += 1
+                            ok = True
+                            logging.info(f"Email sent to {email}")
+                            break
+                        except PERMANENT_SMTP_ERRORS:
+                            raise
+                        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                                smtplib.SMTPAuthenticationError, OSError) as e:
+                            logging.warning(
+                                f"SMTP attempt {attempt + 1} failed: {e!r}")
+                            if server is not None:
+                                await asyncio.to_thread(self._close, server)
+                                server = None
+                    else:
+                        self._failed += 1
+                        logging.error(f"Error sending email to {email}")
+                except PERMANENT_SMTP_ERRORS as e:
+                    # rejected recipient or message, the connection is still usable
+                    self._failed += 1
+                    logging.error(f"Error sending email to {email}: {e!r}")
+                except Exception:
+                    # keep the worker alive, the connection state is unknown
+                    self._failed += 1
+                    logging.exception(f"Error sending email to {email}")
+                    if server is not None:
+                        await asyncio.to_thread(self._close, server)
+                        server = None
+                finally:
+                    if sent is not None and not sent.done():
+                        sent.set_result(ok)
+                    self._queue.task_done()
+        finally:
+            if server is not None:
+                self._close(server)
+
+    def metrics(self) -> dict:
+        """Queue depth and delivery counters of the mail workers"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "sent": self._sent,
+            "failed": self._failed,
+            "dropped": self._dropped,
+            "connects": self._connects,
+        }
+
+
+mail_service = MailService()
+
+
+class EmailVerification:
+    """Handle sending and verification of email codes."""
+
+    def __init__(self):
+        self.SMTP_SERVER = os.getenv("SMTP_SERVER")
+        self.SMTP_PORT = os.getenv("SMTP_PORT")
+        self.SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+        self.SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+
+    def _generate_verification_code(self, length=6) -> str:
+        """Generate a random verification code of specified length."""
+        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+
+    def _send_email(self, email: str, subject: str, message: str) -> bool:
+        """Queue an email message on the mail service.
+
+        Args:
+            email (str): Email address to send the message
+            subject (str): Email subject
+            message (str): Email message
+
+        Returns:
+            bool: Email queued status
+        """
+        return mail_service.send(email, subject, message)
 
     def verification(self, email: str) -> dict:
         """Send an email verification message.
@@ -0,0 +1,97 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .. import database
+from ..crud.crud_notification import NotificationCrud
+
+
+load_dotenv()
+
+# notifications older than this are deleted, 0 keeps them forever
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "365"))
+NOTIFICATION_RETENTION_CHUNK = int(os.getenv("NOTIFICATION_RETENTION_CHUNK", "1000"))
+NOTIFICATION_RETENTION_INTERVAL_SECONDS = float(
+    os.getenv("NOTIFICATION_RETENTION_INTERVAL_SECONDS", "3600"))
+
+
+class NotificationRetention:
+    """Delete old notifications from a background task
+
+    Every `interval` seconds the notifications older than `days` are deleted
+    in chunks of `chunk_size` rows, each in its own short transaction with a
+    pause in between, so the table is never locked for long.
+    """
+
+    def __init__(self, days: int = NOTIFICATION_RETENTION_DAYS,
+                 chunk_size: int = NOTIFICATION_RETENTION_CHUNK,
+                 interval: float = NOTIFICATION_RETENTION_INTERVAL_SECONDS,
+                 pause: float = 0.1):
+        self.days = days
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.pause = pause
+        self._task: asyncio.Task = None
+        self._stopping: asyncio.Event = None
+        self._deleted = 0
+        self._last_run: datetime = None
+
+    async def start(self) -> None:
+        if self.days > 0:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Let the chunk in progress finish, so no transaction is left open"""
+        if self._task:
+            self._stopping.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass  # wait_for cancelled the task
+            self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.prune()
+            except Exception:
+                logging.exception("Notification retention failed")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def prune(self) -> int:
+        """Delete every notification older than the retention period
+
+        Returns:
+            int: Number of notifications deleted"""
+
+        older_than = datetime.now() - timedelta(days=self.days)
+        deleted = 0
+        while True:
+            async with database.AsyncSessionLocal() as db:
+                count = await NotificationCrud.prune_notifications(
+                    db, older_than, self.chunk_size)
+            deleted += count
+            self._deleted += count
+            if count < self.chunk_size or (self._stopping and self._stopping.is_set()):
+                break
+            await asyncio.sleep(self.pause)
+
+        self._last_run = datetime.now()
+        if deleted:
+            logging.info(f"Deleted {deleted} notifications older than {self.days} days")
+        return deleted
+
+    def metrics(self) -> dict:
+        """Notifications deleted since the start and time of the last run"""
+        return {
+            "deleted": self._deleted,
+            "last_run": self._last_run.isoformat() if self._last_run else None,
+        }
+
+
+notification_retention = NotificationRetention()
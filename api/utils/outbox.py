@@ -0,0 +1,274 @@
+import os
+import json
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import select, and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import database, models
+from ..schemas.notification_schema import NotificationSchema
+from .broker import broker, NOTIFICATIONS_CHANNEL
+from .web_socket import notification_message
+from .sms_utils import sms_notifier, sms_batch_window, sms_digest
+from .mail_utils import mail_service
+
+
+load_dotenv()
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# a claimed message is delivered again if its worker did not finish in time
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+WEBSOCKET = "websocket"
+SMS = "sms"
+EMAIL = "email"
+
+
+def stage(db: AsyncSession, channel: str, payload: dict, idempotency_key: str,
+          recipient: str = None, delay: int = 0) -> None:
+    """Add an outbox message to the session, it is committed with the caller's change
+
+    Args:
+        db (AsyncSession): Database session of the change
+        channel (str): websocket, sms or email
+        payload (dict): Json payload for the channel
+        idempotency_key (str): Unique key, also handed to the channel
+        recipient (str): User id the sms messages are batched by
+        delay (int): Seconds to wait before delivering"""
+
+    db.add(models.OutboxMessage(
+        idempotency_key=idempotency_key, channel=channel, recipient=recipient,
+        payload=json.dumps(payload),
+        next_attempt_at=datetime.now() + timedelta(seconds=delay)))
+
+
+async def stage_notification(db: AsyncSession, notification: NotificationSchema,
+                             sms: bool = True) -> str:
+    """Add a notification and its websocket (and sms) delivery to the session
+
+    The notification is flushed to get its id, which the websocket message
+    carries so a reconnecting dashboard can resume after it.
+
+    Args:
+        db (AsyncSession): Database session of the change
+        notification (NotificationSchema): Notification for the faculty
+        sms (bool): Also send the message by SMS
+
+    Returns:
+        str: Idempotency key of the notification"""
+
+    key = uuid.uuid4().hex
+    row = models.Notification(**notification.model_dump())
+    db.add(row)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User not found")
+
+    stage(db, WEBSOCKET, {**notification_message(row), "key": key},
+          f"{key}:{WEBSOCKET}")
+    if sms:
+        stage(db, SMS, {**notification.model_dump(), "key": key},
+              f"{key}:{SMS}", recipient=notification.user_id,
+              delay=sms_batch_window(notification.event_type))
+    return key
+
+
+class OutboxDispatcher:
+    """Deliver the outbox messages from a background task
+
+    Due messages are claimed in batches of `batch_size` (locked with SKIP
+    LOCKED, so several workers share the work) by marking them `sending`
+    for `lease` seconds, then delivered concurrently. A claim whose lease
+    ran out, because its worker died, is due again. A failed
+    message is retried with exponential backoff until `max_attempts`.
+    Delivery is at least once, the channels receive the idempotency key to
+    drop duplicates.
+
+    SMS are staged with a delay (see `sms_batch_window`). When one is due,
+    every other pending SMS of the same recipient is claimed with it and
+    they are sent as one digest.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_SECONDS,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 lease: int = OUTBOX_LEASE_SECONDS):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._wakeup: asyncio.Event = None
+        self._task: asyncio.Task = None
+        self._stopping = False
+        self._delivered = 0
+        self._failed = 0
+        self._batched = 0
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Let the batch in progress finish, so its claims are not left leased"""
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass  # wait_for cancelled the task
+            self._task = None
+
+    def wake(self) -> None:
+        """Deliver right away instead of at the next poll, call after a commit"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                while (await self.dispatch_batch() == self.batch_size
+                       and not self._stopping):
+                    pass
+            except Exception:
+                logging.exception("Outbox dispatch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def dispatch_batch(self) -> int:
+        """Claim and deliver one batch of due messages
+
+        Returns:
+            int: Number of messages claimed"""
+
+        async with database.AsyncSessionLocal() as db:
+            now = datetime.now()
+            messages = (await db.scalars(
+                select(models.OutboxMessage)
+                .where(models.OutboxMessage.status.in_(["pending", "sending"]),
+                       models.OutboxMessage.next_attempt_at <= now)
+                .order_by(models.OutboxMessage.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True))).all()
+            if not messages:
+                return 0
+            claimed = len(messages)
+
+            # batch the due sms with the pending ones of the same recipients,
+            # a digest already attempted is retried with its own messages only
+            recipients = {message.recipient for message in messages
+                          if message.channel == SMS and message.recipient
+                          and not message.digest_key}
+            digest_keys = {message.digest_key for message in messages
+                           if message.digest_key}
+            batched = []
+            if recipients:
+                batched.append(and_(
+                    models.OutboxMessage.recipient.in_(recipients),
+                    models.OutboxMessage.digest_key.is_(None),
+                    models.OutboxMessage.status == "pending",
+                    models.OutboxMessage.next_attempt_at > now))
+            if digest_keys:
+                batched.append(and_(
+                    models.OutboxMessage.digest_key.in_(digest_keys),
+                    models.OutboxMessage.status.in_(["pending", "sending"]),
+                    models.OutboxMessage.id.notin_([message.id for message in messages])))
+            if batched:
+                messages += (await db.scalars(
+                    select(models.OutboxMessage)
+                    .where(models.OutboxMessage.channel == SMS, or_(*batched))
+                    .order_by(models.OutboxMessage.id)
+                    .with_for_update(skip_locked=True))).all()
+
+            groups = {}
+            for message in sorted(messages, key=lambda message: message.id):
+                if message.digest_key:
+                    groups.setdefault((SMS, message.digest_key), []).append(message)
+                elif message.channel == SMS and message.recipient:
+                    groups.setdefault((SMS, message.recipient), []).append(message)
+                else:
+                    groups[message.id] = [message]
+
+            for group in groups.values():
+                if len(group) > 1 and not group[0].digest_key:
+                    for message in group:
+                        message.digest_key = group[0].idempotency_key
+
+            # the digests are committed with the claim, before anything is sent
+            for message in messages:
+                message.status = "sending"
+                message.next_attempt_at = now + timedelta(seconds=self.lease)
+            await db.commit()
+
+            results = await asyncio.gather(
+                *(self._deliver_group(group) for group in groups.values()),
+                return_exceptions=True)
+
+            for group, result in zip(groups.values(), results):
+                for message in group:
+                    self._record(message, result)
+            await db.commit()
+            return claimed
+
+    def _record(self, message: models.OutboxMessage, result) -> None:
+        """Mark a message sent, or schedule its retry"""
+        message.attempts += 1
+        if result is True:
+            message.status = "sent"
+            message.sent_at = datetime.now()
+            self._delivered += 1
+            return
+
+        message.last_error = (repr(result) if isinstance(result, Exception)
+                              else "Delivery failed")[:1000]
+        if message.attempts >= self.max_attempts:
+            message.status = "failed"
+            self._failed += 1
+            logging.error(
+                f"Outbox message {message.idempotency_key} failed: {message.last_error}")
+        else:
+            message.status = "pending"
+            message.next_attempt_at = datetime.now() + timedelta(
+                seconds=min(2 ** message.attempts, 3600))
+
+    async def _deliver_group(self, group: list[models.OutboxMessage]) -> bool:
+        if len(group) == 1 and not group[0].digest_key:
+            return await self._deliver(group[0])
+        # one digest for the recipient, the same key on every retry
+        digest = sms_digest([json.loads(message.payload)["message"]
+                             for message in group])
+        self._batched += len(group) - 1
+        return await sms_notifier.deliver(
+            digest, idempotency_key=f"digest:{group[0].digest_key}")
+
+    async def _deliver(self, message: models.OutboxMessage) -> bool:
+        payload = json.loads(message.payload)
+        if message.channel == WEBSOCKET:
+            return await broker.publish(NOTIFICATIONS_CHANNEL, payload)
+        if message.channel == SMS:
+            return await sms_notifier.deliver(payload["message"],
+                                              idempotency_key=message.idempotency_key)
+        if message.channel == EMAIL:
+            return await mail_service.deliver(payload["email"], payload["subject"],
+                                               payload["message"])
+        raise ValueError(f"Unknown outbox channel: {message.channel}")
+
+    def metrics(self) -> dict:
+        """Delivery counters of the dispatcher"""
+        return {"delivered": self._delivered, "failed": self._failed,
+                "sms_merged": self._batched}
+
+
+outbox_dispatcher = OutboxDispatcher()
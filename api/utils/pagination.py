@@ -0,0 +1,69 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+
+# rows returned per page of a listing
+PAGE_SIZE = 50
+PAGE_MAX = 200
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def keyset_after(columns: list, values: list):
+    """Condition selecting the rows that sort after `values` on `columns`
+
+    Written as (a > x) OR (a = x AND (b > y OR ...)) rather than a row
+    value comparison, so MySQL can use it as an index range.
+
+    Args:
+        columns (list): Sort columns, the last one unique (e.g. the id)
+        values (list): Sort values of the last row of the previous page"""
+
+    if len(columns) == 1:
+        return columns[0] > values[0]
+    return or_(columns[0] > values[0],
+               and_(columns[0] == values[0],
+                    keyset_after(columns[1:], values[1:])))
+
+
+def encode_cursor(*values) -> str:
+    """Cursor of a row from its sort values (dates and times in iso format)"""
+    return ",".join(value.isoformat() if hasattr(value, "isoformat") else str(value)
+                    for value in values)
+
+
+def decode_cursor(cursor: str, *parsers) -> list:
+    """Sort values of a cursor made by encode_cursor
+
+    Args:
+        cursor (str): Cursor sent by the client
+        parsers: One function per sort value, e.g. date.fromisoformat, int
+
+    Raises:
+        HTTPException: 400 if the cursor is not one of ours"""
+
+    parts = cursor.split(",")
+    try:
+        if len(parts) != len(parsers):
+            raise ValueError(cursor)
+        return [parse(part) for parse, part in zip(parsers, parts)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(rows: list, limit: int, response: Response, cursor) -> list:
+    """Cut the extra row of a page and set the next cursor header
+
+    Args:
+        rows (list): Rows read with `limit + 1`
+        limit (int): Page size
+        response (Response): Response receiving the X-Next-Cursor header
+        cursor: Function returning the cursor of a row
+
+    Returns:
+        list: The rows of the page"""
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = cursor(rows[-1])
+    return rows
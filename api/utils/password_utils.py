@@ -0,0 +1,107 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+
+load_dotenv()
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """Run bcrypt hashing and verification on a bounded thread pool
+
+    bcrypt releases the GIL while it works, so a small pool of threads keeps
+    the event loop free during a login wave. At most `max_pending` calls may
+    be queued or running at once, further calls are rejected with a 503.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="password")
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._max_latency = 0.0
+
+    async def _run(self, func, *args):
+        """Run `func` in the pool and record its queue wait and run time"""
+
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"}
+            )
+
+        queued_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            result = func(*args)
+            return result, started_at - queued_at, time.perf_counter() - started_at
+
+        self._pending += 1
+        try:
+            result, wait, run = await asyncio.get_running_loop().run_in_executor(
+                self._executor, timed)
+        finally:
+            self._pending -= 1
+
+        self._completed += 1
+        self._total_wait += wait
+        self._total_run += run
+        self._max_latency = max(self._max_latency, wait + run)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Hash a password
+
+        Args:
+            password (str): Plain text password
+
+        Returns:
+            str: bcrypt hash"""
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash
+
+        Args:
+            password (str): Plain text password
+            hashed_password (str): Stored bcrypt hash
+
+        Returns:
+            bool: True if the password matches"""
+        return await self._run(pwd_context.verify, password, hashed_password)
+
+    def metrics(self) -> dict:
+        """Queue depth and latency of the password pool"""
+        completed = self._completed or 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queue_depth": max(self._pending - self.workers, 0),
+            "in_flight": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+            "avg_run_ms": round(self._total_run / completed * 1000, 2),
+            "max_latency_ms": round(self._max_latency * 1000, 2),
+        }
+
+
+password_hasher = PasswordHasher()
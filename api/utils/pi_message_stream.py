@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import asyncio
+from collections import defaultdict, deque
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+from .. import models
+from .broker import broker, PI_MESSAGES_CHANNEL
+
+
+load_dotenv()
+
+PI_MESSAGE_STREAM_BUFFER = int(os.getenv("PI_MESSAGE_STREAM_BUFFER", "1000"))
+PI_MESSAGE_STREAM_HEARTBEAT_SECONDS = float(
+    os.getenv("PI_MESSAGE_STREAM_HEARTBEAT_SECONDS", "15"))
+PI_MESSAGE_STREAM_QUEUE_SIZE = int(
+    os.getenv("PI_MESSAGE_STREAM_QUEUE_SIZE", "100"))
+
+# subscribers of every faculty's messages
+ALL_FACULTY = "*"
+# delay before the browser reconnects a dropped EventSource
+RECONNECT_MILLISECONDS = 3000
+
+
+def _format_event(event_id: int, event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class PiMessageHub:
+    """Fan out pi message changes to server-sent event streams
+
+    Every change gets an increasing event id and is kept in a ring buffer
+    of `buffer_size` events, so a display that reconnects with Last-Event-ID
+    receives the changes it missed. If the id is no longer buffered (or comes
+    from before a restart) the stream sends a `reset` event and the display
+    should fetch the current message again.
+
+    Changes are published through the broker, so every worker's streams
+    see them. Event ids are given out by each worker, a display that
+    reconnects to another worker gets a `reset`.
+
+    Each stream has a bounded queue, a stream that falls `queue_size` events
+    behind is closed and resumes from the buffer when the display reconnects.
+    """
+
+    def __init__(self, buffer_size: int = PI_MESSAGE_STREAM_BUFFER,
+                 heartbeat: float = PI_MESSAGE_STREAM_HEARTBEAT_SECONDS,
+                 queue_size: int = PI_MESSAGE_STREAM_QUEUE_SIZE):
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self._events: deque[tuple[int, str, str, dict]] = deque(maxlen=buffer_size)
+        # ids start at the boot time in milliseconds, so the ids handed out
+        # before a restart are older than anything in the new buffer
+        self._next_id = time.time_ns() // 1_000_000
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, user_id: str, event: str, data: dict) -> int:
+        """Record a change and deliver it to the streams of the faculty and of all faculty
+
+        Args:
+            user_id (str): Faculty user id
+            event (str): Event name, `update` or `delete`
+            data (dict): Event payload
+
+        Returns:
+            int: Event id"""
+
+        event_id = self._next_id
+        self._next_id += 1
+        entry = (event_id, user_id, event, data)
+        self._events.append(entry)
+
+        for key in (user_id, ALL_FACULTY):
+            for queue in self._subscribers.get(key, ()):
+                try:
+                    queue.put_nowait(entry)
+                except asyncio.QueueFull:
+                    # close the lagging stream, it resumes from the buffer
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+        return event_id
+
+    async def publish_message(self, pi_message: models.PiMessage) -> None:
+        """Publish a pi message that was just created or updated to every worker"""
+        await broker.publish(PI_MESSAGES_CHANNEL, {
+            "user_id": pi_message.user_id,
+            "event": "update",
+            "data": {
+                "user_id": pi_message.user_id,
+                "message": pi_message.message,
+                "duration": pi_message.duration,
+                "duration_unit": pi_message.duration_unit,
+                "version": pi_message.version,
+            }
+        })
+
+    async def publish_delete(self, user_id: str) -> None:
+        """Publish the deletion of a faculty's pi message to every worker"""
+        await broker.publish(PI_MESSAGES_CHANNEL, {
+            "user_id": user_id, "event": "delete", "data": {"user_id": user_id}})
+
+    async def receive(self, payload: dict) -> None:
+        """Deliver a change published on the broker to the local streams"""
+        self.publish(payload["user_id"], payload["event"], payload["data"])
+
+    def _missed_events(self, key: str, last_event_id: str) -> Optional[list]:
+        """Buffered events after `last_event_id`, None if some were lost"""
+        try:
+            last_id = int(last_event_id)
+        except ValueError:
+            return None
+
+        first_id = self._events[0][0] if self._events else self._next_id
+        if last_id < first_id - 1 or last_id >= self._next_id:
+            return None
+        return [entry for entry in self._events
+                if entry[0] > last_id and key in (entry[1], ALL_FACULTY)]
+
+    async def stream(self, user_id: Optional[str] = None,
+                     last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the server-sent events of a faculty, or of all faculty
+
+        Args:
+            user_id (str): Faculty user id, None for all faculty
+            last_event_id (str): Last-Event-ID sent by a reconnecting display
+
+        Yields:
+            str: Formatted events and heartbeat comments"""
+
+        key = user_id or ALL_FACULTY
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # subscribe before replaying, so nothing published meanwhile is lost
+        self._subscribers[key].add(queue)
+        last_sent = 0
+
+        try:
+            yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+
+            if last_event_id:
+                missed = self._missed_events(key, last_event_id)
+                if missed is None:
+                    yield f"event: reset\ndata: {json.dumps({'user_id': user_id})}\n\n"
+                else:
+                    for event_id, _, event, data in missed:
+                        yield _format_event(event_id, event, data)
+                        last_sent = event_id
+
+            while True:
+                try:
+                    entry = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if entry is None:
+                    return
+                event_id, _, event, data = entry
+                if event_id <= last_sent:
+                    continue  # already replayed
+                yield _format_event(event_id, event, data)
+                last_sent = event_id
+        finally:
+            self._subscribers[key].discard(queue)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    def close(self) -> None:
+        """End every open stream, used on shutdown"""
+        for queues in self._subscribers.values():
+            for queue in queues:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def metrics(self) -> dict:
+        """Open streams and buffered events"""
+        return {
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "buffered_events": len(self._events),
+        }
+
+
+pi_message_hub = PiMessageHub()
+broker.subscribe(PI_MESSAGES_CHANNEL, pi_message_hub.receive)
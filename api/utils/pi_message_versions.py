@@ -0,0 +1,162 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+
+
+load_dotenv()
+
+PI_MESSAGE_VERSION_TTL_SECONDS = int(
+    os.getenv("PI_MESSAGE_VERSION_TTL_SECONDS", "10"))
+# user ids kept in the map, the least recently used are evicted first
+PI_MESSAGE_VERSION_CACHE_SIZE = int(
+    os.getenv("PI_MESSAGE_VERSION_CACHE_SIZE", "1024"))
+
+ALL_MESSAGES = "*"
+
+
+def _http_date(value: datetime) -> str:
+    """Format a naive local datetime as an HTTP date"""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)
+
+    Args:
+        if_none_match (str): Value of the If-None-Match header
+        etag (str): Current ETag
+
+    Returns:
+        bool: True if the client copy is still current"""
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag
+               for tag in if_none_match.split(","))
+
+
+class PiMessageVersions:
+    """In-process map of the ETag and Last-Modified of the pi messages
+
+    Entries are keyed by faculty user_id, ALL_MESSAGES holds the validators
+    of the full listing. The crud operations update the map after each
+    commit, so polling displays are answered without touching the database.
+    The ttl bounds how long other workers keep a stale entry. Clients may
+    poll any id, so at most `maxsize` entries are kept (LRU).
+    """
+
+    def __init__(self, ttl: int = PI_MESSAGE_VERSION_TTL_SECONDS,
+                 maxsize: int = PI_MESSAGE_VERSION_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, Optional[tuple[str, str]]]] = OrderedDict()
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def _store(self, key: str, validators: Optional[tuple[str, str]]):
+        self._entries[key] = (time.monotonic(), validators)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return validators
+
+    async def get(self, db: AsyncSession, user_id: str) -> Optional[tuple[str, str]]:
+        """Return the validators of a faculty's message
+
+        Args:
+            db (AsyncSession): Database session used on a cache miss
+            user_id (str): Faculty user id
+
+        Returns:
+            tuple: (ETag, Last-Modified), None if the faculty has no message"""
+
+        found, validators = self._lookup(user_id)
+        if found:
+            return validators
+
+        row = (await db.execute(
+            select(models.PiMessage.id, models.PiMessage.version,
+                   models.PiMessage.updated_at)
+            .where(models.PiMessage.user_id == user_id))).first()
+
+        if not row:
+            return self._store(user_id, None)
+        return self._store(user_id, (f'"{row.id}-{row.version}"',
+                                     _http_date(row.updated_at)))
+
+    async def get_all(self, db: AsyncSession) -> Optional[tuple[str, str]]:
+        """Return the validators of the listing of all messages
+
+        Args:
+            db (AsyncSession): Database session used on a cache miss
+
+        Returns:
+            tuple: (ETag, Last-Modified), None if there are no messages"""
+
+        found, validators = self._lookup(ALL_MESSAGES)
+        if found:
+            return validators
+
+        rows = (await db.execute(
+            select(models.PiMessage.id, models.PiMessage.version,
+                   models.PiMessage.updated_at,
+                   models.User.first_name, models.User.last_name)
+            .join(models.PiMessage.faculty)
+            .order_by(models.PiMessage.id))).all()
+
+        if not rows:
+            return self._store(ALL_MESSAGES, None)
+
+        digest = hashlib.sha1("\n".join(
+            f"{row.id}-{row.version}-{row.first_name}-{row.last_name}"
+            for row in rows).encode()).hexdigest()
+        return self._store(ALL_MESSAGES, (
+            f'"all-{digest}"', _http_date(max(row.updated_at for row in rows))))
+
+    def update(self, pi_message: models.PiMessage) -> None:
+        """Record the version of a message that was just committed"""
+        self._store(pi_message.user_id, (
+            f'"{pi_message.id}-{pi_message.version}"',
+            _http_date(pi_message.updated_at)))
+        self.invalidate_listing()
+
+    def remove(self, user_id: str) -> None:
+        """Record that a faculty's message was just deleted"""
+        self._store(user_id, None)
+        self.invalidate_listing()
+
+    def invalidate_listing(self) -> None:
+        """Drop the validators of the listing of all messages"""
+        self._entries.pop(ALL_MESSAGES, None)
+
+    def invalidate(self) -> None:
+        """Drop every entry so the next lookups reload them"""
+        self._entries.clear()
+
+
+pi_message_versions = PiMessageVersions()
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_all_messages(mapper, connection, target):
+    """The listing shows the faculty names, refresh it when a faculty changes"""
+    pi_message_versions.invalidate_listing()
@@ -1,22 +1,197 @@
 import os
-import requests
+import time
+import random
+import asyncio
+import logging
+import httpx
+from collections import OrderedDict
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-from ..crud.crud_user import UserCrud
-from ..models import User
 
 load_dotenv()
 
 IFTTT_KEY = os.getenv("IFTTT_KEY")
 
-user_crud = UserCrud()
+SMS_MAX_CONNECTIONS = int(os.getenv("SMS_MAX_CONNECTIONS", "2"))
+SMS_TIMEOUT_SECONDS = float(os.getenv("SMS_TIMEOUT_SECONDS", "5"))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "4"))
+SMS_BREAKER_THRESHOLD = int(os.getenv("SMS_BREAKER_THRESHOLD", "5"))
+SMS_BREAKER_RESET_SECONDS = float(os.getenv("SMS_BREAKER_RESET_SECONDS", "30"))
 
+# SMS to the same faculty within the window of the first one are merged
+# into one digest, SMS_BATCH_WINDOWS overrides it per event type, e.g.
+# "appointment_updated=120,appointment_checked_in=0"
+SMS_BATCH_WINDOW_SECONDS = int(os.getenv("SMS_BATCH_WINDOW_SECONDS", "30"))
+SMS_BATCH_WINDOWS = {
+    # the faculty should know right away that the student is waiting
+    "appointment_checked_in": 0,
+    **{event_type.strip(): int(seconds)
+       for event_type, seconds in (
+           item.split("=") for item in os.getenv("SMS_BATCH_WINDOWS", "").split(",")
+           if item.strip())}
+}
 
-async def send_sms(message: str):
-    """Send SMS notification to a user via IFTTT."""
+# idempotency keys remembered to skip redelivered messages
+DELIVERED_KEYS_KEPT = 10000
 
-    webhook_url = f"https://maker.ifttt.com/trigger/ReConnect_updates/with/key/{
-        IFTTT_KEY}"
-    requests.post(webhook_url, json={
-        "value1": message,
-    })
+IFTTT_WEBHOOK_URL = "https://maker.ifttt.com/trigger/ReConnect_updates/with/key/{key}"
+
+
+def sms_batch_window(event_type: str) -> int:
+    """Seconds an SMS of this event type waits for others to merge with"""
+    return SMS_BATCH_WINDOWS.get(event_type, SMS_BATCH_WINDOW_SECONDS)
+
+
+def sms_digest(messages: list[str]) -> str:
+    """Merge the pending SMS of a faculty into one text"""
+    if len(messages) == 1:
+        return messages[0]
+    return f"{len(messages)} updates: " + " | ".join(messages)
+
+
+class CircuitBreaker:
+    """Stop calling a failing service for a while
+
+    After `threshold` consecutive failures the breaker opens for
+    `reset_after` seconds, then lets one call through (half open). A success
+    closes it, a failure opens it again.
+    """
+
+    def __init__(self, threshold: int = SMS_BREAKER_THRESHOLD,
+                 reset_after: float = SMS_BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self.retry_after() > 0:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        """Seconds until a call may be tried again, 0 if allowed now"""
+        if self._opened_at is None:
+            return 0.0
+        return max(self._opened_at + self.reset_after - time.monotonic(), 0.0)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold or self._opened_at is not None:
+            self._opened_at = time.monotonic()
+
+
+class SmsNotifier:
+    """Send SMS through the IFTTT webhook
+
+    The outbox dispatcher calls `deliver`, which posts with one pooled
+    `httpx.AsyncClient`. Timeouts and 5xx/429 answers are retried with
+    exponential backoff and full jitter, and a circuit breaker pauses the
+    deliveries while IFTTT keeps failing. Messages are skipped when
+    IFTTT_KEY is not set.
+    """
+
+    def __init__(self, key: str = IFTTT_KEY, max_connections: int = SMS_MAX_CONNECTIONS,
+                 timeout: float = SMS_TIMEOUT_SECONDS,
+                 max_attempts: int = SMS_MAX_ATTEMPTS, backoff: float = 0.5,
+                 breaker: CircuitBreaker = None, transport: httpx.AsyncBaseTransport = None):
+        self.key = key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._transport = transport
+        self._client: httpx.AsyncClient = None
+        self._sent = 0
+        self._failed = 0
+        self._retries = 0
+        self._delivered_keys: OrderedDict[str, None] = OrderedDict()
+
+    async def start(self) -> None:
+        """Open the http client"""
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            transport=self._transport
+        )
+
+    async def stop(self) -> None:
+        """Close the http client"""
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def deliver(self, message: str, idempotency_key: str = None) -> bool:
+        """Post a message now, retrying transient failures
+
+        Args:
+            message (str): Text of the SMS
+            idempotency_key (str): Key of the message, a key that was already
+                delivered recently is not sent again
+
+        Returns:
+            bool: True if the message was delivered, or skipped as a duplicate
+                or because IFTTT_KEY is not set"""
+
+        if idempotency_key in self._delivered_keys or not self.key:
+            return True
+        if self._client is None:
+            logging.warning("SMS notifier is not started, SMS not sent")
+            return False
+        url = IFTTT_WEBHOOK_URL.format(key=self.key)
+
+        for attempt in range(self.max_attempts):
+            wait = self.breaker.retry_after()
+            if wait:
+                await asyncio.sleep(wait)
+            if attempt:
+                self._retries += 1
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+            try:
+                response = await self._client.post(url, json={"value1": message})
+            except httpx.HTTPError as e:
+                logging.warning(f"SMS attempt {attempt + 1} failed: {e!r}")
+                self.breaker.record_failure()
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                logging.warning(
+                    f"SMS attempt {attempt + 1} failed: {response.status_code}")
+                self.breaker.record_failure()
+                continue
+
+            self.breaker.record_success()
+            if response.is_error:
+                logging.error(f"SMS rejected by IFTTT: {response.status_code}")
+                self._failed += 1
+                return False
+            self._sent += 1
+            if idempotency_key:
+                self._delivered_keys[idempotency_key] = None
+                if len(self._delivered_keys) > DELIVERED_KEYS_KEPT:
+                    self._delivered_keys.popitem(last=False)
+            return True
+
+        self._failed += 1
+        return False
+
+    def metrics(self) -> dict:
+        """Delivery counters of the SMS notifier"""
+        return {
+            "sent": self._sent,
+            "failed": self._failed,
+            "retries": self._retries,
+            "breaker": self.breaker.state,
+        }
+
+
+sms_notifier = SmsNotifier()
@@ -1,28 +1,130 @@
+import os
+import time
+import asyncio
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import APIKeyHeader
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from hashlib import sha256
+from dotenv import load_dotenv
+from typing import Optional
 from .. import models, database
 
 
+load_dotenv()
+
+API_KEY_CACHE_TTL_SECONDS = int(os.getenv("API_KEY_CACHE_TTL_SECONDS", "300"))
+
 api_key_header = APIKeyHeader(name="R-API-KEY", auto_error=False)
 
 
+class ApiKeyCache:
+    """In-process cache of the hashed api keys stored in the secret table
+
+    The cache is refreshed from the database once it is older than `ttl`
+    seconds or after `invalidate` is called. Adding or removing a `Secret`
+    row through the ORM invalidates it once the change is committed (see
+    listeners below), the ttl bounds how long other workers keep a stale copy.
+
+    A single reload runs at a time, and a reload that started before an
+    invalidation is returned to its caller but not kept.
+    """
+
+    def __init__(self, ttl: int = API_KEY_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._hashes: Optional[frozenset] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+
+    def _reload_lock(self) -> asyncio.Lock:
+        # a lock is bound to one event loop, the tests run several
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _is_fresh(self) -> bool:
+        return (self._hashes is not None
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    async def get(self, db: AsyncSession) -> frozenset:
+        """Return the cached hashes, reloading them from the database if expired
+
+        Args:
+            db (AsyncSession): Database session used on a cache miss
+
+        Returns:
+            frozenset: Hashed api keys"""
+
+        if self._is_fresh():
+            return self._hashes
+
+        async with self._reload_lock():
+            # another request may have reloaded them meanwhile
+            if self._is_fresh():
+                return self._hashes
+
+            generation = self._generation
+            secret_entries = (await db.scalars(select(models.Secret))).all()
+            hashes = frozenset(
+                secret_entry.api_secret_key for secret_entry in secret_entries)
+            if generation == self._generation:
+                self._hashes = hashes
+                self._loaded_at = time.monotonic()
+            return hashes
+
+    def invalidate(self) -> None:
+        """Drop the cached hashes so the next lookup reloads them"""
+        self._generation += 1
+        self._hashes = None
+        self._loaded_at = 0.0
+
+
+api_key_cache = ApiKeyCache()
+
+
+_SECRETS_CHANGED = "api_key_cache.secrets_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _record_secret_changes(session, flush_context):
+    """Remember that the transaction changed a secret row"""
+    if any(isinstance(instance, models.Secret)
+           for instance in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_SECRETS_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_api_key_cache(session):
+    """Invalidate the api key cache once a secret change is committed
+
+    Invalidating at flush would let a concurrent request reload the rows
+    before the commit and keep the old keys for the whole ttl."""
+    if session.info.pop(_SECRETS_CHANGED, False):
+        api_key_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_secret_changes(session):
+    session.info.pop(_SECRETS_CHANGED, None)
+
+
 async def validate_api_key(api_key: str = Security(api_key_header),
-                           db: Session = Depends(database.get_db)):
+                           db: AsyncSession = Depends(database.get_db)):
     if not api_key:
         raise HTTPException(
             status_code=403, detail="API key is required")
 
-    secret_entries = db.query(models.Secret).all()
+    hashed_secret_keys = await api_key_cache.get(db)
 
-    if not secret_entries:
+    if not hashed_secret_keys:
         raise HTTPException(
             status_code=403, detail="Your are not authorized")
 
-    hashed_secret_keys = {
-        secret_entry.api_secret_key for secret_entry in secret_entries}
-
     hashed_api_key = sha256(api_key.encode()).hexdigest()
 
     if hashed_api_key not in hashed_secret_keys:
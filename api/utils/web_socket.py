@@ -1,48 +1,399 @@
-from sqlalchemy.orm import Session
-from typing import Dict
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict, deque
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import WebSocket, WebSocketDisconnect
+from .. import database, models
 from ..crud import crud_notification
 from ..schemas.notification_schema import NotificationSchema
+from .broker import broker, NOTIFICATIONS_CHANNEL
+
+load_dotenv()
+
+# messages waiting to be sent to one socket
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+# "drop" discards the oldest waiting message, "disconnect" closes the socket
+WS_QUEUE_FULL_POLICY = os.getenv("WS_QUEUE_FULL_POLICY", "drop")
+
+# notifications read from the database per query when replaying
+WS_REPLAY_PAGE_SIZE = int(os.getenv("WS_REPLAY_PAGE_SIZE", "100"))
+# a client that missed more is sent RESET_MESSAGE instead, and reloads the
+# feed over REST
+WS_REPLAY_MAX = int(os.getenv("WS_REPLAY_MAX", "500"))
+
+# half-open sockets are closed by the server's protocol pings (uvicorn
+# --ws-ping-interval / --ws-ping-timeout). For clients that answer it, an
+# application {"type": "ping"} can be sent when the client was silent for
+# the ping interval, and a client silent for the idle timeout disconnected.
+# 0 disables it, clients that never send text would be closed otherwise
+WS_PING_INTERVAL_SECONDS = float(os.getenv("WS_PING_INTERVAL_SECONDS", "25"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "0"))
+
+# close code sent to a socket that could not keep up (try again later)
+CLOSE_SLOW_CONSUMER = 1013
+# close code sent to a socket that stopped answering (going away)
+CLOSE_IDLE = 1001
+
+PING_MESSAGE = {"type": "ping"}
+RESET_MESSAGE = {"type": "reset"}
 
 notification_create = crud_notification.NotificationCrud()
 
 
-async def handle_create_notification(db: Session, user_id: str, notification_data: NotificationSchema):
+def notification_message(notification: models.Notification) -> dict:
+    """Websocket message of a notification, its id is the client's resume point"""
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "event_type": notification.event_type,
+        "message": notification.message,
+    }
+
+
+async def handle_create_notification(db: AsyncSession, user_id: str, notification_data: NotificationSchema):
     """Save notification and send a real-time update."""
-    success, message = notification_create.create_notification(
+    success, message = await notification_create.create_notification(
         db, user_id, notification_data)
     if success:
-        await _notify_user(user_id, notification_data)
+        # every worker delivers it to the sockets connected to it
+        await broker.publish(NOTIFICATIONS_CHANNEL, notification_message(message))
+        message = "Notification created"
     return success, message
 
 
-async def handle_websocket_connection(websocket: WebSocket, user_id: str):
-    """Manage WebSocket lifecycle."""
-    await _add_websocket_connection(user_id, websocket)
+async def replay_notifications(connection: "Connection", last_id: int) -> None:
+    """Send the notifications of the user stored after `last_id`, oldest first
+
+    When more than WS_REPLAY_MAX were missed (e.g. `last_id=0`), only
+    RESET_MESSAGE is sent, so live delivery does not wait for the history.
+
+    Args:
+        connection (Connection): Paused connection of the user
+        last_id (int): Id of the last notification the client received"""
+
+    async with database.AsyncSessionLocal() as db:
+        # one row of the (user_id, id) index, past the most that is replayed
+        too_many = await db.scalar(
+            select(models.Notification.id)
+            .where(models.Notification.user_id == connection.user_id,
+                   models.Notification.id > last_id)
+            .order_by(models.Notification.id)
+            .offset(WS_REPLAY_MAX).limit(1))
+    if too_many is not None:
+        await connection.websocket.send_json(RESET_MESSAGE)
+        return
+
+    while True:
+        async with database.AsyncSessionLocal() as db:
+            notifications = await notification_create.get_notification_by_user(
+                db, connection.user_id, limit=WS_REPLAY_PAGE_SIZE, after=last_id)
+        for notification in notifications:
+            await connection.websocket.send_json(notification_message(notification))
+            connection.replayed.add(notification.id)
+        if len(notifications) < WS_REPLAY_PAGE_SIZE:
+            return
+        last_id = notifications[-1].id
+
+
+async def handle_websocket_connection(websocket: WebSocket, user_id: str,
+                                      last_id: int = None,
+                                      ping_interval: float = WS_PING_INTERVAL_SECONDS,
+                                      idle_timeout: float = WS_IDLE_TIMEOUT_SECONDS,
+                                      registry: "ConnectionRegistry" = None):
+    """Manage WebSocket lifecycle.
+
+    A client reconnecting with the id of the last notification it received
+    first gets the ones it missed, then the live ones. The socket is
+    registered before reading the database, live notifications are held
+    meanwhile and those already replayed are skipped.
+
+    With an `idle_timeout`, any text from the client (e.g. the answer to a
+    {"type": "ping"}) shows it is alive, and a socket silent for
+    `idle_timeout` seconds, such as one of a laptop gone to sleep, is closed.
+    A ping that does not fit in a full queue under the disconnect policy
+    closes the socket like any other message.
+    """
+    registry = registry or connection_registry
+    connection = await registry.connect(
+        user_id, websocket, paused=last_id is not None)
+    receiver = None
+    close_code = 1000
     try:
-        while True:
-            await websocket.receive_text()  # Keep connection alive
+        if last_id is not None:
+            await replay_notifications(connection, last_id)
+            connection.resume()
+        while not connection.closed:
+            if receiver is None:
+                receiver = asyncio.ensure_future(websocket.receive_text())
+            done, _ = await asyncio.wait({receiver}, timeout=ping_interval)
+            if done:
+                receiver.result()
+                receiver = None
+                connection.touch()
+            elif idle_timeout <= 0:
+                continue
+            elif connection.idle_seconds() >= idle_timeout:
+                logging.info(f"Closing idle websocket of {user_id}")
+                registry.stats.evicted += 1
+                close_code = CLOSE_IDLE
+                break
+            elif not connection.enqueue(PING_MESSAGE):
+                logging.warning(
+                    f"Closing websocket of {user_id}, send queue is full")
+                close_code = CLOSE_SLOW_CONSUMER
+                break
     except WebSocketDisconnect:
-        await _remove_websocket_connection(user_id)
+        pass
+    finally:
+        # unregistered and cancelled before any await, so a cancelled
+        # handler does not leave the socket or its sender task behind
+        registry.unregister(connection)
+        if receiver is not None:
+            receiver.cancel()
+        await registry.disconnect(connection, code=close_code)
+        if receiver is not None:
+            await asyncio.gather(receiver, return_exceptions=True)
+
+
+class ConnectionStats:
+    """Counters and send latencies of the websockets of this worker"""
+
+    def __init__(self, window: int = 60, latency_samples: int = 1000):
+        self.sent = 0
+        self.dropped = 0
+        self.evicted = 0
+        # messages sent in each of the last `window` seconds
+        self._per_second: deque[list[int]] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=latency_samples)
+
+    def record_send(self, latency: float) -> None:
+        self.sent += 1
+        self._latencies.append(latency)
+        second = int(time.monotonic())
+        if self._per_second and self._per_second[-1][0] == second:
+            self._per_second[-1][1] += 1
+        else:
+            self._per_second.append([second, 1])
+
+    def messages_per_second(self) -> float:
+        """Average over the last minute"""
+        window = self._per_second.maxlen
+        since = int(time.monotonic()) - window
+        return round(sum(count for second, count in self._per_second
+                         if second > since) / window, 3)
+
+    def latency(self) -> dict:
+        """Milliseconds between queueing and sending, over the latest sends"""
+        if not self._latencies:
+            return {"avg_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        latencies = sorted(self._latencies)
+        return {
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p99_ms": round(latencies[min(int(len(latencies) * 0.99),
+                                          len(latencies) - 1)] * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+        }
+
+
+class Connection:
+    """A websocket with its own bounded send queue and sender task
+
+    Messages are queued without waiting, the sender task writes them to the
+    socket, so a slow client never delays the code that notifies it.
+
+    A paused connection only queues messages until `resume` starts the
+    sender, which skips the notification ids in `replayed`.
+    """
+
+    def __init__(self, user_id: str, websocket: WebSocket,
+                 queue_size: int = WS_SEND_QUEUE_SIZE,
+                 policy: str = WS_QUEUE_FULL_POLICY, paused: bool = False,
+                 stats: ConnectionStats = None):
+        if policy not in ("drop", "disconnect"):
+            raise ValueError(f"Unsupported queue full policy: {policy}")
+        self.user_id = user_id
+        self.websocket = websocket
+        self.policy = policy
+        # (queued at, message) pairs
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = stats or ConnectionStats()
+        self.dropped = 0
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.replayed: set[int] = set()
+        self._sender: asyncio.Task = None
+        if not paused:
+            self.resume()
+
+    def resume(self) -> None:
+        """Start sending the queued messages"""
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_loop())
+
+    def touch(self) -> None:
+        """Record that the client sent something"""
+        self.last_seen = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        """Seconds since the client last sent something"""
+        return time.monotonic() - self.last_seen
+
+    def enqueue(self, message: dict) -> bool:
+        """Queue a message for the socket
+
+        Args:
+            message (dict): Json message
+
+        Returns:
+            bool: False if the queue is full and the policy is to disconnect"""
+
+        if self.closed:
+            return False
+        entry = (time.monotonic(), message)
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            if self.policy == "disconnect":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(entry)
+            self.dropped += 1
+            self.stats.dropped += 1
+            return True
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                queued_at, message = await self.queue.get()
+                if message.get("id") in self.replayed:
+                    continue  # already sent by the replay
+                await self.websocket.send_json(message)
+                self.stats.record_send(time.monotonic() - queued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # the client went away, the receive loop cleans up
+            self.closed = True
+
+    async def close(self, code: int = 1000) -> None:
+        """Stop the sender and close the socket"""
+        self.closed = True
+        if self._sender is not None:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # already closed by the client
+
+
+class ConnectionRegistry:
+    """The websockets connected to this worker, any number per user"""
+
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE,
+                 policy: str = WS_QUEUE_FULL_POLICY):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.stats = ConnectionStats()
+        self._connections: dict[str, set[Connection]] = defaultdict(set)
+        # closes of slow sockets in progress, referenced until they finish
+        self._closing: set[asyncio.Task] = set()
+
+    async def connect(self, user_id: str, websocket: WebSocket,
+                      paused: bool = False) -> Connection:
+        """Accept a websocket and register it for the user
+
+        Args:
+            user_id (str): User id
+            websocket (WebSocket): Incoming websocket
+            paused (bool): Hold the messages until the connection is resumed
+
+        Returns:
+            Connection: The registered connection"""
+
+        await websocket.accept()
+        connection = Connection(user_id, websocket, queue_size=self.queue_size,
+                                policy=self.policy, paused=paused, stats=self.stats)
+        self._connections[user_id].add(connection)
+        return connection
+
+    def unregister(self, connection: Connection) -> None:
+        """Stop sending to a connection, without closing it"""
+        connections = self._connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._connections[connection.user_id]
+
+    async def disconnect(self, connection: Connection, code: int = 1000) -> None:
+        """Unregister a connection and close it"""
+        self.unregister(connection)
+        await connection.close(code)
+
+    def send(self, user_id: str, message: dict) -> int:
+        """Queue a message on every socket of a user, without waiting
+
+        Args:
+            user_id (str): User id
+            message (dict): Json message
+
+        Returns:
+            int: Number of sockets the message was queued on"""
+
+        queued = 0
+        for connection in list(self._connections.get(user_id, ())):
+            if connection.enqueue(message):
+                queued += 1
+            elif not connection.closed:
+                connection.closed = True
+                logging.warning(
+                    f"Closing websocket of {user_id}, send queue is full")
+                task = asyncio.create_task(
+                    self.disconnect(connection, code=CLOSE_SLOW_CONSUMER))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        return queued
+
+    def connection_count(self, user_id: str = None) -> int:
+        """Number of open sockets, of a user or of everyone"""
+        if user_id is not None:
+            return len(self._connections.get(user_id, ()))
+        return sum(len(connections) for connections in self._connections.values())
+
+    def metrics(self) -> dict:
+        """Open sockets, send rate, queue depths and send latency"""
+        depths = [connection.queue.qsize()
+                  for connections in self._connections.values()
+                  for connection in connections]
+        return {
+            "connections": len(depths),
+            "users": len(self._connections),
+            "messages_sent": self.stats.sent,
+            "messages_per_second": self.stats.messages_per_second(),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped": self.stats.dropped,
+            "idle_evicted": self.stats.evicted,
+            "send_latency": self.stats.latency(),
+        }
 
 
-# In-memory storage for active WebSocket connections, mapped by user_id
-_active_connections: Dict[str, WebSocket] = {}
+connection_registry = ConnectionRegistry()
 
 
-async def _notify_user(user_id: str, message: str):
+async def _notify_user(user_id: str, message: dict):
     """Send notification message to a specific user via WebSocket."""
-    websocket = _active_connections.get(user_id)
-    if websocket:
-        await websocket.send_text(message)
+    connection_registry.send(user_id, message)
 
 
-async def _add_websocket_connection(user_id: str, websocket: WebSocket):
-    """Add a new WebSocket connection for a specific user."""
-    _active_connections[user_id] = websocket
+async def _deliver_notification(notification: dict):
+    """Deliver a notification published on the broker to the local sockets."""
+    await _notify_user(notification["user_id"], notification)
 
 
-async def _remove_websocket_connection(user_id: str):
-    """Remove WebSocket connection for a user on disconnect."""
-    if user_id in _active_connections:
-        del _active_connections[user_id]
+broker.subscribe(NOTIFICATIONS_CHANNEL, _deliver_notification)
@@ -1,14 +1,19 @@
 import pytest
-from sqlalchemy import create_engine
+import smtplib
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from api import database
 from api.database import Base, get_db
-from api.utils import validate_api_key
+from api.utils import validate_api_key, mail_utils
 from api.routers import app_token
 from fastapi.testclient import TestClient
 from api.main import app
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 
 def fake_validate_api_key():
@@ -19,20 +24,77 @@ def token():
     return "Bearer token"
 
 
+class LocalSMTP:
+    """In-memory stand-in for an SMTP server connection
+
+    Sent messages are collected in `outbox`, `disconnects` makes that many
+    of the next sends fail as if the server had dropped the connection.
+    """
+
+    outbox = []
+    connections = 0
+    disconnects = 0
+
+    def __init__(self, host, port, timeout=None):
+        LocalSMTP.connections += 1
+        self.logged_in = False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logged_in = True
+
+    def sendmail(self, sender, recipient, content):
+        if LocalSMTP.disconnects:
+            LocalSMTP.disconnects -= 1
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        assert self.logged_in
+        LocalSMTP.outbox.append((recipient, content))
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={
                        "check_same_thread": False})
 TestingSessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine)
 
+# every TestClient runs its own event loop, so connections are not pooled
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+# requests and background workers write concurrently, take the sqlite write
+# lock when the transaction starts so they wait for each other instead of
+# failing to upgrade a read lock ("database is locked")
+@event.listens_for(async_engine.sync_engine, "connect")
+def disable_pysqlite_begin(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+@event.listens_for(async_engine.sync_engine, "begin")
+def begin_immediate(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
+# background workers open their own sessions
+database.AsyncSessionLocal = TestingAsyncSessionLocal
+
+# emails are delivered to the stand-in instead of a real server
+mail_utils.mail_service.smtp_factory = LocalSMTP
+
 app.dependency_overrides[get_db] = override_get_db
 app.dependency_overrides[validate_api_key.validate_api_key] = fake_validate_api_key
 app.dependency_overrides[app_token.create_token] = token
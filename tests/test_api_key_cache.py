@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from hashlib import sha256
+from fastapi import HTTPException
+from sqlalchemy import event
+from api import models
+from api.utils import validate_api_key
+from .conftest import TestingAsyncSessionLocal, async_engine
+
+
+def count_secret_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if "FROM secret" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine,
+                 "before_cursor_execute", before_cursor_execute)
+    return statements, before_cursor_execute
+
+
+async def check_api_key_cache():
+    async with TestingAsyncSessionLocal() as db:
+        db.add(models.Secret(key_id="kiosk",
+                             api_secret_key=sha256(b"first-key").hexdigest()))
+        await db.commit()
+
+        statements, listener = count_secret_queries()
+        try:
+            for _ in range(5):
+                assert await validate_api_key.validate_api_key("first-key", db)
+            assert len(statements) == 1, "Secret table read more than once"
+
+            with pytest.raises(HTTPException) as exc:
+                await validate_api_key.validate_api_key("second-key", db)
+            assert exc.value.status_code == 403
+
+            # adding a secret row refreshes the cache
+            db.add(models.Secret(key_id="dashboard",
+                                 api_secret_key=sha256(b"second-key").hexdigest()))
+            await db.commit()
+            assert await validate_api_key.validate_api_key("second-key", db)
+
+            # removing a secret row refreshes the cache
+            await db.delete(await db.get(models.Secret, "kiosk"))
+            await db.commit()
+            with pytest.raises(HTTPException):
+                await validate_api_key.validate_api_key("first-key", db)
+        finally:
+            event.remove(async_engine.sync_engine,
+                         "before_cursor_execute", listener)
+
+
+def test_api_key_cache(client):
+    validate_api_key.api_key_cache.invalidate()
+    asyncio.run(check_api_key_cache())
+
+
+async def check_revoked_key_is_refused():
+    async with TestingAsyncSessionLocal() as db:
+        db.add(models.Secret(key_id="revoked",
+                             api_secret_key=sha256(b"revoked-key").hexdigest()))
+        await db.commit()
+        assert await validate_api_key.validate_api_key("revoked-key", db)
+
+        # a change rolled back keeps the cache
+        await db.delete(await db.get(models.Secret, "revoked"))
+        await db.flush()
+        await db.rollback()
+        assert validate_api_key.api_key_cache._is_fresh()
+
+        async with TestingAsyncSessionLocal() as other:
+            await other.delete(await other.get(models.Secret, "revoked"))
+            await other.commit()
+
+        with pytest.raises(HTTPException) as exc:
+            await validate_api_key.validate_api_key("revoked-key", db)
+        assert exc.value.status_code == 403
+
+
+class SlowSecrets:
+    """Session stand-in whose secret query waits until released"""
+
+    def __init__(self):
+        self.queries = 0
+        self.release = asyncio.Event()
+
+    async def scalars(self, statement):
+        self.queries += 1
+        await self.release.wait()
+        return self
+
+    def all(self):
+        return [models.Secret(key_id="kiosk", api_secret_key="hash")]
+
+
+async def check_concurrent_reloads():
+    cache = validate_api_key.ApiKeyCache()
+    db = SlowSecrets()
+
+    # a burst on a cold cache reads the table once
+    burst = [asyncio.create_task(cache.get(db)) for _ in range(5)]
+    await asyncio.sleep(0)
+    db.release.set()
+    assert await asyncio.gather(*burst) == [frozenset({"hash"})] * 5
+    assert db.queries == 1
+
+    # a reload that started before an invalidation is not kept
+    db.release.clear()
+    cache.invalidate()
+    reload = asyncio.create_task(cache.get(db))
+    await asyncio.sleep(0)
+    cache.invalidate()
+    db.release.set()
+    await reload
+    assert not cache._is_fresh()
+
+
+def test_api_key_revocation(client):
+    validate_api_key.api_key_cache.invalidate()
+    asyncio.run(check_revoked_key_is_refused())
+    asyncio.run(check_concurrent_reloads())
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from datetime import date, time
+from api import models
+from sqlalchemy import select, update
+from api.crud.crud_appointment import CrudAppointment
+from .conftest import TestingAsyncSessionLocal
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def book(client, headers, faculty_id, day, start, end):
+    return client.post("/api/v1/appointment/create/", headers=headers, json={
+        "faculty_id": faculty_id,
+        "student_id": "70573522",
+        "date": day,
+        "start_time": start,
+        "end_time": end,
+        "reason": "Advising"
+    })
+
+
+def test_overlapping_appointments_are_rejected(client, headers):
+    first = book(client, headers, "70573536", "2024-10-02", "09:00", "10:00")
+    assert first.status_code == 200
+
+    assert book(client, headers, "70573536", "2024-10-02", "09:30", "10:30").status_code == 409
+    assert book(client, headers, "70573536", "2024-10-02", "08:30", "11:00").status_code == 409
+    # back to back, another day or another faculty
+    second = book(client, headers, "70573536", "2024-10-02", "10:00", "10:30")
+    assert second.status_code == 200
+    assert book(client, headers, "70573536", "2024-10-03", "09:30", "10:30").status_code == 200
+    assert book(client, headers, "70573540", "2024-10-02", "09:30", "10:30").status_code == 200
+    assert book(client, headers, "70573536", "2024-10-04", "10:00", "09:00").status_code == 400
+
+    url = f"/api/v1/appointment/update/{second.json()['id']}"
+    response = client.put(url, headers=headers, json={"start_time": "09:45", "end_time": "10:15"})
+    assert response.status_code == 409
+    # an appointment does not conflict with itself
+    response = client.put(url, headers=headers, json={"start_time": "10:00", "end_time": "10:45"})
+    assert response.status_code == 200
+    assert (response.json()["date"], response.json()["end_time"]) == ("2024-10-02", "10:45")
+
+
+def test_appointments_must_fit_the_availability(client, headers):
+    response = client.post("/api/v1/availability/create/", headers=headers, json={
+        "day": "Monday",
+        "start_time": "08:00",
+        "end_time": "12:00",
+        "user_id": "70573536"
+    })
+    assert response.status_code == 200
+
+    # 2024-09-30 is a Monday
+    assert book(client, headers, "70573536", "2024-09-30", "09:00", "09:30").status_code == 200
+    assert book(client, headers, "70573536", "2024-09-30", "11:30", "12:30").status_code == 409
+    assert book(client, headers, "70573536", "2024-10-01", "09:00", "09:30").status_code == 409
+
+
+def test_concurrent_bookings_of_a_slot(client, headers):
+    # 2024-10-07 is a Monday, inside the availability added above
+    async def book_slot():
+        async with TestingAsyncSessionLocal() as db:
+            await CrudAppointment.check_time_slot(
+                db, "70573536", date(2024, 10, 7), time(10), time(10, 30))
+            db.add(models.Appointment(faculty_id="70573536", student_id="70573522",
+                                      date=date(2024, 10, 7), start_time=time(10),
+                                      end_time=time(10, 30), reason="Advising"))
+            await db.commit()
+
+    async def book_twice():
+        return await asyncio.gather(book_slot(), book_slot(), return_exceptions=True)
+
+    results = asyncio.run(book_twice())
+    assert results.count(None) == 1
+    assert [error.status_code for error in results if error is not None] == [409]
+
+
+async def appointment_id_at(day, start):
+    async with TestingAsyncSessionLocal() as db:
+        return await db.scalar(select(models.Appointment.id).where(
+            models.Appointment.date == day, models.Appointment.start_time == start))
+
+
+async def cancel(appointment_id):
+    async with TestingAsyncSessionLocal() as db:
+        await db.execute(update(models.Appointment)
+                         .where(models.Appointment.id == appointment_id)
+                         .values(satus="cancelled"))
+        await db.commit()
+
+
+def test_unmoved_appointments_are_not_checked(client, headers):
+    # booked on a Wednesday, before the faculty only became available on Mondays
+    appointment_id = asyncio.run(appointment_id_at(date(2024, 10, 2), time(10)))
+    url = f"/api/v1/appointment/update/{appointment_id}"
+
+    response = client.put(url, headers=headers, json={"reason": "Transcript"})
+    assert response.status_code == 200
+    response = client.put(url, headers=headers, json={"start_time": "10:05", "end_time": "10:40"})
+    assert response.status_code == 409
+
+    asyncio.run(cancel(appointment_id))
+    response = client.put(url, headers=headers, json={"start_time": "10:05", "end_time": "10:40"})
+    assert response.status_code == 200
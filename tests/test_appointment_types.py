@@ -0,0 +1,65 @@
+from datetime import date, time, datetime
+from sqlalchemy import select
+from api import models
+from .conftest import TestingAsyncSessionLocal
+
+
+async def faculty_appointments(faculty_id: str, day: date):
+    async with TestingAsyncSessionLocal() as db:
+        return (await db.scalars(
+            select(models.Appointment)
+            .where(models.Appointment.faculty_id == faculty_id,
+                   models.Appointment.date == day)
+            .order_by(models.Appointment.start_time))).all()
+
+
+def test_appointment_dates_are_typed(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    ids = []
+    for day, start, end in (("2024-09-30", "13:00", "13:30"),
+                            ("2024-09-30", "09:00", "09:30"),
+                            ("2024-10-01", "09:00", "09:30")):
+        response = client.post("/api/v1/appointment/create/", headers=headers, json={
+            "faculty_id": "70573536",
+            "student_id": "70573522",
+            "date": day,
+            "start_time": start,
+            "end_time": end,
+            "reason": "Advising"
+        })
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+
+    # responses keep their string formats
+    response = client.get(f"/api/v1/appointment/get-by-id/{ids[0]}", headers=headers)
+    appointment = response.json()
+    assert (appointment["date"], appointment["start_time"], appointment["end_time"]) == (
+        "2024-09-30", "13:00", "13:30")
+    assert appointment["created_at"] == datetime.now().strftime("%B %d, %Y")
+
+    # the day of a faculty is a range of the (faculty_id, date, start_time) index
+    appointments = client.portal.call(faculty_appointments, "70573536", date(2024, 9, 30))
+    assert [appointment.id for appointment in appointments] == [ids[1], ids[0]]
+    assert appointments[0].start_time == time(9, 0)
+
+    response = client.post("/api/v1/appointment/create/", headers=headers, json={
+        "faculty_id": "70573536",
+        "student_id": "70573522",
+        "date": "2024-02-30",
+        "start_time": "09:00",
+        "end_time": "09:30",
+        "reason": "Advising"
+    })
+    assert response.status_code == 422
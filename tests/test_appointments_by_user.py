@@ -0,0 +1,55 @@
+from sqlalchemy import event
+from .conftest import async_engine
+
+
+def test_appointments_by_user(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for faculty_id, student_id, day in (
+            ("70573536", "70573522", "2024-10-02"),
+            ("70573540", "70573536", "2024-10-01"),
+            ("70573540", "70573522", "2024-10-03")):
+        response = client.post("/api/v1/appointment/create/", headers=headers, json={
+            "faculty_id": faculty_id,
+            "student_id": student_id,
+            "date": day,
+            "start_time": "09:00",
+            "end_time": "09:30",
+            "reason": "Advising"
+        })
+        assert response.status_code == 200
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if "FROM appointment" in statement:
+            statements.append(statement)
+
+    url = "/api/v1/appointments/get-by-user/70573536"
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    assert [item["date"] for item in response.json()] == ["2024-10-01", "2024-10-02"]
+    assert len(statements) == 1
+
+    response = client.get(url, headers=headers, params={"role": "student"})
+    assert [item["faculty_id"] for item in response.json()] == ["70573540"]
+    response = client.get("/api/v1/appointments/get-by-user/70573522", headers=headers,
+                          params={"role": "faculty"})
+    assert response.json() == []
+    response = client.get(url, headers=headers, params={"role": "admin"})
+    assert response.status_code == 422
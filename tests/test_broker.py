@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from api.utils import broker as broker_module
+from api.utils.broker import InProcessBroker, RedisBroker, create_broker
+
+
+class FakePubSub:
+    """Subscription of a FakeRedis client"""
+
+    def __init__(self, server):
+        self.server = server
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.server.subscriptions.setdefault(channel, []).append(self.queue)
+            await self.queue.put({"type": "subscribe", "channel": channel.encode(),
+                                  "data": 1})
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        for queues in self.server.subscriptions.values():
+            if self.queue in queues:
+                queues.remove(self.queue)
+
+
+class FakeRedis:
+    """Stand-in for a redis server and its client, shared by several workers"""
+
+    def __init__(self):
+        self.subscriptions = {}
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, data):
+        for queue in self.subscriptions.get(channel, []):
+            await queue.put({"type": "message", "channel": channel.encode(),
+                             "data": data.encode()})
+
+
+async def check_redis_fan_out():
+    server = FakeRedis()
+    workers = [RedisBroker(client=server) for _ in range(2)]
+    received = [[], []]
+    for index, worker in enumerate(workers):
+        async def handler(payload, index=index):
+            received[index].append(payload)
+        worker.subscribe("notifications", handler)
+        await worker.start()
+    await asyncio.sleep(0)
+
+    # a message published by one worker reaches the handlers of both
+    await workers[0].publish("notifications", {"user_id": "70573536"})
+    await workers[1].publish("other", {"user_id": "70573537"})
+    await asyncio.sleep(0.01)
+    assert received == [[{"user_id": "70573536"}], [{"user_id": "70573536"}]]
+
+    for worker in workers:
+        await worker.stop()
+    assert server.subscriptions == {"notifications": []}
+
+
+class UnreachableRedis(FakeRedis):
+    async def publish(self, channel, data):
+        raise ConnectionError("redis is down")
+
+
+async def check_redis_outage_is_reported():
+    broker = RedisBroker(client=UnreachableRedis())
+    assert await broker.publish("notifications", {"user_id": "70573536"}) is False
+
+
+async def check_in_process_broker():
+    broker = InProcessBroker()
+    received = []
+
+    async def failing(payload):
+        raise RuntimeError("handler failed")
+
+    async def handler(payload):
+        received.append(payload)
+
+    broker.subscribe("notifications", failing)
+    broker.subscribe("notifications", handler)
+    assert await broker.publish("notifications", {"message": "hello"}) is True
+    # a failing handler does not stop the others
+    assert received == [{"message": "hello"}]
+
+
+def test_brokers():
+    asyncio.run(check_redis_fan_out())
+    asyncio.run(check_redis_outage_is_reported())
+    asyncio.run(check_in_process_broker())
+    assert isinstance(create_broker("memory://"), InProcessBroker)
+    with pytest.raises(ValueError):
+        create_broker("amqp://localhost")
+
+
+def test_notification_reaches_websocket(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    assert isinstance(broker_module.broker, InProcessBroker)
+
+    notification = {
+        "user_id": "70573536",
+        "event_type": "appointment",
+        "message": "New appointment at 10am"
+    }
+    with client.websocket_connect("/api/v1/ws/notifications/70573536") as websocket:
+        response = client.post(
+            "/api/v1/ws_create_notifications/70573536", json=notification)
+        assert response.json()["success"]
+        assert websocket.receive_json() == {"id": 1, **notification}
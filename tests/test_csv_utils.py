@@ -0,0 +1,61 @@
+import asyncio
+import io
+from fastapi import UploadFile
+from api.schemas import user_schema
+from api.utils import csv_utils
+from api.utils.import_jobs import STUDENT_CSV_COLUMNS
+
+
+CSV_CONTENT = (
+    "\ufeffEmail,ID,Pref. First,Last Name,Notes\n"
+    "ann.lee@southernct.edu,700000001,Ann,Lee,\"first line\nsecond line\"\n"
+    "not-an-email,700000002,Bob,Ray,\n"
+    "cal.fox@southernct.edu,700000003,Cal,Fox\n"
+    "dee.kim@southernct.edu,700000004,Dee,Kim,\"quoted, comma\"\n"
+).encode()
+
+
+async def collect(generator):
+    return [item async for item in generator]
+
+
+def test_iter_csv_rows_small_chunks():
+    file = UploadFile(file=io.BytesIO(CSV_CONTENT), filename="roster.csv")
+    rows = asyncio.run(collect(csv_utils.iter_csv_rows(file, chunk_size=7)))
+
+    assert len(rows) == 4
+    assert rows[0]["Email"] == "ann.lee@southernct.edu"
+    assert rows[0]["Notes"] == "first line\nsecond line"
+    assert rows[2]["Notes"] == ""
+    assert rows[3]["Notes"] == "quoted, comma"
+
+
+def test_iter_validated_batches():
+    file = UploadFile(file=io.BytesIO(CSV_CONTENT), filename="roster.csv")
+    batches = asyncio.run(collect(csv_utils.iter_validated_batches(
+        file, user_schema.StudentImport, STUDENT_CSV_COLUMNS, batch_size=2)))
+
+    assert [len(students) for students, _ in batches] == [2, 1]
+    assert sum(invalid for _, invalid in batches) == 1
+    assert batches[1][0][0].student_id == "700000004"
+
+
+def test_iter_csv_rows_stray_quote():
+    content = ("Email,ID,Pref. First,Last Name,Notes\n"
+               "pat.o@southernct.edu,700000005,Pat,O\"Brien,\n"
+               "sam.doe@southernct.edu,700000006,Sam,Doe,\"first line\nsecond line\"\n").encode()
+    file = UploadFile(file=io.BytesIO(content), filename="roster.csv")
+    rows = asyncio.run(collect(csv_utils.iter_csv_rows(file, chunk_size=5)))
+
+    assert len(rows) == 2
+    assert rows[0]["Last Name"] == 'O"Brien'
+    assert rows[1]["Notes"] == "first line\nsecond line"
+
+
+def test_record_splitter_releases_records_after_stray_quote():
+    splitter = csv_utils._RecordSplitter()
+
+    assert splitter.feed('a,O"Brien,x\nb,') == 'a,O"Brien,x\n'
+    assert splitter.feed('"c\nd""e",f\ng') == 'b,"c\nd""e",f\n'
+    assert splitter.buffer == "g"
+    assert splitter.flush() == "g"
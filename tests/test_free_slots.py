@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from api.utils.free_slots import free_slots, free_slot_cache, FreeSlotCache
+
+
+def at(hour, minute=0):
+    return datetime(2024, 9, 30, hour, minute)
+
+
+def test_free_slots_sweep():
+    windows = [(at(13), at(15)), (at(8), at(10)), (at(9), at(11))]
+    busy = [(at(9, 15), at(9, 45)), (at(10, 30), at(13, 30)), (at(8), at(8, 30))]
+
+    assert free_slots(windows, busy, timedelta(minutes=30)) == [
+        (at(8, 30), at(9)),
+        (at(9, 45), at(10, 15)),
+        (at(13, 30), at(14)),
+        (at(14), at(14, 30)),
+        (at(14, 30), at(15)),
+    ]
+    assert free_slots(windows, [], timedelta(hours=2)) == [
+        (at(8), at(10)), (at(13), at(15))]
+    assert free_slots([], busy, timedelta(minutes=30)) == []
+
+
+def test_free_slots_endpoint(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for start, end in (("09:00", "10:30"), ("14:00", "15:00")):
+        response = client.post("/api/v1/availability/create/", headers=headers, json={
+            "day": "Monday", "start_time": start, "end_time": end, "user_id": "70573536"})
+        assert response.status_code == 200
+
+    monday = date.today() + timedelta(days=7 - date.today().weekday())
+    url = "/api/v1/availability/free-slots/70573536"
+    params = {"start_date": monday.isoformat(),
+              "end_date": (monday + timedelta(days=6)).isoformat(), "slot_minutes": 30}
+
+    response = client.get(url, headers=headers, params=params)
+    assert response.status_code == 200
+    assert [slot["start_time"] for slot in response.json()] == [
+        "09:00", "09:30", "10:00", "14:00", "14:30"]
+    assert {slot["date"] for slot in response.json()} == {monday.isoformat()}
+
+    hits = free_slot_cache.metrics()["hits"]
+    assert client.get(url, headers=headers, params=params).json() == response.json()
+    assert free_slot_cache.metrics()["hits"] == hits + 1
+
+    # a booking drops the cached calendar
+    response = client.post("/api/v1/appointment/create/", headers=headers, json={
+        "faculty_id": "70573536",
+        "student_id": "70573522",
+        "date": monday.isoformat(),
+        "start_time": "09:30",
+        "end_time": "10:00",
+        "reason": "Advising"
+    })
+    assert response.status_code == 200
+    response = client.get(url, headers=headers, params=params)
+    assert [slot["start_time"] for slot in response.json()] == [
+        "09:00", "10:00", "14:00", "14:30"]
+
+    response = client.get(url, headers=headers, params={
+        "start_date": monday.isoformat(), "end_date": (monday - timedelta(days=1)).isoformat()})
+    assert response.status_code == 400
+
+
+class SlowFreeSlotCache(FreeSlotCache):
+    """Cache whose computation waits until the test releases it"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def _compute(self, db, faculty_id, first_day, last_day, slot):
+        await self.release.wait()
+        return [(at(9), at(9, 30))]
+
+
+async def check_slots_computed_during_a_change():
+    cache = SlowFreeSlotCache()
+    monday = date(2024, 9, 30)
+    lookup = asyncio.create_task(cache.get(None, "70573536", monday, monday,
+                                           timedelta(minutes=30)))
+    await asyncio.sleep(0)
+    # a booking of the faculty is committed meanwhile
+    cache.invalidate("70573536")
+    cache.release.set()
+
+    assert await lookup == [(at(9), at(9, 30))]
+    assert cache.metrics()["faculty"] == 0
+
+    await cache.get(None, "70573536", monday, monday, timedelta(minutes=30))
+    assert cache.metrics()["faculty"] == 1
+
+
+def test_free_slot_cache_generations():
+    asyncio.run(check_slots_computed_during_a_change())
@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture
+def headers(client):
+    user_data = {
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908924"
+    }
+
+    response = client.post("/api/v1/signup/", json=user_data)
+    assert response.status_code == 200
+
+    login_data = {
+        "username": user_data["email"],
+        "password": user_data["password"]
+    }
+
+    response = client.post("/api/v1/token/", data=login_data)
+    assert response.status_code == 200
+
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+
+def test_kiosk_signin_suffix(client, headers):
+    students = [
+        ("700001234", "one.doe@southernct.edu", "1111111111"),
+        ("800001234", "two.doe@southernct.edu", "2222222222"),
+        ("700005678", "three.doe@southernct.edu", "3333333333"),
+    ]
+
+    for student_id, email, phone_number in students:
+        response = client.post("/api/v1/signup-student/", json={
+            "student_id": student_id,
+            "first_name": "John",
+            "last_name": "Doe",
+            "email": email,
+            "phone_number": phone_number
+        }, headers=headers)
+        assert response.status_code == 200
+
+    response = client.post("/api/v1/kiosk-signin/", json={"user_id": "5678"})
+    assert response.status_code == 200
+    assert response.json()["student_id"] == "700005678"
+
+    # two students share the last 4 digits
+    response = client.post("/api/v1/kiosk-signin/", json={"user_id": "1234"})
+    assert response.status_code == 409
+
+    response = client.post("/api/v1/kiosk-signin/",
+                           json={"user_id": "800001234"})
+    assert response.status_code == 200
+    assert response.json()["student_id"] == "800001234"
@@ -0,0 +1,81 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def read_pages(client, headers, url, params):
+    items, after = [], None
+    while True:
+        response = client.get(url, headers=headers,
+                              params={**params, **({"after": after} if after else {})})
+        assert response.status_code == 200
+        assert len(response.json()) <= params["limit"]
+        items += response.json()
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            return items
+
+
+def test_appointment_pages(client, headers):
+    for faculty_id, day, start, end in (
+            ("70573536", "2024-10-03", "09:00", "09:30"),
+            ("70573536", "2024-10-01", "14:00", "14:30"),
+            ("70573540", "2024-10-01", "09:00", "09:30"),
+            ("70573536", "2024-10-01", "09:00", "09:30"),
+            ("70573536", "2024-10-02", "11:00", "11:30"),
+            ("70573536", "2024-11-05", "11:00", "11:30")):
+        response = client.post("/api/v1/appointment/create/", headers=headers, json={
+            "faculty_id": faculty_id,
+            "student_id": "70573522",
+            "date": day,
+            "start_time": start,
+            "end_time": end,
+            "reason": "Advising"
+        })
+        assert response.status_code == 200
+
+    url = "/api/v1/appointments/"
+    appointments = read_pages(client, headers, url, {"limit": 2})
+    assert [item["id"] for item in appointments] == list(range(1, 7))
+
+    appointments = read_pages(client, headers, url, {
+        "limit": 2, "sort": "date", "faculty_id": "70573536",
+        "start_date": "2024-10-01", "end_date": "2024-10-31"})
+    assert [(item["date"], item["start_time"]) for item in appointments] == [
+        ("2024-10-01", "09:00"), ("2024-10-01", "14:00"),
+        ("2024-10-02", "11:00"), ("2024-10-03", "09:00")]
+
+    response = client.get(url, headers=headers, params={"status": "cancelled"})
+    assert response.json() == []
+    response = client.get(url, headers=headers, params={"sort": "date", "after": "12"})
+    assert response.status_code == 400
+
+
+def test_availability_pages(client, headers):
+    for day in ("Monday", "Tuesday", "monday", "Wednesday", "Monday"):
+        response = client.post("/api/v1/availability/create/", headers=headers, json={
+            "day": day, "start_time": "08:00", "end_time": "10:00", "user_id": "70573536"})
+        assert response.status_code == 200
+
+    url = "/api/v1/availabilities/"
+    availabilities = read_pages(client, headers, url, {"limit": 2})
+    assert len(availabilities) == 5
+    assert availabilities[0]["faculty_id"] == "70573536"
+
+    availabilities = read_pages(client, headers, url, {"limit": 1, "day": "Monday"})
+    assert [item["day"] for item in availabilities] == ["Monday", "monday", "Monday"]
+    assert read_pages(client, headers, url, {"limit": 5, "faculty_id": "70573540"}) == []
@@ -0,0 +1,84 @@
+import asyncio
+import smtplib
+from api.utils.mail_utils import MailService
+from .conftest import LocalSMTP
+
+
+async def check_persistent_connection():
+    LocalSMTP.outbox.clear()
+    LocalSMTP.connections = 0
+    service = MailService(smtp_factory=LocalSMTP, pool_size=1, backoff=0)
+    await service.start()
+
+    for index in range(3):
+        assert service.send(f"student{index}@southernct.edu", "Subject", "<p>Hi</p>")
+    await service.join()
+    # one connection is reused for every message
+    assert LocalSMTP.connections == 1
+
+    # a dropped connection is opened again and the message retried
+    LocalSMTP.disconnects = 1
+    service.send("student3@southernct.edu", "Subject", "<p>Hi</p>")
+    await service.join()
+    await service.stop()
+
+    assert LocalSMTP.connections == 2
+    assert [recipient for recipient, _ in LocalSMTP.outbox] == [
+        f"student{index}@southernct.edu" for index in range(4)]
+    assert service.metrics()["sent"] == 4
+    assert service.metrics()["failed"] == 0
+
+
+class RefusingSMTP(LocalSMTP):
+    """Refuses one recipient and breaks on another"""
+
+    def sendmail(self, sender, recipient, content):
+        if recipient == "refused@southernct.edu":
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b"No such user")})
+        if recipient == "broken@southernct.edu":
+            raise RuntimeError("unexpected")
+        super().sendmail(sender, recipient, content)
+
+
+async def check_failed_messages():
+    LocalSMTP.outbox.clear()
+    LocalSMTP.connections = 0
+    service = MailService(smtp_factory=RefusingSMTP, pool_size=1, backoff=0)
+    await service.start()
+
+    # a refused recipient is not retried and keeps the connection
+    service.send("refused@southernct.edu", "Subject", "<p>Hi</p>")
+    await service.join()
+    assert LocalSMTP.connections == 1
+
+    # an unexpected error does not stop the worker
+    service.send("broken@southernct.edu", "Subject", "<p>Hi</p>")
+    service.send("student0@southernct.edu", "Subject", "<p>Hi</p>")
+    await service.join()
+    await service.stop()
+
+    assert [recipient for recipient, _ in LocalSMTP.outbox] == ["student0@southernct.edu"]
+    assert service.metrics()["sent"] == 1
+    assert service.metrics()["failed"] == 2
+
+
+def test_mail_service():
+    asyncio.run(check_persistent_connection())
+    asyncio.run(check_failed_messages())
+
+
+def test_verification_email_is_queued(client):
+    LocalSMTP.outbox.clear()
+    response = client.post("/api/v1/verify-email/",
+                           json={"email": "hilarionw2@southernct.edu"})
+    assert response.status_code == 200
+    code = response.json()["verification_code"]
+
+    # the endpoint returns once queued, the worker sends shortly after
+    for _ in range(50):
+        if LocalSMTP.outbox:
+            break
+        client.portal.call(asyncio.sleep, 0.01)
+    recipient, content = LocalSMTP.outbox[0]
+    assert recipient == "hilarionw2@southernct.edu"
+    assert code in content
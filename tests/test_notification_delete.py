@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from api import models
+from api.utils.notification_retention import NotificationRetention
+from .conftest import TestingAsyncSessionLocal
+
+
+async def add_notifications(notifications: list[tuple[str, str, datetime]]):
+    async with TestingAsyncSessionLocal() as db:
+        db.add_all(models.Notification(user_id="70573536", event_type=event_type,
+                                       message=message, created_at=created_at)
+                   for event_type, message, created_at in notifications)
+        await db.commit()
+
+
+async def notification_messages():
+    async with TestingAsyncSessionLocal() as db:
+        return (await db.scalars(select(models.Notification.message)
+                                 .order_by(models.Notification.id))).all()
+
+
+def test_delete_notifications_with_filters(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    now = datetime.now()
+    client.portal.call(add_notifications, [
+        ("appointment_scheduled", "old scheduled", now - timedelta(days=40)),
+        ("appointment_cancelled", "old cancelled", now - timedelta(days=40)),
+        ("appointment_cancelled", "new cancelled", now),
+        ("appointment_scheduled", "new scheduled", now),
+    ])
+
+    url = "/api/v1/delete/notifications/70573536"
+    response = client.delete(url, headers=headers, params={
+        "older_than_days": 30, "event_type": "appointment_cancelled"})
+    assert response.status_code == 200
+    assert client.portal.call(notification_messages) == [
+        "old scheduled", "new cancelled", "new scheduled"]
+
+    response = client.delete(url, headers=headers, params={"older_than_days": 30})
+    assert response.status_code == 200
+    assert client.portal.call(notification_messages) == [
+        "new cancelled", "new scheduled"]
+
+    response = client.delete(url, headers=headers, params={"older_than_days": 30})
+    assert response.status_code == 400
+
+    response = client.delete(url, headers=headers)
+    assert response.status_code == 200
+    assert client.portal.call(notification_messages) == []
+
+
+def test_retention_prunes_in_chunks(client):
+    now = datetime.now()
+    client.portal.call(add_notifications, [
+        ("appointment_scheduled", f"old {number}", now - timedelta(days=100))
+        for number in range(5)
+    ] + [("appointment_scheduled", "recent", now - timedelta(days=10))])
+
+    retention = NotificationRetention(days=30, chunk_size=2, pause=0)
+    assert client.portal.call(retention.prune) == 5
+    assert client.portal.call(notification_messages) == ["recent"]
+    assert retention.metrics()["deleted"] == 5
+    assert client.portal.call(retention.prune) == 0
@@ -0,0 +1,73 @@
+from datetime import datetime
+from sqlalchemy import update
+from api import models
+from .conftest import TestingAsyncSessionLocal
+
+
+async def add_notifications(notifications: list[tuple[str, str]]):
+    async with TestingAsyncSessionLocal() as db:
+        db.add_all(models.Notification(user_id="70573536", event_type=event_type,
+                                       message=message)
+                   for event_type, message in notifications)
+        await db.commit()
+
+
+async def backdate(notification_id: int, created_at: datetime):
+    async with TestingAsyncSessionLocal() as db:
+        await db.execute(update(models.Notification)
+                         .where(models.Notification.id == notification_id)
+                         .values(created_at=created_at))
+        await db.commit()
+
+
+def test_notification_feed_pages(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    client.portal.call(add_notifications, [
+        ("appointment_cancelled" if number % 2 else "appointment_scheduled",
+         f"message {number}") for number in range(5)])
+
+    url = "/api/v1/notifications_by_user/70573536"
+    # the latest come first, the cursor walks back in time
+    messages, before = [], None
+    while True:
+        params = {"limit": 2, **({"before": before} if before else {})}
+        response = client.get(url, headers=headers, params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        messages += [item["message"] for item in response.json()]
+        before = response.headers.get("X-Next-Cursor")
+        if before is None:
+            break
+    assert messages == [f"message {number}" for number in reversed(range(5))]
+
+    response = client.get(url, headers=headers,
+                          params={"event_type": "appointment_cancelled"})
+    assert [item["message"] for item in response.json()] == ["message 3", "message 1"]
+    assert "X-Next-Cursor" not in response.headers
+
+    ids = sorted(item["id"] for item in client.get(url, headers=headers).json())
+    client.portal.call(backdate, ids[0], datetime(2024, 1, 15, 23, 59))
+    client.portal.call(backdate, ids[1], datetime(2024, 3, 1, 8, 0))
+    response = client.get(url, headers=headers,
+                          params={"since": "2024-01-15", "until": "2024-01-15"})
+    assert [item["id"] for item in response.json()] == [ids[0]]
+    response = client.get(url, headers=headers, params={"since": "2025-01-01"})
+    assert [item["id"] for item in response.json()] == ids[:1:-1]
+
+    response = client.get(url, headers=headers,
+                          params={"since": "2024-02-01", "until": "2024-01-01"})
+    assert response.status_code == 400
+    response = client.get(url, headers=headers, params={"limit": 1000})
+    assert response.status_code == 422
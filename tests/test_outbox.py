@@ -0,0 +1,205 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from api import models
+from api.utils import outbox
+from api.utils.sms_utils import sms_batch_window
+from .conftest import TestingAsyncSessionLocal
+
+
+async def outbox_messages():
+    async with TestingAsyncSessionLocal() as db:
+        return (await db.scalars(select(models.OutboxMessage)
+                                 .order_by(models.OutboxMessage.id))).all()
+
+
+async def check_failed_delivery_is_retried():
+    async with TestingAsyncSessionLocal() as db:
+        outbox.stage(db, "pager", {"message": "unknown channel"}, "retry-test:pager")
+        await db.commit()
+
+    dispatcher = outbox.OutboxDispatcher(max_attempts=2)
+    assert await dispatcher.dispatch_batch() == 1
+    message = (await outbox_messages())[-1]
+    assert (message.status, message.attempts) == ("pending", 1)
+    assert message.next_attempt_at > datetime.now()
+    # not due yet
+    assert await dispatcher.dispatch_batch() == 0
+
+    async with TestingAsyncSessionLocal() as db:
+        message = await db.get(models.OutboxMessage, message.id)
+        message.next_attempt_at = datetime.now() - timedelta(seconds=1)
+        await db.commit()
+    assert await dispatcher.dispatch_batch() == 1
+    message = (await outbox_messages())[-1]
+    assert (message.status, message.attempts) == ("failed", 2)
+    assert "Unknown outbox channel" in message.last_error
+
+
+def test_appointment_notifications_go_through_outbox(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/token/", data={
+        "username": "john.doe@southernct.edu", "password": "secret_password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    with client.websocket_connect("/api/v1/ws/notifications/70573536") as websocket:
+        response = client.post("/api/v1/appointment/create/", headers=headers, json={
+            "faculty_id": "70573536",
+            "student_id": "70573522",
+            "date": "2022-01-01",
+            "start_time": "08:00",
+            "end_time": "09:00",
+            "reason": "Advising",
+            "status": "pending"
+        })
+        assert response.status_code == 200
+        notification = websocket.receive_json()
+
+    assert notification["event_type"] == "appointment_scheduled"
+    assert notification["user_id"] == "70573536"
+
+    # the notification row was committed with the appointment, and both
+    # deliveries are recorded under the same key
+    messages = client.portal.call(outbox_messages)
+    assert [(message.channel, message.idempotency_key) for message in messages] == [
+        ("websocket", f"{notification['key']}:websocket"),
+        ("sms", f"{notification['key']}:sms"),
+    ]
+    for _ in range(50):
+        if messages[0].status == "sent":
+            break
+        client.portal.call(asyncio.sleep, 0.01)
+        messages = client.portal.call(outbox_messages)
+    assert messages[0].status == "sent"
+    # the sms waits for others to merge with
+    assert messages[1].status == "pending"
+    assert messages[1].recipient == "70573536"
+    assert messages[1].next_attempt_at > datetime.now() + timedelta(
+        seconds=sms_batch_window("appointment_scheduled") - 5)
+
+    response = client.get("/api/v1/notifications_by_user/70573536", headers=headers)
+    assert [item["message"] for item in response.json()] == [notification["message"]]
+
+    client.portal.call(check_failed_delivery_is_retried)
+
+
+class RecordingSms:
+    def __init__(self):
+        self.sent = []
+
+    async def deliver(self, message, idempotency_key=None):
+        self.sent.append(message)
+        return True
+
+
+async def check_sms_digest():
+    async with TestingAsyncSessionLocal() as db:
+        for index, delay in enumerate([60, 60, 0]):
+            outbox.stage(db, "sms", {"message": f"update {index}"}, f"digest-test:{index}",
+                         recipient="70573599", delay=delay)
+        outbox.stage(db, "sms", {"message": "other faculty"}, "digest-test:other",
+                     recipient="70573598", delay=60)
+        await db.commit()
+
+    # the due check-in sms takes the waiting ones of the same faculty along
+    assert await outbox.OutboxDispatcher().dispatch_batch() == 1
+    return {message.idempotency_key: message.status
+            for message in await outbox_messages()
+            if message.idempotency_key.startswith("digest-test")}
+
+
+def test_sms_are_merged_per_faculty(client, monkeypatch):
+    sms = RecordingSms()
+    monkeypatch.setattr(outbox, "sms_notifier", sms)
+    # dispatch by hand only
+    client.portal.call(outbox.outbox_dispatcher.stop)
+
+    statuses = client.portal.call(check_sms_digest)
+    assert sms.sent == ["3 updates: update 0 | update 1 | update 2"]
+    assert statuses == {"digest-test:0": "sent", "digest-test:1": "sent",
+                        "digest-test:2": "sent", "digest-test:other": "pending"}
+    assert sms_batch_window("appointment_checked_in") == 0
+
+
+class FlakySms:
+    """Fails the first delivery, then records the messages and their keys"""
+
+    def __init__(self):
+        self.sent = []
+        self.calls = 0
+
+    async def deliver(self, message, idempotency_key=None):
+        self.calls += 1
+        if self.calls == 1:
+            return False
+        self.sent.append((message, idempotency_key))
+        return True
+
+
+async def check_digest_retry():
+    async with TestingAsyncSessionLocal() as db:
+        for index, delay in enumerate([60, 0]):
+            outbox.stage(db, "sms", {"message": f"update {index}"}, f"retry-digest:{index}",
+                         recipient="70573597", delay=delay)
+        await db.commit()
+    dispatcher = outbox.OutboxDispatcher()
+    assert await dispatcher.dispatch_batch() == 1
+
+    # a new sms during the backoff is not merged into the failed digest
+    async with TestingAsyncSessionLocal() as db:
+        outbox.stage(db, "sms", {"message": "update 2"}, "retry-digest:2",
+                     recipient="70573597")
+        await db.commit()
+    assert await dispatcher.dispatch_batch() == 1
+
+    async with TestingAsyncSessionLocal() as db:
+        await db.execute(update(models.OutboxMessage)
+                         .where(models.OutboxMessage.digest_key == "retry-digest:0")
+                         .values(next_attempt_at=datetime.now() - timedelta(seconds=1)))
+        await db.commit()
+    assert await dispatcher.dispatch_batch() == 2
+    return {message.idempotency_key: message.status
+            for message in await outbox_messages()
+            if message.idempotency_key.startswith("retry-digest")}
+
+
+def test_sms_digest_is_retried_as_a_unit(client, monkeypatch):
+    sms = FlakySms()
+    monkeypatch.setattr(outbox, "sms_notifier", sms)
+    client.portal.call(outbox.outbox_dispatcher.stop)
+
+    statuses = client.portal.call(check_digest_retry)
+    assert sms.sent == [("update 2", "retry-digest:2"),
+                        ("2 updates: update 0 | update 1", "digest:retry-digest:0")]
+    assert set(statuses.values()) == {"sent"}
+
+
+class UnreachableBroker:
+    async def publish(self, channel, payload):
+        return False
+
+
+async def check_unpublished_notification_is_retried():
+    async with TestingAsyncSessionLocal() as db:
+        outbox.stage(db, outbox.WEBSOCKET, {"user_id": "70573536", "message": "hi"},
+                     "broker-down-test:websocket")
+        await db.commit()
+
+    assert await outbox.OutboxDispatcher().dispatch_batch() == 1
+    message = (await outbox_messages())[-1]
+    assert (message.status, message.attempts) == ("pending", 1)
+
+
+def test_broker_outage_is_retried(client, monkeypatch):
+    monkeypatch.setattr(outbox, "broker", UnreachableBroker())
+    client.portal.call(outbox.outbox_dispatcher.stop)
+
+    client.portal.call(check_unpublished_notification_is_retried)
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from api.utils.password_utils import PasswordHasher
+
+
+def test_password_hasher():
+    hasher = PasswordHasher(workers=2, max_pending=8)
+
+    async def hash_and_verify():
+        hashed = await hasher.hash("secret_password")
+        results = await asyncio.gather(
+            hasher.verify("secret_password", hashed),
+            hasher.verify("wrong_password", hashed),
+        )
+        return hashed, results
+
+    hashed, results = asyncio.run(hash_and_verify())
+    assert hashed != "secret_password"
+    assert results == [True, False]
+
+    metrics = hasher.metrics()
+    assert metrics["completed"] == 3
+    assert metrics["in_flight"] == 0
+    assert metrics["rejected"] == 0
+
+
+def test_password_hasher_rejects_when_full():
+    hasher = PasswordHasher(workers=1, max_pending=0)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(hasher.hash("secret_password"))
+
+    assert exc.value.status_code == 503
+    assert hasher.metrics()["rejected"] == 1
+
+
+def test_metrics_route(client):
+    response = client.get("/api/v1/metrics/")
+    assert response.status_code == 200
+    assert "queue_depth" in response.json()["password_hasher"]
@@ -0,0 +1,58 @@
+from sqlalchemy import event
+from .conftest import async_engine
+
+
+def add_faculty_message(client, index):
+    user_id = f"7057{index:04d}"
+    response = client.post("/api/v1/signup/", json={
+        "user_id": user_id,
+        "first_name": "John",
+        "last_name": f"Doe{index}",
+        "email": f"john.doe{index}@southernct.edu",
+        "password": "secret_password",
+        "phone_number": f"203690{index:04d}"
+    })
+    assert response.status_code == 200
+
+    response = client.put(f"/api/v1/pi-message/update/{user_id}", json={
+        "user_id": user_id,
+        "duration": 15,
+        "duration_unit": "seconds",
+        "message": f"message {index}"
+    })
+    assert response.status_code == 200
+
+
+def count_get_all_statements(client):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        # the background workers (outbox, retention) query meanwhile
+        if "pi_message" in statement or "faculty" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine,
+                 "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get("/api/v1/pi-message/get-all")
+    finally:
+        event.remove(async_engine.sync_engine,
+                     "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200
+    return len(statements), response.json()
+
+
+def test_pi_get_all_statement_count(client):
+    add_faculty_message(client, 1)
+    single_count, messages = count_get_all_statements(client)
+    assert len(messages) == 1
+
+    for index in range(2, 6):
+        add_faculty_message(client, index)
+    many_count, messages = count_get_all_statements(client)
+
+    assert len(messages) == 5
+    assert many_count == single_count
+    assert {message["last_name"] for message in messages} == {
+        f"Doe{index}" for index in range(1, 6)}
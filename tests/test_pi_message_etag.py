@@ -0,0 +1,85 @@
+from sqlalchemy import event
+from api.utils.pi_message_versions import pi_message_versions, PiMessageVersions
+from .conftest import async_engine
+
+
+user_id = "70573536"
+message = {
+    "user_id": user_id,
+    "duration": 15,
+    "duration_unit": "seconds",
+    "message": "Office hours moved to 3pm"
+}
+
+
+def count_statements(client, url, headers):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        # the background workers (outbox, retention) query meanwhile
+        if "pi_message" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine,
+                 "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine,
+                     "before_cursor_execute", before_cursor_execute)
+    return response, len(statements)
+
+
+def test_pi_message_conditional_get(client):
+    pi_message_versions.invalidate()
+    response = client.post("/api/v1/signup/", json={
+        "user_id": user_id,
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+    response = client.put(f"/api/v1/pi-message/update/{user_id}", json=message)
+    assert response.status_code == 200
+
+    for url in (f"/api/v1/pi-message/get/{user_id}", "/api/v1/pi-message/get-all"):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert response.headers["Last-Modified"].endswith("GMT")
+
+        # an unchanged message is answered from memory
+        response, statements = count_statements(
+            client, url, {"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert statements == 0
+
+        response = client.get(url, headers={"If-None-Match": '"stale"'})
+        assert response.status_code == 200
+
+        # an update changes the ETag
+        client.put(f"/api/v1/pi-message/update/{user_id}",
+                   json={**message, "message": f"Updated for {url}"})
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()
+
+
+def test_pi_message_versions_are_bounded():
+    versions = PiMessageVersions(maxsize=2)
+    for polled_id in ("70573501", "70573502"):
+        versions.remove(polled_id)
+    assert versions._lookup("70573501") == (True, None)
+
+    # the least recently used id makes room for the new one
+    versions.remove("70573503")
+    assert list(versions._entries) == ["70573501", "70573503"]
+
+    expired = PiMessageVersions(ttl=0)
+    expired.remove("70573501")
+    assert expired._lookup("70573501") == (False, None)
+    assert not expired._entries
@@ -0,0 +1,95 @@
+import json
+import asyncio
+from api.utils.pi_message_stream import PiMessageHub, pi_message_hub
+
+
+def parse_event(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return int(fields["id"]), fields["event"], json.loads(fields["data"])
+
+
+async def check_stream_delivery():
+    hub = PiMessageHub(buffer_size=10, heartbeat=0.05)
+    faculty = hub.stream(user_id="70573536")
+    everyone = hub.stream()
+    assert (await anext(faculty)).startswith("retry:")
+    assert (await anext(everyone)).startswith("retry:")
+
+    first = hub.publish("70573536", "update", {"message": "In a meeting"})
+    hub.publish("70573537", "delete", {"user_id": "70573537"})
+
+    assert parse_event(await anext(faculty)) == (
+        first, "update", {"message": "In a meeting"})
+    # the faculty stream only gets its own messages, so it idles
+    assert await anext(faculty) == ": heartbeat\n\n"
+
+    assert parse_event(await anext(everyone))[0] == first
+    assert parse_event(await anext(everyone))[1] == "delete"
+    await faculty.aclose()
+    await everyone.aclose()
+    assert hub.metrics()["streams"] == 0
+
+
+async def check_stream_resume():
+    hub = PiMessageHub(buffer_size=3, heartbeat=0.05)
+    ids = [hub.publish("70573536", "update", {"message": str(index)})
+           for index in range(4)]
+
+    # the last two events are replayed after the one the display saw
+    resumed = hub.stream(user_id="70573536", last_event_id=str(ids[1]))
+    await anext(resumed)
+    assert parse_event(await anext(resumed))[0] == ids[2]
+    assert parse_event(await anext(resumed))[0] == ids[3]
+    assert await anext(resumed) == ": heartbeat\n\n"
+    await resumed.aclose()
+
+    # the first event fell out of the buffer, so the display must refetch
+    for last_event_id in (str(ids[0] - 1), "not-an-id", str(ids[3] + 10)):
+        lost = hub.stream(user_id="70573536", last_event_id=last_event_id)
+        await anext(lost)
+        assert (await anext(lost)).startswith("event: reset")
+        await lost.aclose()
+
+
+async def check_slow_stream_is_closed():
+    hub = PiMessageHub(queue_size=2)
+    stream = hub.stream()
+    await anext(stream)
+    for index in range(3):
+        hub.publish("70573536", "update", {"message": str(index)})
+    # the lagging stream ends, the display reconnects with Last-Event-ID
+    assert [chunk async for chunk in stream] == []
+
+
+def test_pi_message_hub():
+    asyncio.run(check_stream_delivery())
+    asyncio.run(check_stream_resume())
+    asyncio.run(check_slow_stream_is_closed())
+
+
+def test_pi_message_changes_are_published(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+
+    response = client.put("/api/v1/pi-message/update/70573536", json={
+        "user_id": "70573536",
+        "duration": 15,
+        "duration_unit": "seconds",
+        "message": "Back in 10 minutes"
+    })
+    assert response.status_code == 200
+    event_id, user_id, event, data = pi_message_hub._events[-1]
+    assert (user_id, event, data["message"]) == (
+        "70573536", "update", "Back in 10 minutes")
+
+    response = client.delete("/api/v1/pi-message/delete/70573536")
+    assert response.status_code == 200
+    assert pi_message_hub._events[-1][0] == event_id + 1
+    assert pi_message_hub._events[-1][2] == "delete"
@@ -0,0 +1,69 @@
+import asyncio
+import httpx
+from api.utils.sms_utils import SmsNotifier, CircuitBreaker
+
+
+def transport_answering(statuses, requests):
+    """Mock IFTTT answering with the given statuses in turn, then 200"""
+    statuses = list(statuses)
+
+    def handler(request):
+        requests.append(request)
+        status = statuses.pop(0) if statuses else 200
+        if status is None:
+            raise httpx.ConnectTimeout("timed out", request=request)
+        return httpx.Response(status)
+
+    return httpx.MockTransport(handler)
+
+
+async def check_retries():
+    requests = []
+    notifier = SmsNotifier(key="test-key", backoff=0,
+                           transport=transport_answering([503, None], requests))
+    await notifier.start()
+    assert await notifier.deliver("Student checked in", idempotency_key="checkin:1")
+    # a redelivered message is not posted twice
+    assert await notifier.deliver("Student checked in", idempotency_key="checkin:1")
+    await notifier.stop()
+
+    assert len(requests) == 3
+    assert requests[-1].url.path.endswith("/key/test-key")
+    assert notifier.metrics()["sent"] == 1
+    assert notifier.metrics()["retries"] == 2
+
+
+async def check_breaker_and_rejections():
+    requests = []
+    breaker = CircuitBreaker(threshold=2, reset_after=60)
+    notifier = SmsNotifier(key="test-key", backoff=0, max_attempts=2, breaker=breaker,
+                           transport=transport_answering([500, 500, 400], requests))
+    await notifier.start()
+    assert not await notifier.deliver("First")
+    assert breaker.state == "open"
+    assert notifier.metrics()["failed"] == 1
+
+    # once the breaker lets calls through again, a 4xx is not retried
+    breaker.reset_after = 0
+    assert not await notifier.deliver("Second")
+    await notifier.stop()
+    assert len(requests) == 3
+    assert breaker.state == "closed"
+    assert notifier.metrics()["failed"] == 2
+
+
+async def check_skipped_without_key():
+    requests = []
+    notifier = SmsNotifier(key=None, transport=transport_answering([], requests))
+    await notifier.start()
+    # skipped, so the outbox does not retry it
+    assert await notifier.deliver("Not sent")
+    await notifier.stop()
+    assert requests == []
+    assert notifier.metrics()["sent"] == 0
+
+
+def test_sms_notifier():
+    asyncio.run(check_retries())
+    asyncio.run(check_breaker_and_rejections())
+    asyncio.run(check_skipped_without_key())
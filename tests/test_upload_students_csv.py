@@ -0,0 +1,116 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from api import models
+from api.utils import import_jobs
+from .conftest import TestingAsyncSessionLocal
+
+
+@pytest.fixture
+def headers(client):
+    user_data = {
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908924"
+    }
+
+    response = client.post("/api/v1/signup/", json=user_data)
+    assert response.status_code == 200
+
+    login_data = {
+        "username": user_data["email"],
+        "password": user_data["password"]
+    }
+
+    response = client.post("/api/v1/token/", data=login_data)
+    assert response.status_code == 200
+
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+
+def upload(client, headers, rows):
+    content = "Email,ID,Pref. First,Last Name,Class\n" + "\n".join(rows)
+    response = client.post("/api/v1/students/upload",
+                           files={"file": ("roster.csv", content, "text/csv")},
+                           headers=headers)
+    assert response.status_code == 200, response.json()
+    assert response.json()["status"] == "queued"
+
+    job_id = response.json()["job_id"]
+    for _ in range(100):
+        response = client.get(f"/api/v1/students/upload/{job_id}",
+                              headers=headers)
+        assert response.status_code == 200
+        if response.json()["status"] in ("completed", "failed"):
+            return response.json()
+        time.sleep(0.05)
+
+    raise AssertionError(f"Import job {job_id} did not finish")
+
+
+def test_upload_students_csv(client, headers):
+    rows = [
+        "ann.lee@southernct.edu,700000001,Ann,Lee,CSC 330",
+        "bob.ray@southernct.edu,700000002,Bob,Ray,CSC 330",
+        "cal.fox@southernct.edu,700000003,Cal,Fox,CSC 330",
+        "ann.lee@southernct.edu,700000001,Ann,Lee,CSC 330",  # repeated row
+        "not-an-email,700000004,Dee,Kim,CSC 330",
+    ]
+
+    job = upload(client, headers, rows)
+    assert job["status"] == "completed", job
+    assert job["rows_processed"] == 5
+    assert job["rows_added"] == 3
+    assert job["rows_skipped"] == 1
+    assert job["rows_invalid"] == 1
+
+    # uploading the same roster again adds nobody
+    job = upload(client, headers, rows[:3] + [
+        "eve.moe@southernct.edu,700000005,Eve,Moe,CSC 330"])
+    assert job["rows_added"] == 1
+    assert job["rows_skipped"] == 3
+
+    response = client.post("/api/v1/kiosk-signin/", json={"user_id": "0005"})
+    assert response.status_code == 200
+    assert response.json()["email"] == "eve.moe@southernct.edu"
+
+    response = client.get("/api/v1/students/upload/unknown-job",
+                          headers=headers)
+    assert response.status_code == 404
+
+
+async def check_job_is_claimed_once():
+    queue = import_jobs.ImportJobQueue(spool_dir=import_jobs.import_job_queue.spool_dir)
+    async with TestingAsyncSessionLocal() as db:
+        job = models.ImportJob(filename="roster.csv", status="running")
+        db.add(job)
+        await db.commit()
+    with open(queue._spool_path(job.id), "w") as spooled:
+        spooled.write("Email,ID,Pref. First,Last Name\n"
+                      "fay.ng@southernct.edu,700000006,Fay,Ng\n")
+
+    # another worker is still running it
+    await queue._run(job.id)
+    async with TestingAsyncSessionLocal() as db:
+        job = await db.get(models.ImportJob, job.id)
+        assert (job.status, job.rows_processed) == ("running", 0)
+        job.updated_at = datetime.now() - timedelta(seconds=queue.lease + 1)
+        await db.commit()
+
+    # its lease expired, so it is taken over
+    await queue._run(job.id)
+    async with TestingAsyncSessionLocal() as db:
+        job = await db.get(models.ImportJob, job.id)
+        assert (job.status, job.rows_added) == ("completed", 1)
+
+    # a finished job is not run again
+    await queue._run(job.id)
+    async with TestingAsyncSessionLocal() as db:
+        assert (await db.get(models.ImportJob, job.id)).rows_added == 1
+
+
+def test_import_job_claim(client):
+    client.portal.call(check_job_is_claimed_once)
@@ -0,0 +1,252 @@
+import asyncio
+from api.utils import web_socket
+from api.utils.web_socket import ConnectionRegistry, CLOSE_SLOW_CONSUMER, CLOSE_IDLE
+
+
+class SlowWebSocket:
+    """Websocket stand-in whose sends wait until the test releases them"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+        self.release = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class SleepingWebSocket(SlowWebSocket):
+    """Half-open websocket, nothing is ever received from the client"""
+
+    def __init__(self):
+        super().__init__()
+        self.release.set()
+
+    async def receive_text(self):
+        await asyncio.Event().wait()
+
+
+class StuckWebSocket(SlowWebSocket):
+    """Client that neither reads nor sends anything"""
+
+    async def receive_text(self):
+        await asyncio.Event().wait()
+
+
+async def check_drop_policy():
+    registry = ConnectionRegistry(queue_size=2, policy="drop")
+    websocket = SlowWebSocket()
+    connection = await registry.connect("70573536", websocket)
+    await asyncio.sleep(0)
+
+    # the sender holds message 0, the queue keeps the two latest
+    for index in range(5):
+        assert registry.send("70573536", {"id": index}) == 1
+        await asyncio.sleep(0)
+    assert connection.dropped == 2
+
+    websocket.release.set()
+    await asyncio.sleep(0.01)
+    assert websocket.sent == [{"id": 0}, {"id": 3}, {"id": 4}]
+    await registry.disconnect(connection)
+    assert registry.connection_count() == 0
+
+
+async def check_disconnect_policy():
+    registry = ConnectionRegistry(queue_size=1, policy="disconnect")
+    slow, fast = SlowWebSocket(), SlowWebSocket()
+    fast.release.set()
+    await registry.connect("70573536", slow)
+    await registry.connect("70573536", fast)
+    await asyncio.sleep(0)
+
+    for index in range(3):
+        registry.send("70573536", {"id": index})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    # only the slow socket is closed, the other one got everything
+    assert slow.closed_with == CLOSE_SLOW_CONSUMER
+    assert fast.sent == [{"id": 0}, {"id": 1}, {"id": 2}]
+    assert registry.connection_count("70573536") == 1
+    assert not registry._closing
+
+
+async def check_paused_connection():
+    registry = ConnectionRegistry()
+    websocket = SlowWebSocket()
+    websocket.release.set()
+    connection = await registry.connect("70573536", websocket, paused=True)
+
+    # live messages wait for the replay, those it sent are skipped
+    registry.send("70573536", {"id": 5})
+    registry.send("70573536", {"id": 6})
+    await asyncio.sleep(0.01)
+    assert websocket.sent == []
+    connection.replayed.add(5)
+    connection.resume()
+    await asyncio.sleep(0.01)
+    assert websocket.sent == [{"id": 6}]
+    await registry.disconnect(connection)
+
+
+async def check_idle_socket_is_closed():
+    registry = ConnectionRegistry()
+    websocket = SleepingWebSocket()
+    await asyncio.wait_for(web_socket.handle_websocket_connection(
+        websocket, "70573536", ping_interval=0.01, idle_timeout=0.05,
+        registry=registry), timeout=1)
+
+    assert websocket.closed_with == CLOSE_IDLE
+    assert {"type": "ping"} in websocket.sent
+    assert registry.connection_count("70573536") == 0
+    assert registry.metrics()["idle_evicted"] == 1
+
+
+async def check_silent_socket_is_kept_by_default():
+    registry = ConnectionRegistry()
+    websocket = SleepingWebSocket()
+    handler = asyncio.create_task(web_socket.handle_websocket_connection(
+        websocket, "70573536", ping_interval=0.01, idle_timeout=0, registry=registry))
+    await asyncio.sleep(0.05)
+
+    # liveness is left to the server's protocol pings
+    assert websocket.sent == []
+    assert registry.connection_count("70573536") == 1
+    handler.cancel()
+    await asyncio.gather(handler, return_exceptions=True)
+
+
+async def check_unsent_ping_disconnects():
+    registry = ConnectionRegistry(queue_size=1, policy="disconnect")
+    websocket = StuckWebSocket()
+    await asyncio.wait_for(web_socket.handle_websocket_connection(
+        websocket, "70573536", ping_interval=0.01, idle_timeout=1,
+        registry=registry), timeout=1)
+
+    assert websocket.closed_with == CLOSE_SLOW_CONSUMER
+    assert registry.connection_count("70573536") == 0
+
+
+async def check_cancelled_handler_unregisters():
+    registry = ConnectionRegistry()
+    websocket = SleepingWebSocket()
+    handler = asyncio.create_task(web_socket.handle_websocket_connection(
+        websocket, "70573536", registry=registry))
+    await asyncio.sleep(0.01)
+    assert registry.connection_count("70573536") == 1
+
+    handler.cancel()
+    await asyncio.gather(handler, return_exceptions=True)
+    assert registry.connection_count("70573536") == 0
+    assert websocket.closed_with == 1000
+
+
+async def check_metrics():
+    registry = ConnectionRegistry(queue_size=10)
+    slow, fast = SlowWebSocket(), SlowWebSocket()
+    fast.release.set()
+    await registry.connect("70573536", slow)
+    await registry.connect("70573522", fast)
+    await asyncio.sleep(0)
+
+    for index in range(3):
+        registry.send("70573536", {"id": index})
+        registry.send("70573522", {"id": index})
+    await asyncio.sleep(0.01)
+
+    metrics = registry.metrics()
+    assert metrics["connections"] == 2
+    assert metrics["users"] == 2
+    assert metrics["messages_sent"] == 3
+    # the slow socket's sender holds one message, two are waiting
+    assert metrics["queued_messages"] == 2
+    assert metrics["max_queue_depth"] == 2
+    assert metrics["messages_per_second"] > 0
+    assert metrics["send_latency"]["max_ms"] >= metrics["send_latency"]["avg_ms"] >= 0
+
+
+def test_connection_registry():
+    asyncio.run(check_drop_policy())
+    asyncio.run(check_disconnect_policy())
+    asyncio.run(check_paused_connection())
+    asyncio.run(check_metrics())
+
+
+def test_heartbeat():
+    asyncio.run(check_idle_socket_is_closed())
+    asyncio.run(check_silent_socket_is_kept_by_default())
+    asyncio.run(check_unsent_ping_disconnects())
+    asyncio.run(check_cancelled_handler_unregisters())
+
+
+def test_notification_reaches_every_tab(client):
+    response = client.post("/api/v1/signup/", json={
+        "user_id": "70573536",
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@southernct.edu",
+        "password": "secret_password",
+        "phone_number": "2036908888"
+    })
+    assert response.status_code == 200
+
+    notification = {
+        "user_id": "70573536",
+        "event_type": "appointment",
+        "message": "New appointment at 10am"
+    }
+    with client.websocket_connect("/api/v1/ws/notifications/70573536") as first, \
+            client.websocket_connect("/api/v1/ws/notifications/70573536") as second:
+        response = client.post(
+            "/api/v1/ws_create_notifications/70573536", json=notification)
+        assert response.json()["success"]
+        assert first.receive_json() == {"id": 1, **notification}
+        assert second.receive_json() == {"id": 1, **notification}
+
+
+def test_reconnect_replays_missed_notifications(client):
+    url = "/api/v1/ws_create_notifications/70573536"
+    for number in (2, 3):
+        response = client.post(url, json={
+            "user_id": "70573536",
+            "event_type": "appointment",
+            "message": f"missed {number}"
+        })
+        assert response.json()["success"]
+
+    with client.websocket_connect("/api/v1/ws/notifications/70573536?last_id=1") as websocket:
+        assert websocket.receive_json()["id"] == 2
+        assert websocket.receive_json()["id"] == 3
+        client.post(url, json={
+            "user_id": "70573536",
+            "event_type": "appointment",
+            "message": "live"
+        })
+        assert websocket.receive_json() == {
+            "id": 4, "user_id": "70573536", "event_type": "appointment", "message": "live"}
+
+
+def test_reconnect_after_a_long_gap_resets(client, monkeypatch):
+    monkeypatch.setattr(web_socket, "WS_REPLAY_MAX", 2)
+    url = "/api/v1/ws_create_notifications/70573536"
+
+    with client.websocket_connect("/api/v1/ws/notifications/70573536?last_id=0") as websocket:
+        assert websocket.receive_json() == {"type": "reset"}
+        client.post(url, json={
+            "user_id": "70573536",
+            "event_type": "appointment",
+            "message": "live"
+        })
+        assert websocket.receive_json()["id"] == 5
+
+    # a gap within the limit is still replayed
+    with client.websocket_connect("/api/v1/ws/notifications/70573536?last_id=3") as websocket:
+        assert [websocket.receive_json()["id"] for _ in range(2)] == [4, 5]